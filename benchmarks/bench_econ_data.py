@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmarks of reading and looking up economic data series
+
+Uses synthetic FRED series files (see common.py) from a temporary offline
+cache, so no network is involved.
+
+Run with the other benchmarks:
+
+    python benchmarks/run.py -b econ
+"""
+from datetime import date, timedelta
+
+import numpy as np
+
+from common import fred_series_text, install_fred_fixtures, \
+                   remove_fred_fixtures
+import data_analysis
+from data_analysis import Econ_series, get_stlouisfed_data
+
+
+def synthetic_dates(count, seed=0):
+    """ Return <count> random sorted dates of the last 50 years """
+    rng = np.random.default_rng(seed)
+    today = date.today().toordinal()
+    days = np.sort(rng.integers(today - 50 * 365, today, size=count))
+    return [date.fromordinal(int(d)) for d in days]
+
+
+class Parse_fred_text:
+    params = [100, 1000, 10000, 100000]
+    param_names = ["observations"]
+
+    def setup(self, observations):
+        # Daily observations, ending today
+        self.text = fred_series_text(
+            "TEST", start=date.today() - timedelta(days=observations - 1),
+            frequency="D")
+
+    def time_from_text(self, observations):
+        Econ_series.from_text(self.text)
+
+    def peakmem_from_text(self, observations):
+        Econ_series.from_text(self.text)
+
+
+class Get_stlouisfed_data:
+    params = [10, 1000, 100000]
+    param_names = ["dates"]
+
+    def setup(self, dates):
+        self.folder = install_fred_fixtures()
+        self.url = data_analysis.indicators["CPI"].url
+        self.dates = synthetic_dates(dates)
+        # Parse the series once, as after the first prediction of a session
+        get_stlouisfed_data(self.url, self.dates[:1])
+
+    def teardown(self, dates):
+        remove_fred_fixtures(self.folder)
+
+    def time_loaded(self, dates):
+        get_stlouisfed_data(self.url, self.dates)
+
+    def time_from_cache_file(self, dates):
+        # Read and parse the cached file again, as at program start
+        data_analysis.loaded_series.clear()
+        get_stlouisfed_data(self.url, self.dates)
+
+    def peakmem_from_cache_file(self, dates):
+        data_analysis.loaded_series.clear()
+        get_stlouisfed_data(self.url, self.dates)
+
+
+class Daily_econ_table:
+    params = [10, 50]
+    param_names = ["years"]
+
+    def setup(self, years):
+        self.folder = install_fred_fixtures()
+        self.last_day = date.today().toordinal()
+        self.first_day = self.last_day - 365 * years
+        data_analysis.get_all_series()
+        self.table = data_analysis.Daily_econ_table(
+            self.first_day, self.last_day, data_analysis.econ_features)
+        self.days = np.array([d.toordinal() for d in synthetic_dates(1000)
+                              if d.toordinal() >= self.first_day])
+
+    def teardown(self, years):
+        remove_fred_fixtures(self.folder)
+
+    def time_build(self, years):
+        data_analysis.Daily_econ_table(self.first_day, self.last_day,
+                                       data_analysis.econ_features)
+
+    def time_rows(self, years):
+        self.table.rows(self.days)
+
+
+class Obtain_econ_matrix:
+    # All registered indicators next to the default three, to show how the
+    #   lookup scales with the number of indicators
+    params = [[1000, 100000], ["default", "all"]]
+    param_names = ["dates", "indicators"]
+
+    def setup(self, dates, indicators):
+        self.folder = install_fred_fixtures()
+        self.days = np.array([d.toordinal() for d in synthetic_dates(dates)])
+        if indicators == "all":
+            self.features = list(data_analysis.indicators)
+        else:
+            self.features = list(data_analysis.econ_features)
+        data_analysis.get_all_series(self.features)
+
+    def teardown(self, dates, indicators):
+        remove_fred_fixtures(self.folder)
+
+    def time_obtain_econ_matrix(self, dates, indicators):
+        data_analysis.obtain_econ_matrix(self.days, self.features)
+
+    def peakmem_obtain_econ_matrix(self, dates, indicators):
+        data_analysis.obtain_econ_matrix(self.days, self.features)
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark of data_analysis.generate_y_values on synthetic price histories
+
+Shows how the vectorized y-value generation scales from 10 to 1,000,000
+price entries, next to the O(n^2) pairwise version used for unsorted dates.
+
+Run from the repository folder:
+
+    python benchmarks/bench_generate_y_values.py
+
+The classes follow the airspeed velocity (asv) naming conventions, so they
+can also be collected by asv.
+"""
+import sys
+import timeit
+from datetime import date
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from data_analysis import generate_y_values, generate_y_values_unsorted
+
+
+def synthetic_training_set(rows, seed=0):
+    """ Create a "Date", "Price" frame of <rows> entries, 0-3 days apart """
+    rng = np.random.default_rng(seed)
+    start = date(1000, 1, 1).toordinal()
+    days = start + np.cumsum(rng.integers(0, 4, size=rows))
+    dates = [date.fromordinal(int(d)) for d in days]
+    prices = np.round(rng.uniform(0.5, 20.0, size=rows), 2)
+    return pd.DataFrame({"Date": dates, "Price": prices})
+
+
+class Generate_y_values:
+    params = [10, 100, 1000, 10000, 100000, 1000000]
+    param_names = ["rows"]
+    timeout = 300
+    
+    def setup(self, rows):
+        self.training_set = synthetic_training_set(rows)
+        
+    def time_vectorized(self, rows):
+        generate_y_values(self.training_set, 60)
+
+    def peakmem_vectorized(self, rows):
+        generate_y_values(self.training_set, 60)
+
+
+class Generate_y_values_pairwise:
+    # The pairwise version is quadratic, so only run it on smaller sets
+    params = [10, 100, 1000]
+    param_names = ["rows"]
+    timeout = 300
+    
+    def setup(self, rows):
+        self.training_set = synthetic_training_set(rows)
+        
+    def time_pairwise(self, rows):
+        training_set = self.training_set
+        generate_y_values_unsorted(training_set["Date"], training_set["Price"],
+                                   60, 15)
+
+
+def best_time(function, repeat=3):
+    """ Return the best wall time in seconds of <repeat> calls to function """
+    return min(timeit.repeat(function, number=1, repeat=repeat))
+
+
+if __name__ == "__main__":
+    print("{:>10} {:>14} {:>14}".format("Rows", "Vectorized", "Pairwise"))
+    for rows in Generate_y_values.params:
+        training_set = synthetic_training_set(rows)
+        vectorized = best_time(lambda: generate_y_values(training_set, 60))
+        if rows in Generate_y_values_pairwise.params:
+            pairwise = "{:>12.4f} s".format(best_time(
+                lambda: generate_y_values_unsorted(training_set["Date"],
+                                                   training_set["Price"],
+                                                   60, 15), repeat=1))
+        else:
+            pairwise = "-"
+        print("{:>10} {:>12.4f} s {:>14}".format(rows, vectorized, pairwise))
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmarks of importing bulk price files
+
+Imports a synthetic CSV file of 10,000 to 1,000,000 price rows (in random
+order, over 1,000 items, about 3% of them repeated dates) into an empty
+SQLite database, and into one that already holds all of the prices.
+
+Run with the other benchmarks:
+
+    python benchmarks/run.py -b import
+"""
+import shutil
+import tempfile
+from datetime import date
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from importer import import_prices
+
+
+def write_price_file(path, rows, items=1000, seed=0):
+    """ Write a CSV file of <rows> random prices of <items> items """
+    rng = np.random.default_rng(seed)
+    item_numbers = rng.integers(0, items, size=rows)
+    days = date(2015, 1, 1).toordinal() + rng.integers(0, 3000, size=rows)
+    pd.DataFrame({
+        "Type": ["Type {}".format(i % 20) for i in item_numbers.tolist()],
+        "Description": ["Item {}".format(i) for i in item_numbers.tolist()],
+        "Unit": "1 lb",
+        "Store": ["Store {}".format(i % 10) for i in item_numbers.tolist()],
+        "Location": "Town",
+        "Date": [date.fromordinal(d).isoformat() for d in days.tolist()],
+        "Price": np.round(rng.uniform(0.5, 20.0, size=rows), 2)
+    }).to_csv(path, index=False)
+
+
+class Import_prices:
+    params = [10000, 100000, 1000000]
+    param_names = ["rows"]
+    timeout = 600
+
+    def setup(self, rows):
+        self.folder = Path(tempfile.mkdtemp(prefix="import_"))
+        self.file = self.folder / "prices.csv"
+        write_price_file(self.file, rows)
+        self.imported = self.folder / "imported.sqlite"
+        import_prices(self.file, self.imported)
+        self.count = 0
+
+    def teardown(self, rows):
+        shutil.rmtree(self.folder, ignore_errors=True)
+
+    def new_location(self):
+        self.count += 1
+        return self.folder / "items_{}.sqlite".format(self.count)
+
+    def time_import_new(self, rows):
+        import_prices(self.file, self.new_location())
+
+    def time_import_again(self, rows):
+        # Every row is already there, so nothing is saved
+        import_prices(self.file, self.imported)
+
+    def peakmem_import_new(self, rows):
+        import_prices(self.file, self.new_location())
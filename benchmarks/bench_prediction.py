@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmarks of building training sets and predicting prices
+
+Uses synthetic items and synthetic FRED series from a temporary offline
+cache (see common.py), so no network is involved.
+
+Run with the other benchmarks:
+
+    python benchmarks/run.py -b prediction
+"""
+from common import install_fred_fixtures, remove_fred_fixtures, \
+                   synthetic_item
+import data_analysis
+from data_analysis import convert_price_data_to_training_set, \
+                          predict_single_item
+from prediction_cache import Lru_cache
+
+
+class Convert_price_data_to_training_set:
+    params = [10, 100, 1000, 10000]
+    param_names = ["observations"]
+
+    def setup(self, observations):
+        self.folder = install_fred_fixtures()
+        self.item = synthetic_item(observations)
+        data_analysis.get_all_series()
+
+    def teardown(self, observations):
+        remove_fred_fixtures(self.folder)
+
+    def time_convert(self, observations):
+        convert_price_data_to_training_set(self.item, 30)
+
+    def peakmem_convert(self, observations):
+        convert_price_data_to_training_set(self.item, 30)
+
+
+class Predict_single_item:
+    params = [[10, 100, 1000, 10000], [1, 3]]
+    param_names = ["observations", "polynomial_order"]
+
+    def setup(self, observations, polynomial_order):
+        self.folder = install_fred_fixtures()
+        self.item = synthetic_item(observations)
+        data_analysis.get_all_series()
+        # A cache that already holds this prediction
+        self.warm_cache = Lru_cache()
+        predict_single_item(self.item, 30, polynomial_order, 0.1,
+                            cache=self.warm_cache)
+
+    def teardown(self, observations, polynomial_order):
+        remove_fred_fixtures(self.folder)
+
+    def time_predict(self, observations, polynomial_order):
+        predict_single_item(self.item, 30, polynomial_order, 0.1, cache=None)
+
+    def time_predict_cached(self, observations, polynomial_order):
+        predict_single_item(self.item, 30, polynomial_order, 0.1,
+                            cache=self.warm_cache)
+
+    def peakmem_predict(self, observations, polynomial_order):
+        predict_single_item(self.item, 30, polynomial_order, 0.1, cache=None)
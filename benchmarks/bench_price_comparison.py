@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmarks of comparing prices across stores
+
+Times reading a catalog into a Price_comparison, the cheapest store of every
+product, and monthly price indices, on synthetic catalogs where each product
+is sold at 10 stores.
+
+Run with the other benchmarks:
+
+    python benchmarks/run.py -b price_comparison
+"""
+from common import synthetic_item
+from price_comparison import Price_comparison
+
+stores = 10
+
+
+def shared_product_catalog(items, observations):
+    """ Return a list of synthetic items, with each product at <stores>
+        stores
+    """
+    catalog = []
+    for i in range(items):
+        new_item = synthetic_item(observations, seed=i,
+                                  store="Store {}".format(i % stores))
+        new_item.item_description = "Item {}".format(i // stores)
+        catalog.append(new_item)
+    return catalog
+
+
+class Compare_prices:
+    params = [[1000, 10000, 100000], [10, 100]]
+    param_names = ["items", "observations"]
+    timeout = 600
+
+    def setup(self, items, observations):
+        self.items = shared_product_catalog(items, observations)
+        self.comparison = Price_comparison(self.items)
+        self.comparison.price_index()
+
+    def time_read_catalog(self, items, observations):
+        Price_comparison(self.items)
+
+    def time_cheapest(self, items, observations):
+        self.comparison.cheapest()
+
+    def time_compare_item(self, items, observations):
+        self.comparison.compare_item(self.items[0])
+
+    def time_store_price_levels(self, items, observations):
+        self.comparison.store_price_levels()
+
+    def time_price_index(self, items, observations):
+        self.comparison.price_index(by="store")
+
+    def time_month_over_month(self, items, observations):
+        self.comparison.month_over_month(by="type")
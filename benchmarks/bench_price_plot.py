@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmarks of the data drawn on the GUI's price chart
+
+Times the trendline (fitted, and reused from price_plot.trendline_cache)
+and the decimation of long price histories, on synthetic items.
+
+Run with the other benchmarks:
+
+    python benchmarks/run.py -b price_plot
+"""
+from datetime import date
+
+from common import synthetic_item
+import price_plot
+from price_plot import decimate, trendline_points
+
+
+class Trendline_points:
+    params = [[10, 1000, 100000], [1, 3]]
+    param_names = ["observations", "polynomial_order"]
+
+    def setup(self, observations, polynomial_order):
+        self.item = synthetic_item(observations)
+        self.latest_day = date.today().toordinal() + 30
+        trendline_points(self.item, polynomial_order, self.latest_day)
+
+    def time_trendline(self, observations, polynomial_order):
+        price_plot.trendline_cache.clear()
+        trendline_points(self.item, polynomial_order, self.latest_day)
+
+    def time_trendline_cached(self, observations, polynomial_order):
+        trendline_points(self.item, polynomial_order, self.latest_day)
+
+
+class Decimate:
+    params = [1000, 100000, 1000000]
+    param_names = ["observations"]
+
+    def setup(self, observations):
+        self.prices = synthetic_item(observations).price_data.prices
+
+    def time_decimate(self, observations):
+        decimate(self.prices)
+
+    def peakmem_decimate(self, observations):
+        decimate(self.prices)
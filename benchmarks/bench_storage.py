@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmarks of loading and saving item catalogs
+
+Measures what main.load() and main.save() do (main.py itself opens the
+GUI, so its storage calls are repeated here) on synthetic catalogs of 10 to
+100,000 items with 10 to 10,000 prices each, in each storage format.
+
+Run with the other benchmarks:
+
+    python benchmarks/run.py -b storage
+"""
+import shutil
+import tempfile
+from datetime import date
+from pathlib import Path
+
+from common import synthetic_catalog
+from item import Store_index
+from storage import load_item_index, load_items, save_items
+
+# (number of items, prices per item)
+catalogs = [(10, 10), (10, 10000), (1000, 100), (1000, 1000), (100000, 10)]
+
+
+class Catalog_benchmark:
+    params = [catalogs, ["text", "sqlite", "mmap"]]
+    param_names = ["catalog", "backend"]
+    timeout = 1200
+
+    def setup(self, catalog, backend):
+        self.folder = Path(tempfile.mkdtemp(prefix="items_"))
+        if backend == "text":
+            self.location = self.folder / "items"
+            self.location.mkdir()
+        else:
+            self.location = self.folder / ("items." + backend)
+        self.item_list = synthetic_catalog(*catalog)
+        save_items(self.item_list, self.location, only_modified=False)
+
+    def teardown(self, catalog, backend):
+        shutil.rmtree(self.folder, ignore_errors=True)
+
+
+class Load(Catalog_benchmark):
+
+    def time_load(self, catalog, backend):
+        # As main.load(): item attributes only, indexed by store
+        store_index = Store_index()
+        for loaded_item in load_item_index(self.location).values():
+            store_index.add(loaded_item)
+
+    def time_load_items(self, catalog, backend):
+        # Every item's prices as well
+        load_items(self.location)
+
+    def peakmem_load_items(self, catalog, backend):
+        load_items(self.location)
+
+
+class Save(Catalog_benchmark):
+
+    def time_save_all(self, catalog, backend):
+        save_items(self.item_list, self.location, only_modified=False)
+
+    def time_save_one_changed(self, catalog, backend):
+        # As main.save() after entering one new price
+        changed_item = next(iter(self.item_list.values()))
+        changed_item.add_price_entry(date.today(), 1.0)
+        save_items(self.item_list, self.location)
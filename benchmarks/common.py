@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Synthetic data shared by the benchmarks
+
+- FRED series text in the format of the fred.stlouisfed.org/data/*.txt
+  files, installed into data_analysis's series cache so the benchmarks run
+  offline and always see the same economic data
+- Items with synthetic price histories, and whole catalogs of them
+
+Everything is generated from fixed seeds, so every run measures the same
+work.
+"""
+import shutil
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import data_analysis
+from item import Item, Price_history
+
+# (series id, first date, pandas frequency of the observations, first
+#   value, drift)
+fred_fixtures = {"CPIAUCNS": (date(1913, 1, 1), "MS", 9.8, 0.003),
+                 "A191RL1Q225SBEA": (date(1947, 4, 1), "QS", 2.0, 0.0),
+                 "BOGMBASE": (date(1959, 1, 1), "MS", 39.0, 0.005)}
+
+# Pandas frequency of the observations of each Indicator.frequency, dated
+#   at the start of their period like FRED's
+fixture_frequencies = {"daily": "D", "weekly": "W-MON", "monthly": "MS",
+                       "quarterly": "QS", "annual": "YS"}
+
+
+def fred_series_text(series_id, start=date(1913, 1, 1), frequency="MS",
+                     first_value=100.0, drift=0.002, end=None, seed=0):
+    """ Return a synthetic FRED series as the text of its .txt data file
+
+        Observations are dated like FRED's, at the start of every period of
+        the pandas <frequency> (default: every month) from <start> until
+        <end> (default: today), with a random walk of relative <drift> per
+        period. About one in 200 values is "." (missing), as in the real
+        files.
+    """
+    if end is None:
+        end = date.today()
+    dates = pd.date_range(start, end, freq=frequency).date
+    count = len(dates)
+    rng = np.random.default_rng(seed)
+    values = first_value * np.cumprod(1 + drift + rng.normal(0, 0.004,
+                                                            size=count))
+    missing = rng.random(count) < 0.005
+
+    lines = ["Title:               Synthetic " + series_id,
+             "Series ID:           " + series_id,
+             "Source:              Benchmark fixture",
+             "Release:             Benchmark fixture",
+             "Seasonal Adjustment: Not Seasonally Adjusted",
+             "Frequency:           Synthetic",
+             "Units:               Index",
+             "Date Range:          {} to {}".format(dates[0], dates[-1]),
+             "Last Updated:        {}".format(end),
+             "Notes:               Generated for benchmarking",
+             "",
+             "DATE         VALUE"]
+    for i, day in enumerate(dates):
+        value = "." if missing[i] else "{:.3f}".format(values[i])
+        lines.append("{}  {}".format(day, value))
+    return "\n".join(lines) + "\n"
+
+
+def install_fred_fixtures():
+    """ Point data_analysis at a cache of synthetic FRED series, offline
+
+        - Return the temporary cache folder (remove it with
+          remove_fred_fixtures)
+    """
+    folder = Path(tempfile.mkdtemp(prefix="econ_fixtures_"))
+    data_analysis.cache_folder = folder
+    data_analysis.offline_mode = True
+    data_analysis.loaded_series.clear()
+    data_analysis.prediction_cache.clear()
+    data_analysis.daily_econ_tables.clear()
+    for seed, indicator in enumerate(data_analysis.indicators.values()):
+        url = indicator.url
+        start, frequency, first_value, drift = fred_fixtures.get(
+            indicator.series_id,
+            (date(1950, 1, 1), fixture_frequencies[indicator.frequency],
+             100.0, 0.002))
+        data_analysis.write_cached_series(
+            url, fred_series_text(indicator.series_id, start, frequency,
+                                  first_value, drift, seed=seed),
+            {"url": url, "etag": None, "last_modified": None,
+             "fetched": time.time()})
+    return folder
+
+
+def remove_fred_fixtures(folder):
+    data_analysis.loaded_series.clear()
+    data_analysis.prediction_cache.clear()
+    data_analysis.daily_econ_tables.clear()
+    shutil.rmtree(folder, ignore_errors=True)
+
+
+def synthetic_price_history(observations, seed=0, end=None):
+    """ Return a Price_history of <observations> prices ending at <end>
+
+        Prices are 3 to 10 days apart (default end: yesterday) and follow a
+        slowly rising random walk.
+    """
+    if end is None:
+        end = date.today() - timedelta(days=1)
+    rng = np.random.default_rng(seed)
+    offsets = np.cumsum(rng.integers(3, 11, size=observations))
+    days = end.toordinal() - (offsets[-1] - offsets)
+    prices = np.round(3.0 * np.cumprod(1 + rng.normal(0.0005, 0.01,
+                                                      size=observations)), 2)
+    return Price_history(days, prices)
+
+
+def synthetic_item(observations, seed=0, store="Store", location="Town"):
+    """ Return an Item with a synthetic price history """
+    new_item = Item("Type {}".format(seed % 20),
+                    "Item {}".format(seed),
+                    "1 lb",
+                    store,
+                    location,
+                    seed % 3 == 0)
+    new_item.price_data = synthetic_price_history(observations, seed)
+    return new_item
+
+
+def synthetic_catalog(items, observations):
+    """ Return an item_list of <items> synthetic items spread over 10 stores
+
+        - Return a dict of { [Item.key] : [Item] }
+    """
+    item_list = {}
+    for i in range(items):
+        new_item = synthetic_item(observations, seed=i,
+                                  store="Store {}".format(i % 10))
+        item_list[new_item.key] = new_item
+    return item_list
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Load generator for the forecasting service (forecast_service.py)
+
+Sends prediction requests for the service's items from several concurrent
+keep-alive connections and reports throughput and latency percentiles.
+Start the service first, then run from the repository folder:
+
+    python cli.py serve --port 8080
+    python benchmarks/load_generator.py --port 8080 --connections 32 \
+        --requests 2000
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+import numpy as np
+
+
+async def send_request(reader, writer, method, path, arguments=None):
+    """ Send one HTTP request on an open connection
+
+        - Return (status, JSON reply)
+    """
+    body = b"" if arguments is None else json.dumps(arguments).encode("utf-8")
+    writer.write("{} {} HTTP/1.1\r\nHost: localhost\r\n"
+                 "Content-Type: application/json\r\n"
+                 "Content-Length: {}\r\n\r\n".format(
+                     method, path, len(body)).encode("latin-1") + body)
+    await writer.drain()
+
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        if name.strip().lower() == "content-length":
+            length = int(value)
+    return status, json.loads(await reader.readexactly(length))
+
+
+async def run_connection(host, port, requests, latencies, errors):
+    """ Send each request in requests over one connection, timing each """
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for arguments in requests:
+            start = time.perf_counter()
+            status, _ = await send_request(reader, writer, "POST", "/predict",
+                                           arguments)
+            latencies.append(time.perf_counter() - start)
+            if status != 200:
+                errors.append(status)
+    finally:
+        writer.close()
+
+
+async def generate_load(host, port, connections, total_requests, timeframes,
+                        seed=0):
+    """ Send total_requests predictions spread over several connections
+
+        - Return a dict of throughput and latency statistics
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    _, reply = await send_request(reader, writer, "GET", "/items")
+    writer.close()
+    items = [{"description": item["description"], "store": item["store"],
+              "location": item["location"]} for item in reply["items"]
+             if item["prices"] > 1]
+    if len(items) == 0:
+        raise RuntimeError("The service has no items with price data")
+
+    rng = random.Random(seed)
+    requests = [dict(rng.choice(items), timeframe=rng.choice(timeframes))
+                for _ in range(total_requests)]
+
+    latencies = []
+    errors = []
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        run_connection(host, port, requests[i::connections], latencies,
+                       errors)
+        for i in range(connections)))
+    elapsed = time.perf_counter() - start
+
+    latencies = np.array(latencies) * 1000
+    return {"requests": len(latencies),
+            "errors": len(errors),
+            "seconds": elapsed,
+            "requests/s": len(latencies) / elapsed,
+            "p50 ms": np.percentile(latencies, 50),
+            "p90 ms": np.percentile(latencies, 90),
+            "p99 ms": np.percentile(latencies, 99),
+            "max ms": latencies.max()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Load generator for the forecasting service")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--connections", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--timeframe", type=int, action="append",
+                        help="timeframe to request; may be given several "
+                             "times (default: 7, 30 and 365)")
+    args = parser.parse_args(argv)
+
+    results = asyncio.run(generate_load(args.host, args.port,
+                                        args.connections, args.requests,
+                                        args.timeframe or [7, 30, 365]))
+    for name, value in results.items():
+        print("{:<12}{:>12.2f}".format(name, value) if
+              isinstance(value, float) else "{:<12}{:>12}".format(name, value))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Runs the benchmarks in this folder and records their time and peak memory
+
+Each benchmark file "bench_*.py" holds classes in the airspeed velocity
+(asv) style:
+
+- methods named "time_*" are timed (best of <repeat> runs)
+- methods named "peakmem_*" have their peak memory allocation measured
+  with tracemalloc (which also counts numpy arrays)
+- "params" / "param_names" give the values to run them with (a list of
+  lists is expanded to every combination), and "setup" / "teardown" are
+  called around each benchmark; setup may raise NotImplementedError to
+  skip a combination
+
+Run from the repository folder:
+
+    python benchmarks/run.py                         # everything
+    python benchmarks/run.py -b storage --quick      # smallest params only
+    python benchmarks/run.py --output baseline.json
+    python benchmarks/run.py --compare baseline.json # flag regressions
+
+With --compare, every result more than --threshold times slower (or
+bigger) than in the baseline file is listed, and the exit status is 1 if
+there are any.
+"""
+import argparse
+import gc
+import importlib
+import itertools
+import json
+import platform
+import re
+import sys
+import timeit
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+benchmark_folder = Path(__file__).resolve().parent
+sys.path.insert(0, str(benchmark_folder))
+sys.path.insert(1, str(benchmark_folder.parent))
+
+
+def discover(pattern=None):
+    """ Find the benchmarks whose full name matches the regex <pattern>
+
+        - Return a list of (full name, class, method name)
+    """
+    benchmarks = []
+    for path in sorted(benchmark_folder.glob("bench_*.py")):
+        module = importlib.import_module(path.stem)
+        for class_name, cls in vars(module).items():
+            if not isinstance(cls, type) or cls.__module__ != module.__name__:
+                continue
+            for method_name in sorted(dir(cls)):
+                if not method_name.startswith(("time_", "peakmem_")):
+                    continue
+                name = "{}.{}.{}".format(path.stem, class_name, method_name)
+                if pattern is None or re.search(pattern, name):
+                    benchmarks.append((name, cls, method_name))
+    return benchmarks
+
+def parameter_combinations(cls, quick=False):
+    """ Return the list of parameter tuples to run cls's benchmarks with """
+    params = getattr(cls, "params", None)
+    if params is None:
+        return [()]
+    if len(params) == 0 or not isinstance(params[0], list):
+        params = [params]
+    if quick:
+        params = [values[:1] for values in params]
+    return list(itertools.product(*params))
+
+def measure(cls, method_name, params, repeat):
+    """ Run one benchmark with params
+
+        - Return the best time in seconds or the peak memory in bytes, or
+          None if setup skipped this parameter combination
+    """
+    instance = cls()
+    if hasattr(instance, "setup"):
+        try:
+            instance.setup(*params)
+        except NotImplementedError:
+            return None
+    try:
+        method = getattr(instance, method_name)
+        gc.collect()
+        if method_name.startswith("time_"):
+            return min(timeit.repeat(lambda: method(*params), number=1,
+                                     repeat=getattr(cls, "repeat", repeat)))
+        tracemalloc.start()
+        try:
+            method(*params)
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    finally:
+        if hasattr(instance, "teardown"):
+            instance.teardown(*params)
+
+def format_value(method_name, value):
+    if value is None:
+        return "skipped"
+    if method_name.startswith("time_"):
+        for unit, scale in (("s", 1), ("ms", 1e-3), ("us", 1e-6)):
+            if value >= scale:
+                return "{:.3f} {}".format(value / scale, unit)
+        return "{:.3f} us".format(value / 1e-6)
+    return "{:.2f} MB".format(value / (1024 * 1024))
+
+def run(benchmarks, repeat=3, quick=False):
+    """ Run benchmarks, printing each result as it finishes
+
+        - Return a dict of { full name : { repr(params) : value } }
+    """
+    results = {}
+    for name, cls, method_name in benchmarks:
+        results[name] = {}
+        for params in parameter_combinations(cls, quick):
+            value = measure(cls, method_name, params, repeat)
+            results[name][repr(params)] = value
+            print("{:<70} {:>12}".format(
+                "{}{}".format(name, list(params) if params else ""),
+                format_value(method_name, value)), flush=True)
+    return results
+
+def compare(results, baseline, threshold):
+    """ Return the results more than threshold times worse than baseline
+
+        - Return a list of (name, params, baseline value, new value)
+    """
+    regressions = []
+    for name, values in results.items():
+        for params, value in values.items():
+            old_value = baseline.get(name, {}).get(params)
+            if value is not None and old_value and \
+                    value > threshold * old_value:
+                regressions.append((name, params, old_value, value))
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the benchmarks")
+    parser.add_argument("-b", "--bench",
+                        help="only run benchmarks whose name matches this "
+                             "regular expression")
+    parser.add_argument("--quick", action="store_true",
+                        help="only run the first value of each parameter")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="timing runs per benchmark (default: 3)")
+    parser.add_argument("--output", type=Path,
+                        help="JSON file to write the results to")
+    parser.add_argument("--compare", type=Path,
+                        help="JSON results file to compare against")
+    parser.add_argument("--threshold", type=float, default=1.25,
+                        help="ratio to baseline counted as a regression "
+                             "(default: 1.25)")
+    args = parser.parse_args(argv)
+
+    results = run(discover(args.bench), args.repeat, args.quick)
+
+    if args.output is not None:
+        import numpy
+        with open(args.output, "w") as f:
+            json.dump({"date": datetime.now().isoformat(timespec="seconds"),
+                       "machine": platform.node(),
+                       "python": platform.python_version(),
+                       "numpy": numpy.__version__,
+                       "results": results}, f, indent=1)
+        print("Wrote results to", args.output)
+
+    if args.compare is not None:
+        with open(args.compare, "r") as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        for name, params, old_value, value in regressions:
+            method_name = name.rsplit(".", 1)[1]
+            print("REGRESSION {}{}: {} -> {} ({:.2f}x)".format(
+                name, params, format_value(method_name, old_value),
+                format_value(method_name, value), value / old_value))
+        if len(regressions) > 0:
+            sys.exit(1)
+        print("No regressions against", args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Command line interface of the inflation predictor
+
+Runs the price analysis without opening the GUI, e.g. for nightly forecasts
+over every tracked item:
+
+    python cli.py predict --timeframe 30 --timeframe 365 --output out.csv
+    python cli.py predict --store Walmart --location "Wake forest"
+    python cli.py sweep --timeframe 91 --output best_parameters.csv
+    python cli.py convert items items.sqlite
+    python cli.py convert items.sqlite items.mmap
+    python cli.py serve --port 8080
+    python cli.py import scraped_prices.csv
+    python cli.py compare cheapest --max-age 30
+    python cli.py compare change --by store
+"""
+import argparse
+import sys
+from pathlib import Path
+
+import data_analysis
+import instrumentation
+from storage import convert_items, default_location, filter_items, \
+                    is_mapped, load_item_index, load_items, open_price_arrays
+
+
+def predict(args):
+    """ Predict prices of all (or a store's) items and write them as CSV """
+    item_list = load_items(args.items)
+    items = filter_items(item_list, args.store, args.location)
+    predictions = data_analysis.predict_items(items,
+                                              args.timeframe or [30],
+                                              args.polynomial_order,
+                                              args.regularization,
+                                              args.workers)
+    if args.output is None:
+        predictions.to_csv(sys.stdout, index=False)
+    else:
+        predictions.to_csv(args.output, index=False)
+        print("Wrote", len(predictions), "predictions to", args.output)
+
+
+def sweep(args):
+    """ Find the best polynomial order and regularization of every item """
+    item_list = load_items(args.items)
+    items = filter_items(item_list, args.store, args.location)
+    best_parameters = data_analysis.sweep_items(
+        items, args.timeframe,
+        args.polynomial_order or [1, 2, 3, 4, 5],
+        args.regularization or data_analysis.default_alphas,
+        args.splits, args.workers)
+    if args.output is None:
+        best_parameters.to_csv(sys.stdout, index=False)
+    else:
+        best_parameters.to_csv(args.output, index=False)
+        print("Wrote best parameters of", len(best_parameters), "items to",
+              args.output)
+
+
+def convert(args):
+    """ Copy all items between an items folder, an SQLite database and a
+        memory-mapped (.mmap) store
+    """
+    count = convert_items(args.source, args.destination)
+    print("Converted", count, "items from", args.source, "to",
+          args.destination)
+
+
+def serve(args):
+    """ Serve items and predictions over HTTP (see forecast_service.py) """
+    from forecast_service import serve as serve_forecasts
+    serve_forecasts(args.items, args.host, args.port)
+
+
+def import_file(args):
+    """ Add the prices in a CSV or JSON-lines file (see importer.py) """
+    from importer import import_prices
+
+    def report_progress(stats, fraction):
+        print("\r{:>4.0%}  {:,} rows  {:,.0f} rows/s".format(
+                  fraction, stats["rows"], stats["rows_per_second"]),
+              end="", file=sys.stderr, flush=True)
+
+    stats = import_prices(args.file, args.items, args.chunk_rows,
+                          args.format, report_progress)
+    print(file=sys.stderr)
+    print("Imported {rows:,} rows in {seconds:.1f} s ({rows_per_second:,.0f} "
+          "rows/s): {added:,} prices added, {updated:,} changed, {new_items:,}"
+          " new items, {saved_items:,} items saved".format(**stats))
+    if stats["skipped"]:
+        print("Skipped", stats["skipped"], "rows without a valid date, price "
+              "or item")
+    if stats["conflicting"]:
+        print("Skipped", stats["conflicting"], "rows of items whose "
+              "description is already used at their store by an item of "
+              "another type or unit")
+
+
+def compare(args):
+    """ Compare prices across stores, or price changes by type or store
+        (see price_comparison.py), and write them as CSV
+    """
+    from price_comparison import Price_comparison
+    if is_mapped(args.items):
+        # Read straight from the store's arrays
+        comparison = Price_comparison.from_arrays(
+            load_item_index(args.items).values(),
+            *open_price_arrays(args.items))
+    else:
+        comparison = Price_comparison(load_items(args.items).values())
+
+    if args.report == "cheapest":
+        table = comparison.cheapest(args.max_age, args.all_products)
+    elif args.report == "levels":
+        table = comparison.store_price_levels(args.max_age)
+    elif args.report == "index":
+        table = comparison.price_index(args.by)
+    else:
+        table = comparison.month_over_month(args.by)
+    # Indices and changes have a row per month
+    write_index = args.report in ("index", "change")
+    if args.output is None:
+        table.to_csv(sys.stdout, index=write_index, float_format="%.4g")
+    else:
+        table.to_csv(args.output, index=write_index, float_format="%.4g")
+        print("Wrote", len(table), "rows to", args.output)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inflation predictor")
+    parser.add_argument("--items", type=Path, default=default_location,
+                        help="items folder, SQLite database or .mmap "
+                             "store (default: ./items)")
+    parser.add_argument("--offline", action="store_true",
+                        help="only use cached economic data")
+    parser.add_argument("--metrics", action="store_true",
+                        help="print the time spent in each stage of the "
+                             "pipeline when done")
+    parser.add_argument("--profile", type=Path,
+                        help="save cProfile stats of the command to this "
+                             "file")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    predict_parser = subparsers.add_parser(
+        "predict", help="predict future prices of every tracked item")
+    predict_parser.add_argument("--store",
+                                help="only items from this store")
+    predict_parser.add_argument("--location",
+                                help="only items from this store location")
+    predict_parser.add_argument("--timeframe", type=int, action="append",
+                                help="days into the future to predict; may "
+                                     "be given several times (default: 30)")
+    predict_parser.add_argument("--polynomial-order", type=int, default=1)
+    predict_parser.add_argument("--regularization", type=float, default=0)
+    predict_parser.add_argument("--workers", type=int,
+                                help="number of processes (default: one per "
+                                     "CPU core)")
+    predict_parser.add_argument("--output", type=Path,
+                                help="CSV file to write (default: stdout)")
+    predict_parser.set_defaults(function=predict)
+
+    sweep_parser = subparsers.add_parser(
+        "sweep", help="find each item's best polynomial order and "
+                      "regularization coefficient by cross-validation")
+    sweep_parser.add_argument("--store", help="only items from this store")
+    sweep_parser.add_argument("--location",
+                              help="only items from this store location")
+    sweep_parser.add_argument("--timeframe", type=int, default=30,
+                              help="days into the future to predict "
+                                   "(default: 30)")
+    sweep_parser.add_argument("--polynomial-order", type=int,
+                              action="append",
+                              help="polynomial order to try; may be given "
+                                   "several times (default: 1 to 5)")
+    sweep_parser.add_argument("--regularization", type=float, action="append",
+                              help="regularization coefficient to try; may "
+                                   "be given several times (default: 0 and "
+                                   "0.001 to 100 by multiples of 10)")
+    sweep_parser.add_argument("--splits", type=int, default=5,
+                              help="number of cross-validation folds")
+    sweep_parser.add_argument("--workers", type=int,
+                              help="number of processes (default: one per "
+                                   "CPU core)")
+    sweep_parser.add_argument("--output", type=Path,
+                              help="CSV file to write (default: stdout)")
+    sweep_parser.set_defaults(function=sweep)
+
+    convert_parser = subparsers.add_parser(
+        "convert", help="convert between an items folder, an SQLite "
+                        "database (.db, .sqlite, .sqlite3) and a "
+                        "memory-mapped store (.mmap)")
+    convert_parser.add_argument("source", type=Path)
+    convert_parser.add_argument("destination", type=Path)
+    convert_parser.set_defaults(function=convert)
+
+    serve_parser = subparsers.add_parser(
+        "serve", help="serve items and predictions as an HTTP/JSON API")
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=8080)
+    serve_parser.set_defaults(function=serve)
+
+    import_parser = subparsers.add_parser(
+        "import", help="add prices from a CSV or JSON-lines file of (type, "
+                       "description, unit, store, location, date, price) "
+                       "rows")
+    import_parser.add_argument("file", type=Path)
+    import_parser.add_argument("--format", choices=["csv", "jsonl"],
+                               help="file format (default: from the file "
+                                    "name; .jsonl, .ndjson and .json are "
+                                    "JSON lines)")
+    import_parser.add_argument("--chunk-rows", type=int, default=100000,
+                               help="rows read at a time (default: 100000)")
+    import_parser.set_defaults(function=import_file)
+
+    compare_parser = subparsers.add_parser(
+        "compare", help="compare prices across stores, and price changes "
+                        "by type of item or by store")
+    compare_parser.add_argument("report", nargs="?", default="cheapest",
+                                choices=["cheapest", "levels", "index",
+                                         "change"],
+                                help="cheapest: the cheapest store of each "
+                                     "product sold at several stores; "
+                                     "levels: how cheap each store is "
+                                     "overall; index: monthly price index; "
+                                     "change: monthly %% change in prices "
+                                     "(default: cheapest)")
+    compare_parser.add_argument("--by", choices=["type", "store", "all"],
+                                default="type",
+                                help="group the index or change by type of "
+                                     "item, by store or not at all "
+                                     "(default: type)")
+    compare_parser.add_argument("--max-age", type=int,
+                                help="only compare prices at most this many "
+                                     "days old (default: any)")
+    compare_parser.add_argument("--all-products", action="store_true",
+                                help="list products sold at only one store "
+                                     "as well")
+    compare_parser.add_argument("--output", type=Path,
+                                help="CSV file to write (default: stdout)")
+    compare_parser.set_defaults(function=compare)
+
+    args = parser.parse_args(argv)
+    if args.offline:
+        data_analysis.offline_mode = True
+    if args.metrics:
+        instrumentation.enable()
+    if args.profile is not None:
+        with instrumentation.profile(args.profile):
+            args.function(args)
+        print("Saved profile to", args.profile, file=sys.stderr)
+    else:
+        args.function(args)
+    if args.metrics:
+        print(instrumentation.format_report(), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -6,39 +6,336 @@ Created on Wed May 20 17:40:02 2020
 @author: JamesButcher
 """
 import datetime
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import date, timedelta
+from pathlib import Path
 import numpy as np
 import pandas as pd
-from pandas.plotting import register_matplotlib_converters
-register_matplotlib_converters()
-import requests
-from bs4 import BeautifulSoup
-from sklearn import linear_model
-
-econ_sources = {"CPI": "https://fred.stlouisfed.org/data/CPIAUCNS.txt",
-                "GDP": "https://fred.stlouisfed.org/data/A191RL1Q225SBEA.txt",
-                "Monetary Base": "https://fred.stlouisfed.org/data/BOGMBASE.txt"
-                
-                }
+# requests and sklearn are slow to import, so they're imported where
+#   they're first needed instead of here
+
+from instrumentation import stage, timed
+from prediction_cache import Lru_cache
+
+# Economic indicators that can be used as features --- { name : Indicator }
+#   (see register_indicator() and the registrations below Indicator)
+indicators = {}
+
+# Names of the indicators used as features of the price models
+econ_features = ("CPI", "GDP", "Monetary Base")
+
+# Local cache of downloaded series: one "<key>.txt" file holding the series
+#   text and one "<key>.json" file holding its HTTP validators (ETag,
+#   Last-Modified) and download time, where <key> is a hash of the url.
+#   It's kept next to the app, whatever folder the app is started from.
+cache_folder = Path(__file__).resolve().parent / "econ_cache"
+# How long a cached series is used as-is before revalidating with the server
+cache_ttl = timedelta(hours=12)
+# If True, never touch the network and only use cached series
+offline_mode = False
+
+# Seconds to wait for each series download before giving up
+fetch_timeout = 10
+# Number of times to retry a failed series download (connection errors and
+#   5xx responses), with exponential backoff between attempts
+fetch_retries = 2
+# Maximum number of series downloaded at the same time
+fetch_workers = 8
+
+# Shared, connection-pooling session used for all series downloads
+session = None
+session_lock = threading.Lock()
+
+# Parsed series kept in memory --- { url : (time loaded, text hash, series) }
+loaded_series = {}
+
+# Regularization coefficients tried by a hyperparameter sweep by default
+default_alphas = (0, 0.001, 0.01, 0.1, 1.0, 10.0, 100.0)
+
+# Economic data as of every day, shared by all items' training sets
+#   --- { tuple of indicator names : Daily_econ_table }
+daily_econ_tables = {}
+daily_econ_lock = threading.Lock()
+
+# Training sets and fitted models of recent predictions, for reuse
+prediction_cache = Lru_cache(max_megabytes=256)
+# Incremental_ridge models whose system of sums has a larger condition
+#   number than this are refit instead, as rounding would change the result
+max_condition_number = 1e10
+
+unix_epoch = date(1970, 1, 1).toordinal()
+
+# A data line of a St. Louis Fed text file, e.g.: "2019-01-01   3.1"
+data_line_pattern = re.compile(r"^(\d{4})-(\d{2})-(\d{2})[ \t]+(\S+)[ \t]*$",
+                               re.MULTILINE)
+
+
+class Econ_series:
+    """ class Econ_series: an economic data series parsed into arrays
+    
+        - ordinals:     sorted numpy array of observation dates, stored as
+                        proleptic Gregorian ordinals (date.toordinal())
+        - values:       numpy array of observation values, in the same order
+    """
+    
+    def __init__(self, ordinals, values):
+        order = np.argsort(ordinals, kind="stable")
+        self.ordinals = np.asarray(ordinals, dtype=np.int64)[order]
+        self.values = np.asarray(values, dtype=np.float64)[order]
+        
+    def __len__(self):
+        return len(self.ordinals)
+    
+    @classmethod
+    def from_text(cls, text):
+        """ Parse the "DATE  VALUE" lines of a St. Louis Fed text file
+        
+            Header lines are skipped, as are missing observations, which the
+            St. Louis Fed writes as "."
+        """
+        ordinals = []
+        values = []
+        for year, month, day, value in data_line_pattern.findall(text):
+            try:
+                value = float(value)
+            except ValueError:
+                continue
+            ordinals.append(date(int(year), int(month), int(day)).toordinal())
+            values.append(value)
+        return cls(ordinals, values)
+    
+    def lookup(self, dates, available_ordinals=None):
+        """ Return the values as of each date in <dates>
+        
+            For every date, find the latest observation on or before that
+            date, all in one vectorized search. Dates earlier than the first
+            observation get NaN.
+            
+            <available_ordinals> are the days the observations can be used
+            from, if not their own dates (see Indicator.available_ordinals).
+        """
+        if available_ordinals is None:
+            available_ordinals = self.ordinals
+        query = date_ordinals(dates)
+        indices = np.searchsorted(available_ordinals, query, side="right") - 1
+        result = self.values[np.maximum(indices, 0)]
+        result[indices < 0] = np.nan
+        return result
+
+
+class Indicator:
+    """ class Indicator: an economic data series used as a model feature
+    
+        - name:         feature (column) name, e.g.: "CPI"
+        - series_id:    St. Louis Fed (FRED) series ID, e.g.: "CPIAUCNS"
+        - frequency:    how often the series is observed: "daily", "weekly",
+                        "monthly", "quarterly" or "annual"
+        - alignment:    the day an observation applies from: "start" (the
+                        date it's listed under, which is the first day of its
+                        period) or "end" (the last day of its period)
+        - lag_days:     days after that until the value is used, e.g. for
+                        the time it takes to be published
+        - description:  what the series measures
+        
+        The value of an indicator as of a date is the latest observation
+        that applies on or before that date.
+    """
+    
+    frequencies = ("daily", "weekly", "monthly", "quarterly", "annual")
+    
+    def __init__(self, name, series_id, frequency, alignment="start",
+                 lag_days=0, description=""):
+        if frequency not in self.frequencies:
+            raise ValueError("Unknown frequency: {}".format(frequency))
+        if alignment not in ("start", "end"):
+            raise ValueError("Alignment must be 'start' or 'end'")
+        self.name = name
+        self.series_id = series_id
+        self.frequency = frequency
+        self.alignment = alignment
+        self.lag_days = lag_days
+        self.description = description
+        
+    def __repr__(self):
+        return "Indicator({!r}, {!r}, {!r}, {!r}, {})".format(
+            self.name, self.series_id, self.frequency, self.alignment,
+            self.lag_days)
+        
+    @property
+    def url(self):
+        return "https://fred.stlouisfed.org/data/{}.txt".format(
+            self.series_id)
+        
+    def available_ordinals(self, ordinals):
+        """ Return the day each observation (dated by <ordinals>) applies
+            from, which keeps the order of <ordinals>
+        """
+        if self.alignment == "end":
+            period_starts = (ordinals - unix_epoch).astype("datetime64[D]")
+            if self.frequency == "daily":
+                period_ends = period_starts
+            elif self.frequency == "weekly":
+                period_ends = period_starts + 6
+            elif self.frequency == "annual":
+                period_ends = (period_starts.astype("datetime64[Y]") + 
+                               1).astype("datetime64[D]") - 1
+            else:
+                months = 3 if self.frequency == "quarterly" else 1
+                period_ends = (period_starts.astype("datetime64[M]") + 
+                               months).astype("datetime64[D]") - 1
+            ordinals = period_ends.astype(np.int64) + unix_epoch
+        if self.lag_days:
+            ordinals = ordinals + self.lag_days
+        return ordinals
+    
+    def lookup(self, series, dates):
+        """ Return the values of <series> (this indicator's Econ_series) as
+            of each date in <dates>
+        """
+        return series.lookup(dates, self.available_ordinals(series.ordinals))
+
+
+def register_indicator(indicator):
+    """ Make <indicator> available as a feature, replacing any indicator
+        with the same name
+    """
+    indicators[indicator.name] = indicator
+    return indicator
+
+# The original features: used as of the date they're listed under
+register_indicator(Indicator("CPI", "CPIAUCNS", "monthly",
+                             description="Consumer price index, all items"))
+register_indicator(Indicator("GDP", "A191RL1Q225SBEA", "quarterly",
+                             description="Real GDP growth, percent annual "
+                                         "rate"))
+register_indicator(Indicator("Monetary Base", "BOGMBASE", "monthly",
+                             description="Monetary base"))
+# Used once their period is over and (about) published
+register_indicator(Indicator("PPI", "PPIACO", "monthly", "end", 14,
+                             "Producer price index, all commodities"))
+register_indicator(Indicator("Food CPI", "CPIUFDNS", "monthly", "end", 14,
+                             "Consumer price index, food"))
+register_indicator(Indicator("Energy CPI", "CPIENGNS", "monthly", "end", 14,
+                             "Consumer price index, energy"))
+register_indicator(Indicator("Wages", "CES0500000003", "monthly", "end", 7,
+                             "Average hourly earnings, private employees"))
+register_indicator(Indicator("M2", "M2SL", "monthly", "end", 28,
+                             "M2 money stock"))
+register_indicator(Indicator("Unemployment", "UNRATE", "monthly", "end", 7,
+                             "Unemployment rate"))
 
-econ_data = {}
 
+def get_session():
+    """ Return the shared requests session, creating it on first use """
+    global session
+    with session_lock:
+        if session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+            from urllib3.util.retry import Retry
+            retry = Retry(total=fetch_retries, backoff_factor=0.5,
+                          status_forcelist=(500, 502, 503, 504),
+                          allowed_methods=("GET",),
+                          raise_on_status=False)
+            adapter = HTTPAdapter(max_retries=retry,
+                                  pool_connections=fetch_workers,
+                                  pool_maxsize=fetch_workers)
+            session = requests.Session()
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+        return session
 
-def access_webpage(url):
-    """ Access webpage using "requests" library,
-          and get ready to scrape data using "BeautifulSoup"
+def cache_paths(url):
+    """ Return the (series text file, metadata file) paths for <url> """
+    key = hashlib.sha1(url.encode("utf-8")).hexdigest()
+    return cache_folder / (key + ".txt"), cache_folder / (key + ".json")
+
+def read_cached_series(url):
+    """ Return (text, metadata) of the cached copy of <url>, or (None, {}) """
+    text_path, meta_path = cache_paths(url)
+    try:
+        text = text_path.read_text(encoding="utf-8")
+        meta = json.loads(meta_path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None, {}
+    return text, meta
+
+def write_cached_series(url, text, meta):
+    """ Store <text> and <meta> as the cached copy of <url>
+    
+        Each file is written to a temporary file first and then renamed, so
+        an interrupted write never leaves a half-written series behind.
+    """
+    cache_folder.mkdir(parents=True, exist_ok=True)
+    text_path, meta_path = cache_paths(url)
+    for path, contents in ((text_path, text), (meta_path, json.dumps(meta))):
+        temp_path = path.with_suffix("{}.{}-{}.tmp".format(
+            path.suffix, os.getpid(), threading.get_ident()))
+        temp_path.write_text(contents, encoding="utf-8")
+        os.replace(temp_path, path)
+
+def fetch_series_text(url):
+    """ Get the text of the data series at <url>, using the local cache
+    
+        - A cached copy younger than <cache_ttl> is returned without any
+          network I/O.
+        - An older copy is revalidated with the server using its ETag and
+          Last-Modified validators; a "304 Not Modified" response just
+          refreshes the copy's download time.
+        - If the server cannot be reached, the cached copy is returned no
+          matter how old it is.
+        - In offline mode only the cache is used.
     """
-    response = requests.get(url)
+    text, meta = read_cached_series(url)
+    
+    if text is not None:
+        age = time.time() - meta.get("fetched", 0)
+        if offline_mode or age < cache_ttl.total_seconds():
+            return text
+    elif offline_mode:
+        raise RuntimeError("Offline mode: no cached copy of " + url)
+    
+    headers = {}
+    if text is not None:
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
     
-#    if response.status_code == 200:
-#        print("Successfully reached", url)
-#    elif response.status_code == 404:
-#        print("!!! Failed to connect to", url)
+    import requests
+    try:
+        with stage("fetch series", url=url) as counts:
+            response = get_session().get(url, headers=headers,
+                                         timeout=fetch_timeout)
+            counts["bytes"] = len(response.content)
+        if response.status_code != 304:
+            response.raise_for_status()
+    except requests.RequestException as error:
+        if text is None:
+            raise
+        print("Could not reach", url, "- using cached copy:", error)
+        return text
     
-    s = BeautifulSoup(response.text, 'html.parser')
-    return s
+    if response.status_code == 304:
+        meta["fetched"] = time.time()
+        write_cached_series(url, text, meta)
+        return text
+    
+    meta = {"url": url,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "fetched": time.time()}
+    write_cached_series(url, response.text, meta)
+    return response.text
 
-def convert_price_data_to_training_set(item, timeframe):
+@timed("convert_price_data_to_training_set")
+def convert_price_data_to_training_set(item, timeframe, econ_table=None):
     """ Generate training set (including y-vales) for predicting item's price
     
         Load the price data of item and add all other feature data to it
@@ -54,25 +351,32 @@ def convert_price_data_to_training_set(item, timeframe):
             (3-12-20, 2.29)          (3-12-20, 2.29, 3400000, 37.3, ... 2.49)
                   .                                     .
                   .         ]                           .                    }
+        
+        The economic data is taken from the shared Daily_econ_table (see
+        get_daily_econ_table()), or from the Daily_econ_table <econ_table>
+        if given, which must cover all of the item's dates and today.
     """
-    assert date.today() >= max(item.price_data.keys())
+    assert date.today().toordinal() >= item.price_data.days[-1]
     
-    data = pd.DataFrame()
-
-    dates = sorted(item.price_data)
-    prices = [item.price_data[date_entry] for date_entry in dates]
+    dates = item.price_data.dates()
+    prices = item.price_data.prices.tolist()
     
     # Add dummy value to use for prediction
     dates.append(date.today())
     prices.append(None)
     
-    data["Date"] = dates
-    data["Price"] = prices
+    columns = {"Date": dates, "Price": prices}
 
     # Add the rest of the feature columns
-    econ_data = obtain_econ_data(dates)
-    for key in econ_data.keys():
-        data[key] = econ_data[key]
+    days = np.append(item.price_data.days, dates[-1].toordinal())
+    if econ_table is None:
+        econ_table = get_daily_econ_table(int(days[0]), int(days[-1]))
+    econ_rows = econ_table.rows(days)
+    for column, key in enumerate(econ_table.features):
+        columns[key] = econ_rows[:, column]
+    
+    # Build the frame in one go, which is much faster than column by column
+    data = pd.DataFrame(columns)
         
     # Add the groundtruth (Y-values) column
 #    data["Y"] = generate_y_values(dates, prices, timeframe)
@@ -110,12 +414,75 @@ def generate_y_values(training_set, timeframe, max_allowed_time_diff = 15):
     prices = training_set["Price"]
     
     length = len(dates)
-    y_values = [None] * length
     
     # Simply use present prices if not trying to predict into the future
     if timeframe <= 0:
         return prices
     
+    if length < 2:
+        return [None] * length
+    
+    days = date_ordinals(dates)
+    
+    # Fall back to comparing every pair of entries if dates are out of order
+    if np.any(np.diff(days) < 0):
+        return generate_y_values_unsorted(dates, prices, timeframe,
+                                          max_allowed_time_diff)
+    
+    closest, in_range = closest_future_entries(days, timeframe,
+                                               max_allowed_time_diff)
+    
+    # If within range, set y-value equal to price at that index
+    y_values = np.full(length, None, dtype=object)
+    y_values[in_range] = np.asarray(prices, dtype=object)[closest[in_range]]
+        
+    return y_values.tolist()
+
+
+def closest_future_entries(days, timeframe, max_allowed_time_diff):
+    """ Find the entry closest to <timeframe> days after each entry
+    
+        <days> is a sorted numpy array of day ordinals.
+    
+         - Return (closest, in_range): the index of the closest later entry
+           for every entry but the last, and the indices of the entries 
+           whose closest entry is less than <max_allowed_time_diff> days off
+    """
+    length = len(days)
+    
+    # Since dates are sorted, the future entry closest to <timeframe> days
+    #   after each entry is either the first one on or after that target day
+    #   ("right"), or the first one on the latest day before it ("left").
+    #   Ties go to the earlier entry, like the strict "<" in the loop version.
+    entry_nums = np.arange(length - 1)
+    targets = days[:-1] + timeframe
+    right = np.searchsorted(days, targets, side="left")
+    left = np.searchsorted(days, days[np.maximum(right - 1, 0)], side="left")
+    left = np.maximum(left, entry_nums + 1)
+    
+    has_right = right < length
+    has_left = right - 1 > entry_nums
+    right_diff = np.where(has_right,
+                          days[np.minimum(right, length - 1)] - targets, 0)
+    left_diff = np.where(has_left, targets - days[left], 0)
+    
+    use_left = has_left & (~has_right | (left_diff <= right_diff))
+    closest = np.where(use_left, left, right)
+    min_diff = np.where(use_left, left_diff, right_diff)
+    
+    return closest, np.flatnonzero(min_diff < max_allowed_time_diff)
+
+
+def generate_y_values_unsorted(dates, prices, timeframe,
+                               max_allowed_time_diff):
+    """ Generate y-values by comparing each entry with every later entry
+    
+        Used by generate_y_values() when the dates are not in order. Takes
+        O(n^2) time.
+    """
+    length = len(dates)
+    y_values = [None] * length
+    
     for entry_num in range(0, length-1):
         
         # Create list of time differences between entry and future entries
@@ -139,14 +506,90 @@ def generate_y_values(training_set, timeframe, max_allowed_time_diff = 15):
     return y_values
 
 
+def date_ordinals(dates):
+    """ Convert a sequence of dates into a numpy array of day ordinals """
+    if isinstance(dates, (pd.Series, pd.Index, np.ndarray)):
+        if np.issubdtype(dates.dtype, np.datetime64):
+            days = np.asarray(dates, dtype="datetime64[D]").astype(np.int64)
+            return days + unix_epoch
+        if np.issubdtype(dates.dtype, np.integer):
+            # Already day ordinals
+            return np.asarray(dates, dtype=np.int64)
+    return np.fromiter((d.toordinal() for d in dates), dtype=np.int64,
+                       count=len(dates))
+
+
+def get_series(url):
+    """ Get the parsed Econ_series for <url>
+    
+        The series is parsed once per download and kept in memory. While it
+        is younger than <cache_ttl> it is returned without reading the cache
+        or the network at all.
+    """
+    now = time.time()
+    if is_series_fresh(url, now):
+        return loaded_series[url][2]
+    
+    text = fetch_series_text(url)
+    new_hash = hashlib.sha1(text.encode("utf-8")).hexdigest()
+    if url not in loaded_series or loaded_series[url][1] != new_hash:
+        with stage("parse series", bytes=len(text)) as counts:
+            series = Econ_series.from_text(text)
+            counts["rows"] = len(series)
+    else:
+        series = loaded_series[url][2]
+    loaded_series[url] = (now, new_hash, series)
+    return series
+
+def is_series_fresh(url, now):
+    """ Return True if the loaded copy of <url> can be used as it is """
+    if url not in loaded_series:
+        return False
+    return offline_mode or \
+           now - loaded_series[url][0] < cache_ttl.total_seconds()
+
+def get_all_series(features=None):
+    """ Get the parsed Econ_series of every indicator in <features>
+        (default: econ_features)
+    
+         - Return a dict of { "econ data point name" : Econ_series }
+         
+        All series are downloaded concurrently, so the total time is about
+        that of the slowest single series.
+    """
+    keys = list(econ_features if features is None else features)
+    urls = [indicators[key].url for key in keys]
+    
+    # Skip starting threads when every series is already loaded
+    now = time.time()
+    if all(is_series_fresh(url, now) for url in urls):
+        return {key: loaded_series[url][2] for key, url in zip(keys, urls)}
+    
+    with ThreadPoolExecutor(max_workers=max(1, min(fetch_workers, 
+                                                   len(urls)))) as executor:
+        all_series = list(executor.map(get_series, urls))
+        
+    return dict(zip(keys, all_series))
+
+def econ_data_version(features=None):
+    """ Return a value that changes whenever any economic data changes
+    
+        Made of the names, alignments and content hashes of all indicators
+        in <features> (default: econ_features).
+    """
+    keys = list(econ_features if features is None else features)
+    get_all_series(keys)
+    return tuple((key, repr(indicators[key]), 
+                  loaded_series[indicators[key].url][1]) for key in keys)
+
 def get_stlouisfed_data(url, dates):
     """ Get data from the St. Louis Fed website
     
         Get the data points from the St. Louis Fed website specified
         by <url>, for the specified dates <dates>
         
-        Search backward from the latest data point to the earliest. Find
-        the data point from the date most recently before the specified date.
+        Find the data point from the date most recently before (or on) the
+        specified date.
         
         Example:    url = https://fred.stlouisfed.org/data/A191RL1Q225SBEA.txt
                     dates = [2019-2-3, 2019-3-14, 2019-4-22]
@@ -165,153 +608,240 @@ def get_stlouisfed_data(url, dates):
                             
                  >   return [3.1, 2.0] 
     """
-    data_points = []
+    series = get_series(url)
+    with stage("get_stlouisfed_data", rows=len(dates)):
+        return series.lookup(dates).tolist()
+
+
+def obtain_econ_matrix(dates, features=None):
+    """ Get the economic data of many indicators for many dates at once
     
-    soup = str(access_webpage(url))
+         - Return a float array of shape (len(dates), len(features)): one
+           row per date and one column per indicator in <features> 
+           (default: econ_features). <dates> may also be day ordinals.
+           
+        The dates are converted once, and each indicator is looked up with
+        one vectorized search straight into its column, so time and memory
+        grow with the size of the result, not with a copy per indicator.
+        Nothing is shared between calls, so it's safe to use from several
+        threads.
+    """
+    keys = list(econ_features if features is None else features)
+    all_series = get_all_series(keys)
+    days = date_ordinals(dates)
+    matrix = np.empty((len(days), len(keys)))
+    with stage("obtain_econ_data", rows=len(days), columns=len(keys)):
+        for column, key in enumerate(keys):
+            matrix[:, column] = indicators[key].lookup(all_series[key], days)
+    return matrix
+
+class Daily_econ_table:
+    """ class Daily_econ_table: the economic data as of every day of a range
     
-    for d in dates:
-        # Find data line corresponding to the given date
-        start = soup.rfind(str(d))
+        - first_day, last_day:  date ordinals of the first and last day
+        - features:             names of the indicators, one per column
+        - values:               read-only float array of shape 
+                                (days, features): row i holds the value of
+                                each indicator as of day first_day + i, 
+                                i.e. forward-filled from its latest
+                                observation (NaN before the first one)
+        - version:              econ_data_version() of the data it was
+                                built from
+                                
+        A table is never changed after it's built, so threads can share it.
+    """
     
-        # If date not found, try changing the day to the 1st of the month
-        if start == -1:
-            d = date(d.year, d.month, 1)
-            start = soup.rfind(str(d))
-            
-        # If date still not found, try subtracting the month, then the year,
-        #   by 1 until a match is found, or until break loop limit is reached
-        break_loop = 1000
-        while start == -1 and break_loop > 0:
-            break_loop -= 1
-            if d.month > 1:
-                d = date(d.year, d.month-1, 1)
-            else:
-                d = date(d.year - 1, 12, 1)
-            start = soup.rfind(str(d))
+    def __init__(self, first_day, last_day, features):
+        self.features = tuple(features)
+        self.version = econ_data_version(self.features)
+        self.first_day = first_day
+        self.last_day = last_day
+        days = np.arange(first_day, last_day + 1, dtype=np.int64)
+        with stage("build daily econ table", rows=len(days), 
+                   columns=len(self.features)):
+            self.values = obtain_econ_matrix(days, self.features)
+        self.values.flags.writeable = False
         
-        end = soup.find("\n", start)
-        line = soup[start:end]
+    @property
+    def nbytes(self):
+        return self.values.nbytes
         
-        data_points.append(float(line.split(" ")[-1]))
-
-    return data_points
+    def covers(self, first_day, last_day):
+        return self.first_day <= first_day and last_day <= self.last_day
+        
+    def rows(self, days):
+        """ Return the rows of the days (date ordinals) in <days>
+        
+            Gathered with one index into the table, with no lookups. A slice
+            of days (e.g. rows(range(a, b))) gives a view instead of a copy.
+        """
+        if isinstance(days, range) and days.step == 1 and len(days) > 0:
+            if not self.covers(days[0], days[-1]):
+                raise ValueError("Days outside the economic data table")
+            return self.values[days[0] - self.first_day:
+                               days[-1] + 1 - self.first_day]
+        indices = np.asarray(days, dtype=np.int64) - self.first_day
+        if len(indices) > 0 and (indices.min() < 0 or 
+                                 indices.max() >= len(self.values)):
+            raise ValueError("Days outside the economic data table")
+        return self.values[indices]
 
 
-def obtain_econ_data(dates):
-    """ Get all economic data points for the list of dates provided
+def get_daily_econ_table(first_day, last_day, features=None):
+    """ Get the shared Daily_econ_table of <features> (default: 
+        econ_features) covering first_day to last_day (date ordinals)
     
-         - Return a dict of { "econ data point name" : [data points(float)] }
-        
-        Example: 
-                    dates: [2020-2-3, 2020-2-14, 2020-3-22]
-            
-                 { "CPI" : [256.389,  243.221,   270.238  ]
-                   "GDP" : [-4.8,     -4.8,      -4.8     ]
-                         .
-                         .
-                         .                                 }
+        The table is rebuilt only when the economic data changes or a day
+        outside it is needed. It then covers its old range as well, so
+        items with different dates share one table.
     """
-    
-    for key, url in econ_sources.items():
-        econ_data[key] = get_stlouisfed_data(url, dates)
-
-    return econ_data
+    keys = tuple(econ_features if features is None else features)
+    version = econ_data_version(keys)
+    with daily_econ_lock:
+        table = daily_econ_tables.get(keys)
+        if table is not None and table.version == version:
+            if table.covers(first_day, last_day):
+                return table
+            first_day = min(first_day, table.first_day)
+            last_day = max(last_day, table.last_day)
+        table = Daily_econ_table(first_day, last_day, keys)
+        daily_econ_tables[keys] = table
+        return table
 
 
+@timed("predict_single_item")
 def predict_single_item(item, 
                         timeframe=0, 
                         polynomial_order=1, 
                         regularization_coeff=0,
-                        saved_training_set=None):
+                        saved_training_set=None,
+                        cache=prediction_cache):
+    """ Predict the price of item <timeframe> days from today
     
+         - Return (prediction dates, predicted price, prediction curve, 
+           training set)
+           
+        Training sets and fitted models are kept in <cache>, keyed by the
+        item, its price data, the economic data version and the model 
+        parameters, so repeating a prediction reuses them. When prices have
+        only been added since the last prediction with the same parameters,
+        that model is updated with the new rows (see Incremental_ridge)
+        instead of being rebuilt. Pass cache=None to always rebuild.
+    """
     if saved_training_set is not None:
-        training_set = saved_training_set
-    else:
+        return predict_from_training_set(saved_training_set, timeframe,
+                                         polynomial_order, 
+                                         regularization_coeff)
+    
+    if cache is None:
         # Generate training set
         training_set = convert_price_data_to_training_set(item, timeframe)
-        
+        return predict_from_training_set(training_set, timeframe,
+                                         polynomial_order, 
+                                         regularization_coeff)
     
-    training_set["Y"] = generate_y_values(training_set, timeframe)
+    training_set_key = ("training set", item.identity, 
+                        item.price_data.fingerprint(), econ_data_version(),
+                        date.today())
+    model_key = ("model",) + training_set_key[1:] + \
+                (timeframe, polynomial_order, regularization_coeff)
     
-    x = training_set.copy(deep=False)
+    model_result = cache.get(model_key)
+    if model_result is not None:
+        return model_result[1:]
     
-    features = x.columns
-    for feature in features:
-        if feature == "Date" or feature == "Price":
-            continue
-        if feature == "Y":
-            break
-        col = x[feature]
-
-        # Feature scaling
-
-        # Regular mean normalization (will include negative values)
-#        col = (col - col.mean()) / col.std()
-        
-        # Mean normalization between range a and b (all positive to allow sqrt)
-        a = 0.001
-        b = 2.999
-        data_range = max(col) - min(col)
-        # Avoid dividing by 0 when all econ data points are the same
-        if data_range == 0:
-            data_range = 1
-            
-        col = a + ((col - min(col))*(b - a) / (data_range))
+    # After new prices are entered, update the previous model if possible
+    incremental_key = ("incremental model", item.identity) + \
+                      training_set_key[3:] + model_key[-3:]
+    incremental_model = cache.get(incremental_key)
+    if incremental_model is not None and \
+            incremental_model.update(item.price_data):
+        model_result = incremental_model.model_result()
+        cache.put(model_key, model_result)
+        # Put back to account for its new size
+        cache.put(incremental_key, incremental_model)
+        return model_result[1:]
+    
+    training_set = cache.get(training_set_key)
+    if training_set is None:
+        # Generate training set
+        training_set = convert_price_data_to_training_set(item, timeframe)
+        cache.put(training_set_key, training_set)
         
-        x[feature] = col
+    model_result = fit_model(training_set.copy(deep=False), timeframe,
+                             polynomial_order, regularization_coeff)
+    cache.put(model_key, model_result)
+    # Without regularization the model is always refit (see
+    #   Incremental_ridge.is_solvable), so there's nothing to keep
+    if regularization_coeff > 0:
+        cache.put(incremental_key, Incremental_ridge(training_set, timeframe,
+                                                     polynomial_order,
+                                                     regularization_coeff))
+    return model_result[1:]
 
-        # Add polynomial terms
-        if polynomial_order > 1:
-            
-            exponents = [e for e in range(2, polynomial_order + 1)]
-            # Add a square root term
-            exponents.append(1/2)
-            for exponent in exponents:
-                # New feature column: "Date^2", "Price^2", "CPI^2", etc.
-                feature_with_exponent = "^".join([feature, str(exponent)])
-                x[feature_with_exponent] = x[feature] ** exponent
-        
-    # Regularized linear regression
-    
-    # Convert dates to integers denoting days since earliest date
-    earliest_date = min(x["Date"])
-    days_since_earliest = []
-    for date_entry in x["Date"]:
-        days_since_earliest.append((date_entry - earliest_date).days)
-    x["Date"] = days_since_earliest
-    prediction_days_since_earliest = max(days_since_earliest)
-    
-    # Extract last row to use for prediction
-    prediction_input = x[-1:]
-    prediction_input = prediction_input.drop(["Price", "Y"], axis=1)
+
+def predict_from_training_set(training_set,
+                              timeframe=0,
+                              polynomial_order=1,
+                              regularization_coeff=0):
+    """ Fit a regression model to training_set and predict the future price
     
-    # Remove rows with null values - will eliminate prediction row at bottom
-    x = x.dropna()   
+         - Return (prediction dates, predicted price, prediction curve, 
+           training set)
+    """
+    return fit_model(training_set, timeframe, polynomial_order, 
+                     regularization_coeff)[1:]
 
-    # Separate x and y values and remove price column from x
-    y = x["Y"]
-    x = x.drop(["Price", "Y"], axis=1)
+
+def fit_model(training_set, timeframe, polynomial_order, regularization_coeff):
+    """ Fit a regression model to training_set and predict the future price
+    
+         - Return (fitted model, prediction dates, predicted price, 
+           prediction curve, training set)
+    """
+    with stage("build_features", rows=len(training_set)) as counts:
+        x, y, prediction_input, earliest_date, feature_names = \
+            build_features(training_set, timeframe, polynomial_order)
+        counts["columns"] = x.shape[1]
     
 #    print("Training set after processing:\n", x)
 #    print("Y-column:\n", y)
 #    print("Prediction input:\n", prediction_input)
     
-    # Train model
+    # Train regularized linear regression model
+    from sklearn import linear_model
     reg = linear_model.Ridge(alpha=regularization_coeff)
-    reg.fit(x, y)
+    with stage("fit", rows=x.shape[0], columns=x.shape[1]):
+        reg.fit(x, y)
+    # Keep the feature names for reporting
+    reg.feature_names = feature_names
     
-    # Predict single price for the timeframe specified
-    predicted_price = reg.predict(prediction_input)[0]
-#    print("Predicted price: ", predicted_price)
+    offset_list, predicted_price, prediction_curve = model_outputs(
+        reg, x, prediction_input, earliest_date, timeframe)
+    
+    return reg, offset_list, predicted_price, prediction_curve, training_set
+
+
+def model_outputs(reg, x, prediction_input, earliest_date, timeframe):
+    """ Predict the future price and the prediction curve with a model
     
-    # Generate a prediction curve for illustration
-    prediction_curve = list(reg.predict(x))
+         - Return (prediction dates, predicted price, prediction curve)
+    """
+    prediction_days_since_earliest = int(prediction_input[0, 0])
+    
+    # Predict single price for the timeframe specified
+    with stage("predict", rows=x.shape[0] + 1):
+        predicted_price = reg.predict(prediction_input)[0]
+#        print("Predicted price: ", predicted_price)
+
+        # Generate a prediction curve for illustration
+        prediction_curve = list(reg.predict(x))
     prediction_curve.append(predicted_price)
 #    print("Prediction curve: ", prediction_curve)
 #    print("Days list:", x["Date"])
     
     # Convert date column back into Date objects
-    date_list = list(x["Date"])
+    date_list = x[:, 0].astype(int).tolist()
     date_list.append(prediction_days_since_earliest)
     # Adjust dates to be offset into the future specified by the timeframe
     offset_list = []
@@ -319,7 +849,635 @@ def predict_single_item(item,
         offset_list.append(earliest_date + timedelta(days=(d + timeframe)))
 #    print("Offset list:", offset_list)
     
-    return offset_list, predicted_price, prediction_curve, training_set
+    return offset_list, predicted_price, prediction_curve
+
+
+class Incremental_ridge:
+    """ class Incremental_ridge: a Ridge model that takes new prices cheaply
+    
+        Built from a training set (see convert_price_data_to_training_set),
+        it keeps the feature matrix of every row and the sums the model is
+        solved from: the count, sum of x, sum of y, x^T x and x^T y over the
+        rows that have a y-value (with x shifted by its initial mean, to 
+        keep the sums accurate).
+        
+        When prices are added after the last one (e.g. after a shopping 
+        trip), update() inserts their rows, recomputes the y-values of only
+        the rows they can affect, and adds / removes just the rows whose 
+        y-values changed to / from the sums. The model is then solved again
+        from a (features x features) system, without rebuilding the training
+        set or refitting. Gives the same model as linear_model.Ridge, up to
+        rounding. Models without regularization, or whose system is ill-
+        conditioned (see max_condition_number), are refit instead.
+        
+        Any other change to the prices, or new economic data outside the
+        range the features were scaled to, needs a full rebuild: update()
+        returns False and changes nothing.
+    """
+    
+    def __init__(self, training_set, timeframe, polynomial_order,
+                 regularization_coeff, max_allowed_time_diff=15):
+        self.timeframe = timeframe
+        self.polynomial_order = polynomial_order
+        self.regularization_coeff = regularization_coeff
+        self.max_allowed_time_diff = max_allowed_time_diff
+        self.lock = threading.Lock()
+        
+        self.econ_columns = [column for column in training_set.columns if
+                             column not in ("Date", "Price", "Y")]
+        self.days = date_ordinals(training_set["Date"])
+        if np.any(np.diff(self.days) < 0):
+            raise ValueError("Training set dates must be in order")
+        self.prices = training_set["Price"].to_numpy(dtype=np.float64,
+                                                     na_value=np.nan)
+        self.econ = training_set[self.econ_columns].to_numpy(dtype=np.float64)
+        
+        # Feature scaling, as in build_features()
+        self.minimums = np.nanmin(self.econ, axis=0, initial=np.inf)
+        self.maximums = np.nanmax(self.econ, axis=0, initial=-np.inf)
+        self.data_ranges = self.maximums - self.minimums
+        self.data_ranges[self.data_ranges == 0] = 1
+        self.exponents = polynomial_exponents(polynomial_order)
+        self.earliest_day = self.days.min()
+        self.x = feature_matrix(self.days - self.earliest_day, self.econ,
+                                self.minimums, self.data_ranges, 
+                                self.exponents)
+        
+        self.y = self.tail_y_values(0)
+        self.is_complete = self.complete_rows(0, self.y)
+        
+        complete_x = self.x[self.is_complete]
+        if len(complete_x) > 0:
+            self.shift = complete_x.mean(axis=0)
+        else:
+            self.shift = np.zeros(self.x.shape[1])
+        self.count = 0
+        self.sum_x = np.zeros(self.x.shape[1])
+        self.sum_y = 0.0
+        self.xx = np.zeros((self.x.shape[1], self.x.shape[1]))
+        self.xy = np.zeros(self.x.shape[1])
+        self.accumulate(np.flatnonzero(self.is_complete), 1)
+        
+    @property
+    def nbytes(self):
+        return sum(array.nbytes for array in (self.days, self.prices, 
+                                              self.econ, self.x, self.y,
+                                              self.is_complete, self.xx))
+    
+    def tail_y_values(self, start):
+        """ Return the y-values of the rows from <start> on
+        
+            Follows generate_y_values(). A row's y-value only depends on the
+            rows after it, so the tail can be recomputed on its own.
+        """
+        days = self.days[start:]
+        prices = self.prices[start:]
+        if self.timeframe <= 0:
+            return prices.copy()
+        y = np.full(len(days), np.nan)
+        if len(days) < 2:
+            return y
+        closest, in_range = closest_future_entries(days, self.timeframe,
+                                                   self.max_allowed_time_diff)
+        y[in_range] = prices[closest[in_range]]
+        return y
+    
+    def complete_rows(self, start, y):
+        """ Return which rows from <start> on have a price, y and features """
+        return ~(np.isnan(self.prices[start:]) | np.isnan(y) | 
+                 np.isnan(self.x[start:]).any(axis=1))
+        
+    def accumulate(self, rows, sign):
+        """ Add (sign=1) or remove (sign=-1) rows to / from the sums """
+        x = self.x[rows] - self.shift
+        y = self.y[rows]
+        self.count += sign * len(rows)
+        self.sum_x += sign * x.sum(axis=0)
+        self.sum_y += sign * y.sum()
+        self.xx += sign * (x.T @ x)
+        self.xy += sign * (x.T @ y)
+        
+    def update(self, price_data):
+        """ Bring the model up to date with an item's Price_history
+        
+             - Return True if the model now matches price_data, or False if
+               it needs a full rebuild (or can't be solved from the sums)
+        """
+        with self.lock:
+            old_size = len(self.days) - 1   # Without today's row
+            if len(price_data) < old_size or \
+                    not np.array_equal(price_data.days[:old_size], 
+                                       self.days[:old_size]) or \
+                    not np.array_equal(price_data.prices[:old_size],
+                                       self.prices[:old_size]):
+                return False
+            if len(price_data) == old_size:
+                return self.is_solvable()
+            
+            new_days = price_data.days[old_size:].astype(np.int64)
+            new_prices = price_data.prices[old_size:]
+            if new_days[-1] > self.days[-1] or \
+                    new_days[0] < self.earliest_day:
+                return False
+            
+            if any(key not in indicators for key in self.econ_columns):
+                return False
+            new_econ = get_daily_econ_table(
+                int(new_days[0]), int(new_days[-1]), 
+                self.econ_columns).rows(new_days)
+            # New values outside the scaled range would change every row
+            if np.any((new_econ < self.minimums) | 
+                      (new_econ > self.maximums)):
+                return False
+            
+            with stage("incremental update", rows=len(new_days)) as counts:
+                self.insert_rows(new_days, new_prices, new_econ)
+                counts["changed_rows"] = self.update_y_values(new_days[0])
+            return self.is_solvable()
+        
+    def is_solvable(self):
+        """ Return True if the sums determine the same model as Ridge """
+        # Without regularization Ridge solves least squares directly, which
+        #   the sums only reproduce when the system is well conditioned (and
+        #   with too few rows there is no unique solution at all). An
+        #   ill-conditioned system loses too many digits to rounding in the
+        #   sums as well.
+        if self.regularization_coeff <= 0 or self.count == 0:
+            return False
+        a = self.normal_equations()[0]
+        return np.linalg.cond(a) <= max_condition_number
+        
+    def insert_rows(self, days, prices, econ):
+        """ Insert new price rows before today's (last) row """
+        position = len(self.days) - 1
+        x = feature_matrix(days - self.earliest_day, econ, self.minimums, 
+                           self.data_ranges, self.exponents)
+        self.days = np.insert(self.days, position, days)
+        self.prices = np.insert(self.prices, position, prices)
+        self.econ = np.insert(self.econ, position, econ, axis=0)
+        self.x = np.insert(self.x, position, x, axis=0)
+        self.y = np.insert(self.y, position, np.full(len(days), np.nan))
+        self.is_complete = np.insert(self.is_complete, position,
+                                     np.zeros(len(days), dtype=bool))
+        
+    def update_y_values(self, first_new_day):
+        """ Recompute the y-values that new rows from <first_new_day> on
+            can change, and update the sums for the rows that changed
+            
+             - Return the number of rows whose y-value changed
+        """
+        # Only entries whose target day (<timeframe> days later) is within
+        #   <max_allowed_time_diff> days of a new entry can get a new y-value
+        start = np.searchsorted(self.days, first_new_day - 
+                                max(self.timeframe, 0) - 
+                                self.max_allowed_time_diff, side="left")
+        new_y = self.tail_y_values(start)
+        new_complete = self.complete_rows(start, new_y)
+        old_y = self.y[start:]
+        old_complete = self.is_complete[start:]
+        changed = (old_complete != new_complete) | \
+                  (new_complete & (old_y != new_y))
+        
+        self.accumulate(start + np.flatnonzero(changed & old_complete), -1)
+        self.y[start:] = new_y
+        self.is_complete[start:] = new_complete
+        self.accumulate(start + np.flatnonzero(changed & new_complete), 1)
+        return int(changed.sum())
+    
+    def normal_equations(self):
+        """ Return the regularized system (a, b) of the centered data that
+            the coefficients solve (a @ coef = b), and the means of x and y
+        """
+        mean_x = self.sum_x / self.count
+        mean_y = self.sum_y / self.count
+        # Sums of the centered data, as Ridge fits the intercept separately
+        a = self.xx - self.count * np.outer(mean_x, mean_x)
+        b = self.xy - self.count * mean_x * mean_y
+        a[np.diag_indices_from(a)] += self.regularization_coeff
+        return a, b, mean_x, mean_y
+        
+    def solve(self):
+        """ Solve for the Ridge model of the current sums
+        
+             - Return a fitted linear_model.Ridge
+        """
+        if self.count == 0:
+            raise ValueError("No prices are {} days apart to train on".format(
+                self.timeframe))
+        a, b, mean_x, mean_y = self.normal_equations()
+        with stage("incremental solve", columns=len(b)):
+            try:
+                coef = np.linalg.solve(a, b)
+            except np.linalg.LinAlgError:
+                coef = np.linalg.lstsq(a, b, rcond=None)[0]
+        
+        from sklearn import linear_model
+        reg = linear_model.Ridge(alpha=self.regularization_coeff)
+        reg.coef_ = coef
+        reg.intercept_ = mean_y - (mean_x + self.shift) @ coef
+        reg.n_features_in_ = len(coef)
+        reg.feature_names = ["Date"] + self.econ_columns + \
+                            ["^".join([feature, str(exponent)]) for 
+                             feature in self.econ_columns for 
+                             exponent in self.exponents]
+        return reg
+    
+    def model_result(self):
+        """ Predict with the current model
+        
+             - Return (fitted model, prediction dates, predicted price, 
+               prediction curve, training set), like fit_model()
+        """
+        with self.lock:
+            reg = self.solve()
+            offset_list, predicted_price, prediction_curve = model_outputs(
+                reg, self.x[self.is_complete], self.x[-1:].copy(),
+                date.fromordinal(int(self.earliest_day)), self.timeframe)
+            
+            columns = {"Date": [date.fromordinal(int(d)) for d in self.days],
+                       "Price": self.prices}
+            for i, key in enumerate(self.econ_columns):
+                columns[key] = self.econ[:, i]
+            columns["Y"] = self.y
+            training_set = pd.DataFrame(columns)
+        return reg, offset_list, predicted_price, prediction_curve, training_set
+
+
+def build_features(training_set, timeframe, polynomial_order):
+    """ Turn a training set into the regression model's inputs
+    
+        Adds the y-values column to training_set, scales the economic data
+        columns, adds polynomial terms and converts dates to days since the
+        earliest date. All features are built in a single contiguous float64
+        matrix, with columns in the order:
+        
+            Date, CPI, GDP, ..., CPI^2, CPI^3, ..., CPI^0.5, GDP^2, ...
+    
+         - Return (x, y, prediction input, earliest date, feature names), 
+           where x and y are numpy arrays of the rows that have a y-value,
+           and prediction input is the last (today's) row of features
+    """
+    with stage("generate_y_values", rows=len(training_set)):
+        training_set["Y"] = generate_y_values(training_set, timeframe)
+    
+    columns = list(training_set.columns)
+    econ_columns = [column for column in columns[:columns.index("Y")] if
+                    column != "Date" and column != "Price"]
+    econ = training_set[econ_columns].to_numpy(dtype=np.float64)
+    
+    # Feature scaling
+    minimums = np.nanmin(econ, axis=0, initial=np.inf)
+    data_ranges = np.nanmax(econ, axis=0, initial=-np.inf) - minimums
+    # Avoid dividing by 0 when all econ data points are the same
+    data_ranges[data_ranges == 0] = 1
+    
+    exponents = polynomial_exponents(polynomial_order)
+        
+    # Convert dates to integers denoting days since earliest date
+    days = date_ordinals(training_set["Date"])
+    earliest_day = days.min()
+    
+    x = feature_matrix(days - earliest_day, econ, minimums, data_ranges,
+                       exponents)
+    
+    feature_names = ["Date"] + econ_columns + \
+                    ["^".join([feature, str(exponent)]) for 
+                     feature in econ_columns for exponent in exponents]
+    
+    # Extract last row to use for prediction
+    prediction_input = x[-1:].copy()
+    
+    # Remove rows with null values - will eliminate prediction row at bottom
+    prices = training_set["Price"].to_numpy(dtype=np.float64, na_value=np.nan)
+    y = training_set["Y"].to_numpy(dtype=np.float64, na_value=np.nan)
+    is_complete = ~(np.isnan(prices) | np.isnan(y) | np.isnan(x).any(axis=1))
+    
+    # Column-major, like the feature matrix of a DataFrame, so that the model
+    #   fit gives exactly the same results as with DataFrame columns
+    x = np.asfortranarray(x[is_complete])
+    
+    return (x, y[is_complete], prediction_input,
+            date.fromordinal(int(earliest_day)), feature_names)
+
+
+def polynomial_exponents(polynomial_order):
+    """ Return the exponents of the polynomial terms of each feature """
+    # Polynomial terms, plus a square root term
+    if polynomial_order > 1:
+        return [e for e in range(2, polynomial_order + 1)] + [1/2]
+    return []
+
+
+def feature_matrix(days_since_earliest, econ, minimums, data_ranges, 
+                   exponents):
+    """ Build the feature matrix from dates and unscaled economic data
+    
+         - Return a column-major float64 array of one row per date, with
+           columns: Date, CPI, GDP, ..., CPI^2, CPI^3, ..., CPI^0.5, GDP^2, ...
+    """
+    # Mean normalization between range a and b (all positive to allow sqrt)
+    a = 0.001
+    b = 2.999
+    econ = a + ((econ - minimums) * (b - a) / data_ranges)
+    
+    rows, n_econ = econ.shape
+    x = np.empty((rows, 1 + n_econ * (1 + len(exponents))), order="F")
+    x[:, 0] = days_since_earliest
+    x[:, 1:1 + n_econ] = econ
+    if len(exponents) > 0:
+        # Group the powers by feature: CPI^2, CPI^3, CPI^0.5, GDP^2, ...
+        powers = np.stack([econ ** exponent for exponent in exponents], 
+                          axis=2)
+        x[:, 1 + n_econ:] = powers.reshape(rows, -1)
+    return x
+
+
+def predict_timeframes(training_set, timeframes, polynomial_order,
+                       regularization_coeff):
+    """ Predict the price of one item for each timeframe in <timeframes>
+    
+         - Return a list of (predicted price, error message) pairs. If the 
+           model can't be fit for a timeframe (e.g. there are no entries far
+           enough apart), the price is NaN and the error message says why.
+    """
+    predictions = []
+    for timeframe in timeframes:
+        try:
+            prediction = predict_from_training_set(training_set.copy(), 
+                                                   timeframe,
+                                                   polynomial_order,
+                                                   regularization_coeff)[1]
+            predictions.append((float(prediction), ""))
+        except ValueError as error:
+            predictions.append((np.nan, str(error)))
+    return predictions
+
+
+def predict_items(items,
+                  timeframes=(30,),
+                  polynomial_order=1,
+                  regularization_coeff=0,
+                  max_workers=None):
+    """ Predict the price of every item in <items> for every timeframe
+    
+        The economic data is aligned once for the span of all the items'
+        dates (see get_daily_econ_table()), and the models are fit for all
+        items in parallel, using up to <max_workers> processes (default:
+        one per CPU core).
+        
+         - Return a DataFrame with one row per item and timeframe:
+         
+            Type  Description  Unit  Store  Location  Timeframe  Date  
+                                                Predicted price  Error
+    """
+    columns = ["Type", "Description", "Unit", "Store", "Location", 
+               "Timeframe", "Date", "Predicted price", "Error"]
+    
+    items = [item for item in items if len(item.price_data) > 0]
+    if len(items) == 0:
+        return pd.DataFrame(columns=columns)
+    
+    first_day = min(int(item.price_data.days[0]) for item in items)
+    econ_table = get_daily_econ_table(first_day, date.today().toordinal())
+    
+    training_sets = [convert_price_data_to_training_set(item, 0, econ_table)
+                     for item in items]
     
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    chunksize = max(1, len(items) // (4 * max_workers))
     
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        all_predictions = executor.map(predict_timeframes, 
+                                       training_sets,
+                                       [timeframes] * len(items),
+                                       [polynomial_order] * len(items),
+                                       [regularization_coeff] * len(items),
+                                       chunksize=chunksize)
+        rows = []
+        for item, predictions in zip(items, all_predictions):
+            for timeframe, (price, error) in zip(timeframes, predictions):
+                rows.append([item.item_type, item.item_description,
+                             item.item_unit_quantity, item.store_name,
+                             item.store_location, timeframe, 
+                             date.today() + timedelta(days=timeframe),
+                             price, error])
+    
+    return pd.DataFrame(rows, columns=columns)
+
+
+def ridge_path(x_train, y_train, x_test, alphas):
+    """ Predict x_test with a Ridge model fit for each alpha in <alphas>
+    
+        All the models share a single SVD of the centered training data, so
+        fitting the whole path of alphas costs about as much as fitting one
+        model. Gives the same models as linear_model.Ridge(alpha), with the
+        intercept left unregularized.
+        
+         - Return an array of predictions of shape (len(alphas), len(x_test))
+    """
+    x_mean = x_train.mean(axis=0)
+    y_mean = y_train.mean()
+    u, s, vt = np.linalg.svd(x_train - x_mean, full_matrices=False)
+    uty = u.T @ (y_train - y_mean)
+    
+    # Singular values too small to matter are dropped, as in a pseudoinverse
+    tolerance = s.max(initial=0) * max(x_train.shape) * np.finfo(float).eps
+    alphas = np.asarray(alphas, dtype=np.float64)[:, np.newaxis]
+    shrink = np.divide(s, s ** 2 + alphas, out=np.zeros((len(alphas), len(s))),
+                       where=s > tolerance)
+    coefficients = (shrink * uty) @ vt
+    
+    return coefficients @ (x_test - x_mean).T + y_mean
 
+
+def sweep_polynomial_order(training_set, timeframe, polynomial_order, alphas,
+                           n_splits, max_allowed_time_diff=15):
+    """ Cross-validate Ridge models of one polynomial order for all alphas
+    
+        The entries are split with time-series cross-validation: every fold
+        is trained on earlier entries and tested on the ones right after 
+        them. Nothing about the test entries is used to train a fold:
+        
+        - Training entries whose y-value is the price of a test entry or a
+          later one (which is the case for the last entries before the test
+          ones, with timeframe > 0) are left out.
+        - The economic data is scaled by its range over the training
+          entries, and test entries' values outside that range are clipped
+          to it.
+        
+         - Return a list of (polynomial order, alpha, mean squared error,
+           standard deviation of the error over folds, number of folds)
+    """
+    y = np.asarray(generate_y_values(training_set, timeframe,
+                                     max_allowed_time_diff), dtype=np.float64)
+    econ_columns = [column for column in training_set.columns if
+                    column not in ("Date", "Price", "Y")]
+    econ = training_set[econ_columns].to_numpy(dtype=np.float64)
+    prices = training_set["Price"].to_numpy(dtype=np.float64, na_value=np.nan)
+    days = date_ordinals(training_set["Date"])
+    rows = np.flatnonzero(~(np.isnan(prices) | np.isnan(y) | 
+                            np.isnan(econ).any(axis=1)))
+    
+    # Day of the price that each entry's y-value is
+    if timeframe <= 0:
+        target_days = days
+    else:
+        closest = closest_future_entries(days, timeframe, 
+                                         max_allowed_time_diff)[0]
+        target_days = np.append(days[closest], days[-1:])
+    
+    n_splits = min(n_splits, len(rows) - 1)
+    if n_splits < 2:
+        raise ValueError("Not enough price entries {} days apart to "
+                         "cross-validate".format(timeframe))
+    
+    from sklearn.model_selection import TimeSeriesSplit
+    exponents = polynomial_exponents(polynomial_order)
+    fold_errors = []
+    for train, test in TimeSeriesSplit(n_splits=n_splits).split(rows):
+        train, test = rows[train], rows[test]
+        train = train[target_days[train] < days[test[0]]]
+        if len(train) == 0:
+            continue
+        
+        minimums = econ[train].min(axis=0)
+        maximums = econ[train].max(axis=0)
+        data_ranges = maximums - minimums
+        data_ranges[data_ranges == 0] = 1
+        earliest_day = days[train].min()
+        x_train = feature_matrix(days[train] - earliest_day, econ[train],
+                                 minimums, data_ranges, exponents)
+        x_test = feature_matrix(days[test] - earliest_day, 
+                                np.clip(econ[test], minimums, maximums),
+                                minimums, data_ranges, exponents)
+        
+        predictions = ridge_path(x_train, y[train], x_test, alphas)
+        fold_errors.append(np.mean((predictions - y[test]) ** 2, axis=1))
+    if len(fold_errors) < 2:
+        raise ValueError("Not enough price entries {} days apart to "
+                         "cross-validate".format(timeframe))
+    fold_errors = np.array(fold_errors)
+    
+    return [(polynomial_order, alpha, error, std, len(fold_errors)) for 
+            alpha, error, std in zip(alphas, fold_errors.mean(axis=0),
+                                     fold_errors.std(axis=0))]
+
+
+def sweep_hyperparameters(item,
+                          timeframe=30,
+                          polynomial_orders=(1, 2, 3, 4, 5),
+                          alphas=default_alphas,
+                          n_splits=5,
+                          max_workers=None,
+                          training_set=None):
+    """ Find the best polynomial order and regularization coeff. for item
+    
+        Every combination of <polynomial_orders> and <alphas> is scored by
+        its mean squared error under time-series cross-validation. The
+        polynomial orders are swept in parallel, using up to <max_workers>
+        processes (default: one per CPU core; 1 to sweep in this process).
+        
+         - Return (best parameters, score table), where best parameters is a
+           dict of { "polynomial_order", "regularization_coeff", 
+           "mean_squared_error" } and score table is a DataFrame with one
+           row per combination, best first
+    """
+    if training_set is None:
+        training_set = convert_price_data_to_training_set(item, timeframe)
+        
+    arguments = ([training_set] * len(polynomial_orders),
+                 [timeframe] * len(polynomial_orders),
+                 polynomial_orders,
+                 [alphas] * len(polynomial_orders),
+                 [n_splits] * len(polynomial_orders))
+    if max_workers == 1:
+        results = list(map(sweep_polynomial_order, *arguments))
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(sweep_polynomial_order, *arguments))
+    
+    scores = pd.DataFrame([row for result in results for row in result],
+                          columns=["Polynomial order", 
+                                   "Regularization coefficient",
+                                   "Mean squared error", "Std", "Folds"])
+    scores = scores.sort_values("Mean squared error", kind="stable")
+    scores = scores.reset_index(drop=True)
+    
+    best = scores.iloc[0]
+    best_parameters = {
+        "polynomial_order": int(best["Polynomial order"]),
+        "regularization_coeff": float(best["Regularization coefficient"]),
+        "mean_squared_error": float(best["Mean squared error"])}
+    return best_parameters, scores
+
+
+def sweep_training_set(training_set, timeframe, polynomial_orders, alphas,
+                       n_splits):
+    """ Sweep one item's hyperparameters in this process
+    
+         - Return (best parameters, error message)
+    """
+    try:
+        return sweep_hyperparameters(None, timeframe, polynomial_orders, 
+                                     alphas, n_splits, max_workers=1,
+                                     training_set=training_set)[0], ""
+    except ValueError as error:
+        return None, str(error)
+
+
+def sweep_items(items,
+                timeframe=30,
+                polynomial_orders=(1, 2, 3, 4, 5),
+                alphas=default_alphas,
+                n_splits=5,
+                max_workers=None):
+    """ Find the best hyperparameters of every item in <items>
+    
+        Like predict_items(), the economic data is fetched once for all
+        items, and the items are swept in parallel processes.
+        
+         - Return a DataFrame with one row per item:
+         
+            Type  Description  Unit  Store  Location  Polynomial order  
+                Regularization coefficient  Mean squared error  Error
+    """
+    columns = ["Type", "Description", "Unit", "Store", "Location", 
+               "Polynomial order", "Regularization coefficient", 
+               "Mean squared error", "Error"]
+    
+    items = [item for item in items if len(item.price_data) > 0]
+    if len(items) == 0:
+        return pd.DataFrame(columns=columns)
+    
+    first_day = min(int(item.price_data.days[0]) for item in items)
+    econ_table = get_daily_econ_table(first_day, date.today().toordinal())
+    
+    training_sets = [convert_price_data_to_training_set(item, 0, econ_table)
+                     for item in items]
+    
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    chunksize = max(1, len(items) // (4 * max_workers))
+    
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        results = executor.map(sweep_training_set,
+                               training_sets,
+                               [timeframe] * len(items),
+                               [polynomial_orders] * len(items),
+                               [alphas] * len(items),
+                               [n_splits] * len(items),
+                               chunksize=chunksize)
+        rows = []
+        for item, (best, error) in zip(items, results):
+            if best is None:
+                best = {"polynomial_order": None, 
+                        "regularization_coeff": np.nan,
+                        "mean_squared_error": np.nan}
+            rows.append([item.item_type, item.item_description,
+                         item.item_unit_quantity, item.store_name,
+                         item.store_location, best["polynomial_order"],
+                         best["regularization_coeff"],
+                         best["mean_squared_error"], error])
+    
+    return pd.DataFrame(rows, columns=columns)
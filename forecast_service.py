@@ -0,0 +1,354 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+A small HTTP/JSON service for price forecasts
+
+Serves the tracked items and their predictions to other programs without
+the GUI. Start it with:
+
+    python cli.py serve --port 8080
+
+Endpoints (all bodies are JSON):
+
+    GET  /items         list all items, with their number of prices and
+                        latest price
+    POST /prices        add a price: {"description", "store", "location",
+                        "date", "price"} (date as YYYY-MM-DD); the item is
+                        saved right away
+    POST /predict       predict a price: {"description", "store",
+                        "location", "timeframe", "polynomial_order",
+                        "regularization_coeff"} (all but description are
+                        optional)
+    GET  /cheapest      the store where each product tracked at several
+                        stores is cheapest, by latest price
+    GET  /stats         request, batch and cache counters, and the time
+                        spent in each stage of the pipeline if metrics
+                        are enabled (python cli.py --metrics serve)
+
+Items are found by description, and by store and location as well when
+the description is used at more than one store.
+
+The service runs on one asyncio event loop. All work on items and models
+is done by a single worker thread, so prices are never changed in the
+middle of a prediction. Prediction requests that arrive close together are
+collected into one batch for the worker, and identical requests in a batch
+are only computed once. The economic data and the fitted models stay in
+memory between requests (see data_analysis.prediction_cache).
+"""
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+import data_analysis
+import instrumentation
+from storage import load_item_index, save_items
+
+status_texts = {200: "OK", 400: "Bad Request", 404: "Not Found",
+                405: "Method Not Allowed", 422: "Unprocessable Entity",
+                500: "Internal Server Error"}
+
+
+class Request_error(Exception):
+    """ An error to report to the client with an HTTP status code """
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class Forecast_service:
+    """ class Forecast_service: serves items and predictions over HTTP
+
+        - location:         items folder or SQLite database to serve
+        - batch_size:       the most prediction requests run as one batch
+        - batch_window:     seconds to wait for more requests to join a
+                            batch after the first one arrives
+    """
+
+    def __init__(self, location=None, batch_size=64, batch_window=0.002):
+        self.location = location
+        self.batch_size = batch_size
+        self.batch_window = batch_window
+        self.item_list = load_item_index(location)
+        # The same description can be used at several stores
+        #   --- { description : [Item, ...] }
+        self.items_by_description = {}
+        for item in self.item_list.values():
+            self.items_by_description.setdefault(item.item_description,
+                                                 []).append(item)
+        # Single worker thread for all item and model work
+        self.worker = ThreadPoolExecutor(max_workers=1)
+        self.predict_queue = None
+        self.counters = {"requests": 0, "predictions": 0, "batches": 0,
+                         "computed": 0}
+
+    async def serve(self, host="127.0.0.1", port=8080):
+        """ Warm up the caches and serve requests until cancelled """
+        loop = asyncio.get_running_loop()
+        # Download (or load from cache) the economic data before serving
+        await loop.run_in_executor(self.worker, data_analysis.get_all_series)
+
+        self.predict_queue = asyncio.Queue()
+        batcher = asyncio.create_task(self.run_batches())
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        print("Serving", len(self.item_list), "items on http://{}:{}".format(
+            host, port))
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batcher.cancel()
+            self.worker.shutdown(wait=False)
+
+    async def handle_connection(self, reader, writer):
+        """ Answer HTTP/1.1 requests on one connection until it is closed """
+        try:
+            while True:
+                request = await read_request(reader)
+                if request is None:
+                    break
+                method, path, headers, body = request
+                self.counters["requests"] += 1
+                try:
+                    status, response = 200, await self.route(method, path,
+                                                             body)
+                except Request_error as error:
+                    status, response = error.status, {"error": str(error)}
+                except Exception as error:
+                    status, response = 500, {"error": repr(error)}
+                keep_alive = headers.get("connection", "").lower() != "close"
+                write_response(writer, status, response, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def route(self, method, path, body):
+        """ Dispatch a request to its endpoint and return the JSON reply """
+        endpoints = {"/items": ("GET", self.list_items),
+                     "/prices": ("POST", self.add_price),
+                     "/predict": ("POST", self.predict),
+                     "/cheapest": ("GET", self.cheapest),
+                     "/stats": ("GET", self.stats)}
+        if path not in endpoints:
+            raise Request_error(404, "No such endpoint: " + path)
+        endpoint_method, endpoint = endpoints[path]
+        if method != endpoint_method:
+            raise Request_error(405, path + " only accepts " + endpoint_method)
+
+        if method == "POST":
+            try:
+                arguments = json.loads(body or b"{}")
+            except ValueError:
+                raise Request_error(400, "Request body is not valid JSON")
+            if not isinstance(arguments, dict):
+                raise Request_error(400, "Request body must be a JSON object")
+            return await endpoint(arguments)
+        return await endpoint()
+
+    async def run_on_worker(self, function, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.worker, function, *args)
+
+    async def list_items(self):
+        return {"items": await self.run_on_worker(self.describe_items)}
+
+    def describe_items(self):
+        items = []
+        for item in self.item_list.values():
+            price_data = item.price_data
+            items.append({
+                "type": item.item_type,
+                "description": item.item_description,
+                "unit": item.item_unit_quantity,
+                "store": item.store_name,
+                "location": item.store_location,
+                "prices": len(price_data),
+                "latest_date": str(price_data.dates()[-1]) if
+                               len(price_data) > 0 else None,
+                "latest_price": float(price_data.prices[-1]) if
+                                len(price_data) > 0 else None})
+        return items
+
+    async def add_price(self, arguments):
+        item = self.find_item(arguments)
+        try:
+            price_date = date.fromisoformat(str(arguments["date"]))
+            price = float(arguments["price"])
+        except (KeyError, ValueError):
+            raise Request_error(400, "Need a 'date' (YYYY-MM-DD) and a "
+                                     "numeric 'price'")
+        await self.run_on_worker(self.store_price, item, price_date, price)
+        return {"description": item.item_description,
+                "store": item.store_name, "location": item.store_location,
+                "date": str(price_date), "price": price}
+
+    def store_price(self, item, price_date, price):
+        item.add_price_entry(price_date, price)
+        save_items(self.item_list, self.location)
+
+    async def predict(self, arguments):
+        item = self.find_item(arguments)
+        try:
+            key = (item.key,
+                   int(arguments.get("timeframe", 0)),
+                   int(arguments.get("polynomial_order", 1)),
+                   float(arguments.get("regularization_coeff", 0)))
+        except (TypeError, ValueError):
+            raise Request_error(400, "timeframe and polynomial_order must be "
+                                     "integers and regularization_coeff a "
+                                     "number")
+        self.counters["predictions"] += 1
+        result = asyncio.get_running_loop().create_future()
+        await self.predict_queue.put((key, result))
+        return await result
+
+    async def stats(self):
+        return dict(self.counters,
+                    cache=data_analysis.prediction_cache.stats(),
+                    stages=instrumentation.report())
+
+    async def cheapest(self):
+        return {"products": await self.run_on_worker(self.compare_stores)}
+
+    def compare_stores(self):
+        from price_comparison import Price_comparison
+        cheapest = Price_comparison(self.item_list.values()).cheapest()
+        cheapest["date"] = cheapest["date"].dt.strftime("%Y-%m-%d")
+        return cheapest.to_dict(orient="records")
+
+    def find_item(self, arguments):
+        """ Return the item named by the request's description, store and
+            location (the latter two only needed if the description is used
+            at several stores)
+        """
+        description = arguments.get("description")
+        matches = [item for item in
+                   self.items_by_description.get(description, []) if
+                   arguments.get("store", item.store_name) == item.store_name
+                   and arguments.get("location", item.store_location) ==
+                   item.store_location]
+        if len(matches) == 0:
+            raise Request_error(404, "No such item: {}".format(description))
+        if len(matches) > 1:
+            raise Request_error(400, "{} is sold at several stores: give "
+                                     "its store and location".format(
+                                         description))
+        return matches[0]
+
+    async def run_batches(self):
+        """ Collect queued prediction requests and run them in batches """
+        while True:
+            batch = [await self.predict_queue.get()]
+            deadline = asyncio.get_running_loop().time() + self.batch_window
+            while len(batch) < self.batch_size:
+                remaining = deadline - asyncio.get_running_loop().time()
+                try:
+                    batch.append(await asyncio.wait_for(
+                        self.predict_queue.get(), max(remaining, 0)))
+                except asyncio.TimeoutError:
+                    break
+
+            self.counters["batches"] += 1
+            keys = list({key: None for key, _ in batch})
+            try:
+                results = await self.run_on_worker(self.predict_batch, keys)
+            except Exception as error:
+                # Fail this batch's requests, but keep serving later ones
+                error = Request_error(500, "Prediction failed: {!r}".format(
+                    error))
+                results = {key: error for key in keys}
+            for key, future in batch:
+                if not future.done():
+                    if isinstance(results[key], Exception):
+                        future.set_exception(results[key])
+                    else:
+                        future.set_result(results[key])
+
+    def predict_batch(self, keys):
+        """ Compute the predictions for a batch of unique request keys
+
+            - Return a dict of { key : JSON reply or Request_error }
+        """
+        results = {}
+        for key in keys:
+            item_key, timeframe, polynomial_order, regularization = key
+            description, store, location = item_key
+            self.counters["computed"] += 1
+            item = self.item_list[item_key]
+            try:
+                if len(item.price_data) == 0:
+                    raise ValueError("the item has no prices")
+                prediction = data_analysis.predict_single_item(
+                    item, timeframe, polynomial_order, regularization)[1]
+            except (AssertionError, ValueError) as error:
+                results[key] = Request_error(
+                    422, "Can't predict {}: {}".format(description, error))
+                continue
+            except Exception as error:
+                # E.g. no economic data, offline and without a cache
+                results[key] = Request_error(
+                    500, "Can't predict {}: {!r}".format(description, error))
+                continue
+            results[key] = {
+                "description": description,
+                "store": store,
+                "location": location,
+                "timeframe": timeframe,
+                "date": str(date.today() + timedelta(days=timeframe)),
+                "polynomial_order": polynomial_order,
+                "regularization_coeff": regularization,
+                "predicted_price": float(prediction)}
+        return results
+
+
+async def read_request(reader):
+    """ Read one HTTP request from reader
+
+        - Return (method, path, headers, body), or None if the connection
+          was closed before a new request started
+    """
+    request_line = await reader.readline()
+    if not request_line:
+        return None
+    try:
+        method, target, _ = request_line.decode("latin-1").split(" ", 2)
+    except ValueError:
+        raise ConnectionError("Malformed request line")
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    length = int(headers.get("content-length", 0))
+    body = await reader.readexactly(length) if length > 0 else b""
+    return method.upper(), target.split("?", 1)[0], headers, body
+
+
+def write_response(writer, status, response, keep_alive=True):
+    """ Write an HTTP response with a JSON body to writer """
+    body = json.dumps(response).encode("utf-8")
+    head = ("HTTP/1.1 {} {}\r\n"
+            "Content-Type: application/json\r\n"
+            "Content-Length: {}\r\n"
+            "Connection: {}\r\n\r\n").format(
+                status, status_texts.get(status, ""), len(body),
+                "keep-alive" if keep_alive else "close")
+    writer.write(head.encode("latin-1") + body)
+
+
+def serve(location=None, host="127.0.0.1", port=8080):
+    """ Run a Forecast_service until interrupted """
+    service = Forecast_service(location)
+    try:
+        asyncio.run(service.serve(host, port))
+    except KeyboardInterrupt:
+        pass
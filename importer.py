@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Streaming import of bulk price data
+
+Adds prices from large CSV or JSON-lines files (exported receipts, scraper
+dumps, etc.) to an items folder or SQLite database:
+
+    python cli.py import prices.csv
+    python cli.py --items items.sqlite import scraped.jsonl
+
+Every row holds one price of one item:
+
+    type, description, unit, store, location, date, price
+
+with the date as YYYY-MM-DD. The column names are not case-sensitive, and
+the names used in item files and SQLite databases (item_type,
+item_description, item_unit_quantity, store_name, store_location) work
+too. An optional store_brand column (true / false) is used for new items.
+
+Rows are matched to items by (type, description, unit, store, location).
+Items that don't exist yet are created. An item gets one price per date.
+A row with the date of an existing entry replaces its price, and so does a
+later row with the same date. Importing the same file twice therefore
+changes nothing the second time.
+
+The file is read in chunks of <chunk_rows> rows, and each chunk is merged
+into the items' price arrays before the next one is read. Memory use is
+bounded by one chunk plus the merged prices (12 bytes per price), not by
+the size of the file. The items are saved once, at the end.
+"""
+import time
+from datetime import date
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from item import Item, Price_history
+from storage import default_location, is_mapped, is_sqlite, load_item_index, \
+                    save_items
+
+identity_columns = ["type", "description", "unit", "store", "location"]
+
+# Other accepted names of the columns --- { alias : column }
+column_aliases = {"item_type": "type",
+                  "item_description": "description",
+                  "item_unit_quantity": "unit",
+                  "unit_quantity": "unit",
+                  "quantity": "unit",
+                  "store_name": "store",
+                  "store_location": "location",
+                  "is_store_brand": "store_brand",
+                  "day": "date"}
+
+jsonl_suffixes = (".jsonl", ".ndjson", ".json")
+
+unix_epoch = date(1970, 1, 1).toordinal()
+
+
+def read_chunks(path, chunk_rows=100000, file_format=None):
+    """ Read a CSV or JSON-lines file of prices in chunks
+
+        - file_format:  "csv" or "jsonl" (default: from the file's suffix)
+
+        - Yield ((identities, rows), fraction of the file read so far) for
+          up to <chunk_rows> rows at a time (see normalize_chunk())
+    """
+    if file_format is None:
+        file_format = "jsonl" if Path(path).suffix.lower() in jsonl_suffixes \
+                      else "csv"
+    if file_format not in ("csv", "jsonl"):
+        raise ValueError("Unknown file format: {}".format(file_format))
+    
+    file_size = max(Path(path).stat().st_size, 1)
+    with open(path, "rb") as f:
+        if file_format == "csv":
+            reader = pd.read_csv(f, chunksize=chunk_rows, dtype=str,
+                                 keep_default_na=False,
+                                 skipinitialspace=True)
+        else:
+            reader = pd.read_json(f, lines=True, chunksize=chunk_rows,
+                                  dtype=False, convert_dates=False)
+        with reader:
+            for chunk in reader:
+                yield normalize_chunk(chunk, file_format == "jsonl"), \
+                      min(f.tell() / file_size, 1.0)
+
+def normalize_chunk(chunk, allow_missing=False):
+    """ Convert a chunk of rows as read from the file
+
+        - Return (identities, rows): identities is a list of the distinct
+          (type, description, unit, store, location) tuples in the chunk,
+          and rows a DataFrame of each row's "item" (index into identities),
+          "date" (day ordinal, or -1 if unreadable), "price" (NaN if 
+          unreadable) and "store_brand" (True / False)
+          
+        If <allow_missing>, missing columns are taken as empty (as for a
+        chunk of JSON lines that all lack a key), otherwise they raise a
+        ValueError.
+    """
+    columns = {}
+    for name in chunk.columns:
+        column = str(name).strip().lower().replace(" ", "_")
+        columns[name] = column_aliases.get(column, column)
+    chunk = chunk.rename(columns=columns)
+    missing = [column for column in identity_columns + ["date", "price"]
+               if column not in chunk.columns]
+    if missing and not allow_missing:
+        raise ValueError("Missing columns: {}".format(", ".join(missing)))
+    for column in missing:
+        chunk[column] = np.nan
+
+    # Code each identity column by its distinct values, so only those have
+    #   to be cleaned up, not every row, and combine the codes into one 
+    #   code per identity
+    items = np.zeros(len(chunk), dtype=np.int64)
+    codes = []
+    values = []
+    for column in identity_columns:
+        row_codes, uniques = pd.factorize(chunk[column].fillna(""))
+        # Values that only differ by surrounding spaces are the same
+        unique_codes, stripped = pd.factorize(
+            np.array([str(value).strip() for value in uniques], dtype=object))
+        codes.append(unique_codes[row_codes])
+        values.append(stripped.tolist())
+        items = pd.factorize(items * len(stripped) + codes[-1])[0]
+    first_rows = np.unique(items, return_index=True)[1]
+    identities = list(zip(*[[column_values[code] for code in 
+                             column_codes[first_rows].tolist()] for 
+                            column_values, column_codes in 
+                            zip(values, codes)]))
+
+    # Dates repeat a lot, so only the distinct ones are parsed
+    date_codes, unique_dates = pd.factorize(chunk["date"].fillna(""))
+    dates = pd.to_datetime(pd.Index(unique_dates).astype(str).str.strip(),
+                           format="%Y-%m-%d", errors="coerce")
+    unique_days = dates.to_numpy(dtype="datetime64[D]").astype(np.int64) + \
+                  unix_epoch
+    unique_days[dates.isna()] = -1
+    days = unique_days[date_codes]
+    if "store_brand" in chunk.columns:
+        store_brands = chunk["store_brand"].astype(str).str.strip() \
+                       .str.lower().isin(["true", "1", "yes", "y"])
+    else:
+        store_brands = False
+    return identities, pd.DataFrame(
+        {"item": items.reshape(-1), "date": days,
+         "price": pd.to_numeric(chunk["price"], errors="coerce"),
+         "store_brand": store_brands}, index=chunk.index)
+
+def group_by_item(items, days, prices):
+    """ Sort the rows of a chunk by item and day, all at once
+
+        Of rows with the same item and day, the last one is kept.
+
+        - Yield (item, first row, sorted days, prices) for each item
+    """
+    if len(items) == 0:
+        return
+    order = np.lexsort((days, items))
+    items = items[order]
+    days = days[order]
+    is_last = np.ones(len(order), dtype=bool)
+    is_last[:-1] = (items[1:] != items[:-1]) | (days[1:] != days[:-1])
+    first_rows = order[np.r_[True, items[1:] != items[:-1]]]
+    order = order[is_last]
+    items = items[is_last]
+    days = days[is_last]
+    prices = prices[order]
+    
+    starts = np.flatnonzero(np.r_[True, items[1:] != items[:-1]])
+    ends = np.r_[starts[1:], len(order)]
+    for start, end, first_row in zip(starts.tolist(), ends.tolist(),
+                                     first_rows.tolist()):
+        yield int(items[start]), first_row, days[start:end], \
+              prices[start:end]
+
+def merge_prices(price_data, days, prices):
+    """ Merge new entries, sorted by day without repeats, into a
+        Price_history
+
+        Entries of <days> already in <price_data> get the new price.
+
+        - Return the merged Price_history
+    """
+    old_days = price_data.days
+    # Usually the new entries all come after the old ones
+    if len(old_days) == 0 or days[0] > old_days[-1]:
+        return Price_history.from_sorted(
+            np.concatenate([old_days, days]),
+            np.concatenate([price_data.prices, prices]))
+    
+    positions = np.searchsorted(old_days, days)
+    exists = positions < len(old_days)
+    exists[exists] = old_days[positions[exists]] == days[exists]
+    old_prices = price_data.prices.copy()
+    old_prices[positions[exists]] = prices[exists]
+    
+    # Both are sorted, so each new day's place in the merged arrays follows
+    #   from its position among the old days, without sorting again
+    is_new = ~exists
+    new_slots = positions[is_new] + np.arange(np.count_nonzero(is_new))
+    is_old = np.ones(len(old_days) + len(new_slots), dtype=bool)
+    is_old[new_slots] = False
+    merged_days = np.empty(len(is_old), dtype=np.int32)
+    merged_days[is_old] = old_days
+    merged_days[new_slots] = days[is_new]
+    merged_prices = np.empty(len(is_old), dtype=np.float64)
+    merged_prices[is_old] = old_prices
+    merged_prices[new_slots] = prices[is_new]
+    return Price_history.from_sorted(merged_days, merged_prices)
+
+def count_changes(original, merged):
+    """ Return (entries added, entries whose price changed) from the
+        Price_history <original> to <merged>, which has all of its days
+    """
+    positions = np.searchsorted(merged.days, original.days)
+    updated = np.count_nonzero(merged.prices[positions] != original.prices)
+    return len(merged) - len(original), int(updated)
+
+def import_prices(path, location=None, chunk_rows=100000, file_format=None,
+                  progress=None):
+    """ Import the prices in a CSV or JSON-lines file into the items saved
+        at <location> (an items folder, SQLite database or memory-mapped
+        store)
+
+        - progress:     function called after every chunk with the stats
+                        so far (see below) and the fraction of the file
+                        read
+
+        - Return a dict of stats: rows read, rows skipped (unreadable date
+          or price, or empty identity), rows conflicting (description
+          already used at the same store and location by an item of
+          another type or unit), new items, prices added and
+          changed, items saved, seconds and rows per second
+    """
+    if location is None:
+        location = default_location
+    start = time.perf_counter()
+    if not is_sqlite(location) and not is_mapped(location):
+        Path(location).mkdir(parents=True, exist_ok=True)
+
+    item_list = load_item_index(location)
+    items_by_identity = {item.identity: item for item in item_list.values()}
+    # Price data of every item the import has touched, before the import
+    #   --- { item identity : Price_history }
+    original_prices = {}
+    stats = {"rows": 0, "skipped": 0, "conflicting": 0, "new_items": 0,
+             "added": 0, "updated": 0, "saved_items": 0, "seconds": 0.0,
+             "rows_per_second": 0.0}
+
+    for (identities, chunk), fraction in read_chunks(path, chunk_rows,
+                                                     file_format):
+        stats["rows"] += len(chunk)
+        is_valid = (chunk["date"] >= 0) & chunk["price"].notna()
+        stats["skipped"] += int((~is_valid).sum())
+        chunk = chunk[is_valid]
+
+        days = chunk["date"].to_numpy()
+        prices = chunk["price"].to_numpy(dtype=np.float64)
+        store_brands = chunk["store_brand"].to_numpy()
+        item_numbers = chunk["item"].to_numpy()
+        row_counts = np.bincount(item_numbers, minlength=len(identities))
+        for item_number, first_row, item_days, item_prices in \
+                group_by_item(item_numbers, days, prices):
+            identity = identities[item_number]
+            item = items_by_identity.get(identity)
+            if "" in identity:
+                stats["skipped"] += int(row_counts[item_number])
+                continue
+            if item is None:
+                if (identity[1], identity[3], identity[4]) in item_list:
+                    stats["conflicting"] += int(row_counts[item_number])
+                    continue
+                item = Item(*identity,
+                            is_store_brand=bool(store_brands[first_row]))
+                item_list[item.key] = item
+                items_by_identity[identity] = item
+                stats["new_items"] += 1
+            if identity not in original_prices:
+                original_prices[identity] = item.price_data
+            item.price_data = merge_prices(item.price_data, item_days,
+                                           item_prices)
+
+        stats["seconds"] = time.perf_counter() - start
+        stats["rows_per_second"] = stats["rows"] / max(stats["seconds"],
+                                                       1e-9)
+        if progress is not None:
+            progress(stats, fraction)
+
+    # Only items that end up different are saved, so importing a file
+    #   twice writes nothing the second time
+    for identity, original in original_prices.items():
+        item = items_by_identity[identity]
+        added, updated = count_changes(original, item.price_data)
+        if added or updated:
+            item.is_modified = True
+            stats["added"] += added
+            stats["updated"] += updated
+        else:
+            item.price_data = original
+
+    stats["saved_items"] = save_items(item_list, location)
+    stats["seconds"] = time.perf_counter() - start
+    stats["rows_per_second"] = stats["rows"] / max(stats["seconds"], 1e-9)
+    return stats
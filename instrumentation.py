@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Opt-in timing of the stages of the prediction pipeline
+
+When enabled, every stage wrapped in stage() (fetching and parsing economic
+data, looking it up, generating y-values, building features, fitting and
+predicting) records its wall time and counts such as bytes fetched and rows
+and columns processed. Totals per stage are kept in a metrics dict, and
+each stage run can also be logged as a structured record:
+
+    import instrumentation
+    instrumentation.enable(log=True)
+    predict_single_item(item, 30)
+    print(instrumentation.format_report())
+
+From the command line:
+
+    python cli.py --metrics predict
+    python cli.py --profile predict.prof predict
+
+When disabled (the default), stage() only costs a function call.
+
+Metrics are kept per process: stages run in the worker processes of
+data_analysis.predict_items are not counted in the parent.
+"""
+import cProfile
+import functools
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger("instrumentation")
+
+enabled = False
+log_stages = False
+
+# { stage name : { "calls", "seconds", "max_seconds", counter totals... } }
+metrics = {}
+metrics_lock = threading.Lock()
+
+
+def enable(log=False):
+    """ Start recording stage metrics, and log each stage run if log """
+    global enabled, log_stages
+    enabled = True
+    log_stages = log
+
+def disable():
+    global enabled
+    enabled = False
+
+def reset():
+    """ Forget all recorded metrics """
+    with metrics_lock:
+        metrics.clear()
+
+def report():
+    """ Return a copy of the metrics dict """
+    with metrics_lock:
+        return {name: dict(totals) for name, totals in metrics.items()}
+
+@contextmanager
+def stage(name, **counts):
+    """ Time the enclosed block as one run of stage <name>
+
+        Yields a dict of counts (initially <counts>) that the block can add
+        to, e.g. counts["rows"] = len(data). Numeric counts are summed over
+        all runs of the stage.
+    """
+    if not enabled:
+        yield counts
+        return
+    start = time.perf_counter()
+    try:
+        yield counts
+    finally:
+        seconds = time.perf_counter() - start
+        record(name, seconds, counts)
+
+def timed(name):
+    """ Decorator that times every call of a function as stage <name> """
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def record(name, seconds, counts):
+    """ Add one run of stage <name> to the metrics and log it """
+    with metrics_lock:
+        totals = metrics.setdefault(name, {"calls": 0, "seconds": 0.0,
+                                           "max_seconds": 0.0})
+        totals["calls"] += 1
+        totals["seconds"] += seconds
+        totals["max_seconds"] = max(totals["max_seconds"], seconds)
+        for key, value in counts.items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                totals[key] = totals.get(key, 0) + value
+    if log_stages:
+        logger.info("stage=%s seconds=%.6f %s", name, seconds,
+                    " ".join("{}={}".format(key, value) for key, value in
+                             counts.items()),
+                    extra={"stage": name, "seconds": seconds,
+                           "counts": counts})
+
+def format_report():
+    """ Return the metrics as a text table, slowest stages first """
+    totals = report()
+    counter_names = sorted({key for stage_totals in totals.values() for key
+                            in stage_totals} -
+                           {"calls", "seconds", "max_seconds"})
+    lines = ["{:<36}{:>8}{:>12}{:>12}".format("Stage", "Calls", "Total s",
+                                             "Max s") +
+             "".join("{:>14}".format(name) for name in counter_names)]
+    for name, stage_totals in sorted(totals.items(),
+                                     key=lambda entry: -entry[1]["seconds"]):
+        lines.append("{:<36}{:>8}{:>12.4f}{:>12.4f}".format(
+            name, stage_totals["calls"], stage_totals["seconds"],
+            stage_totals["max_seconds"]) +
+            "".join("{:>14}".format(stage_totals.get(counter, ""))
+                    for counter in counter_names))
+    return "\n".join(lines)
+
+@contextmanager
+def profile(filename):
+    """ Profile the enclosed block with cProfile and save the stats
+
+        Open the file with e.g. "python -m pstats <filename>" or snakeviz.
+    """
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        profiler.dump_stats(str(filename))
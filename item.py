@@ -5,6 +5,24 @@ Created on Sun May  3 18:55:14 2020
 
 @author: JamesButcher
 """
+import hashlib
+from collections.abc import Mapping
+from datetime import date
+
+import numpy as np
+
+
+def format_price(price):
+    """ Return price as saved in item files: with two decimals, as in 
+        " 1.99", unless that would round it, in which case all of its
+        digits are kept (repr), so reading the file back gives the same 
+        float
+    """
+    text = "{:>5.2f}".format(price)
+    if float(text) != price:
+        text = repr(float(price))
+    return text
+
 
 class Item:
     """ class Item: a certain product at a store
@@ -21,8 +39,15 @@ class Item:
                                 off of Main street.)
         - is_store_brand:       boolean for whether the product is store brand
         
-        - price_data:           a dictionary containing pairs of date : price
-                                for the price of the item at that date
+        - price_data:           a Price_history containing pairs of 
+                                date : price for the price of the item at
+                                that date
+        - is_modified:          boolean for whether the item has changed
+                                since it was last saved or loaded
+                                
+        The price data can be loaded lazily: set_price_loader() gives a
+        function that returns the item's Price_history, which is then only
+        called the first time price_data is used.
     """
     
     def __init__(self,
@@ -38,23 +63,56 @@ class Item:
         self.store_name = store_name
         self.store_location = store_location
         self.is_store_brand = is_store_brand
-        self.price_data = {}
+        self._price_data = Price_history()
+        self._price_loader = None
+        self.is_modified = True
+        
+    @property
+    def price_data(self):
+        """ The item's Price_history, loaded on first use if necessary """
+        if self._price_data is None:
+            self._price_data = self._price_loader()
+            self._price_loader = None
+        return self._price_data
+    
+    @price_data.setter
+    def price_data(self, price_history):
+        self._price_data = price_history
+        self._price_loader = None
+        
+    @property
+    def identity(self):
+        """ Tuple of the attributes that tell this item apart from others """
+        return (self.item_type, self.item_description, 
+                self.item_unit_quantity, self.store_name, self.store_location)
+    
+    @property
+    def key(self):
+        """ Tuple that item lists are keyed by: no two saved items share the
+            same description at the same store and location
+        """
+        return (self.item_description, self.store_name, self.store_location)
+    
+    @property
+    def is_price_data_loaded(self):
+        return self._price_data is not None
+    
+    def set_price_loader(self, loader):
+        """ Load price data by calling loader() when it is first needed """
+        self._price_data = None
+        self._price_loader = loader
         
     def __repr__(self):
         """ Convert item's data into formatted string for saving """
         attributes = [self.item_type, self.item_description,
                       self.item_unit_quantity, self.store_name,
                       self.store_location, self.is_store_brand]
-        string = "" 
-        for att in attributes:
-            string = string + str(att) + "\n"
-            
-        sorted_dates = sorted(self.price_data)
-        for date_entry in sorted_dates:
-            price = "{:>5.2f}".format(self.price_data[date_entry])
-            string = string + date_entry.__str__() + ", " + price + "\n"
+        lines = [str(att) for att in attributes]
+        
+        for date_entry, price in self.price_data.items():
+            lines.append(str(date_entry) + ", " + format_price(price))
             
-        return string      
+        return "\n".join(lines) + "\n"
     
     def __str__(self):
         """ Print all item attributes and price data in a readable way"""
@@ -63,21 +121,292 @@ class Item:
                  "\nUnit quantity: \t\t" + self.item_unit_quantity + \
                  "\nStore: \t\t\t" + self.store_name + " " + self.store_location + \
                  "\n Date: \t\t Price:\n"
-        sorted_dates = sorted(self.price_data)
-        for date_entry in sorted_dates:
-            price = "{:>5.2f}".format(self.price_data[date_entry])
-            string += str(date_entry) + "\t$" + price + "\n"
+        for date_entry, price in self.price_data.items():
+            string += str(date_entry) + "\t$" + "{:>5.2f}".format(price) + "\n"
             
         return string    
     
     def add_price_entry(self, date_entry, price):
-        """ Add a price entry to the price_data dict 
+        """ Add a price entry to price_data 
         
             { date_entry[type=date] : price[type=float] }
         """
-        self.price_data[date_entry] = price
+        self.price_data.add(date_entry, price)
+        self.is_modified = True
  
     def remove_price_entry(self, removal_date):
         """ Remove price entry at removal_date """
-        del self.price_data[removal_date]
-    
\ No newline at end of file
+        self.price_data.remove(removal_date)
+        self.is_modified = True
+        
+    def mark_saved(self):
+        """ Mark the item as unchanged since it was last saved or loaded """
+        self.is_modified = False
+        
+    def copy(self):
+        """ Return a copy of the item with its own copy of the price data,
+            which later edits of either item don't change
+        """
+        new_item = Item(self.item_type, self.item_description, 
+                        self.item_unit_quantity, self.store_name, 
+                        self.store_location, self.is_store_brand)
+        new_item.price_data = self.price_data.copy()
+        new_item.is_modified = self.is_modified
+        return new_item
+
+
+class Price_history(Mapping):
+    """ class Price_history: an item's prices, always sorted by date
+    
+        Works like a read-only dict of { date : price } that iterates in date
+        order, but stores the entries compactly in two parallel numpy arrays
+        instead of one date object and one float object per entry:
+        
+        - days:     int32 array of dates as day ordinals (date.toordinal())
+        - prices:   float64 array of prices
+        
+        Both are exposed as read-only, zero-copy views. A view reflects the
+        history at the time it was taken; take a new one after adding or 
+        removing entries.
+        
+        Entries are changed with add() and remove(). Adding an entry after
+        the latest date (the usual case) takes amortized constant time. The
+        arrays are copied before the first change after a view of them was
+        taken, so that views never change.
+    """
+    __slots__ = ("_days", "_prices", "_size", "_is_shared")
+    
+    def __init__(self, days=(), prices=()):
+        """ Create a history from sequences of day ordinals and prices
+        
+            The entries don't need to be sorted. If a day occurs more than 
+            once, its last price is kept.
+        """
+        # Every new Item starts with an empty history, so make those cheaply
+        if len(days) == 0 and len(prices) == 0:
+            self._days = np.empty(0, dtype=np.int32)
+            self._prices = np.empty(0, dtype=np.float64)
+            self._size = 0
+            self._is_shared = False
+            return
+        days = np.asarray(days, dtype=np.int32)
+        prices = np.asarray(prices, dtype=np.float64)
+        if len(days) != len(prices):
+            raise ValueError("days and prices must have the same length")
+        
+        order = np.argsort(days, kind="stable")
+        days = days[order]
+        prices = prices[order]
+        # Keep the last entry of each run of equal days
+        is_last = np.ones(len(days), dtype=bool)
+        is_last[:-1] = days[1:] != days[:-1]
+        
+        self._days = days[is_last].copy()
+        self._prices = prices[is_last].copy()
+        self._size = len(self._days)
+        self._is_shared = False
+    
+    @classmethod
+    def from_sorted(cls, days, prices):
+        """ Create a history from arrays of day ordinals and prices that are
+            already sorted by day without repeats, without copying them
+            
+            The arrays may be read-only (e.g. memory-mapped): they're copied
+            the first time an entry is changed, so they're never changed.
+        """
+        history = cls.__new__(cls)
+        history._days = np.asarray(days, dtype=np.int32)
+        history._prices = np.asarray(prices, dtype=np.float64)
+        if len(history._days) != len(history._prices):
+            raise ValueError("days and prices must have the same length")
+        history._size = len(history._days)
+        # The arrays are the caller's
+        history._is_shared = True
+        return history
+    
+    @classmethod
+    def from_dict(cls, price_data):
+        """ Create a history from a dict of { date : price } """
+        return cls([d.toordinal() for d in price_data.keys()],
+                   list(price_data.values()))
+        
+    @property
+    def days(self):
+        """ Read-only view of the sorted day ordinals """
+        view = self._days[:self._size]
+        view.flags.writeable = False
+        self._is_shared = True
+        return view
+    
+    @property
+    def prices(self):
+        """ Read-only view of the prices, in date order """
+        view = self._prices[:self._size]
+        view.flags.writeable = False
+        self._is_shared = True
+        return view
+    
+    def copy(self):
+        """ Return a history with its own copy of the entries """
+        history = Price_history.from_sorted(self._days[:self._size].copy(),
+                                            self._prices[:self._size].copy())
+        history._is_shared = False
+        return history
+    
+    def fingerprint(self):
+        """ Return a hash of all entries, which changes with any edit """
+        digest = hashlib.sha1(self._days[:self._size].tobytes())
+        digest.update(self._prices[:self._size].tobytes())
+        return digest.hexdigest()
+        
+    def dates(self):
+        """ Return a list of the entries' dates, in order """
+        return [date.fromordinal(day) for day in 
+                self._days[:self._size].tolist()]
+    
+    def __len__(self):
+        return self._size
+    
+    def __iter__(self):
+        return iter(self.dates())
+    
+    def __getitem__(self, date_entry):
+        index = self._find(date_entry)
+        if index is None:
+            raise KeyError(date_entry)
+        return float(self._prices[index])
+    
+    def __contains__(self, date_entry):
+        return self._find(date_entry) is not None
+    
+    def __repr__(self):
+        return "Price_history({" + ", ".join(
+            "{}: {}".format(d, p) for d, p in self.items()) + "})"
+    
+    def items(self):
+        """ Return a list of (date, price) pairs, in date order """
+        return list(zip(self.dates(), self._prices[:self._size].tolist()))
+    
+    def values(self):
+        """ Return a list of the prices, in date order """
+        return self._prices[:self._size].tolist()
+    
+    def _find(self, date_entry):
+        """ Return the index of the entry at date_entry, or None """
+        if not isinstance(date_entry, date):
+            return None
+        day = date_entry.toordinal()
+        index = np.searchsorted(self._days[:self._size], day)
+        if index < self._size and self._days[index] == day:
+            return index
+        return None
+    
+    def _make_writeable(self):
+        """ Copy the arrays before changing them if they're read-only (e.g.
+            memory-mapped) or shared with views or another history
+        """
+        if self._is_shared or not self._days.flags.writeable or \
+           not self._prices.flags.writeable:
+            self._days = np.array(self._days[:self._size])
+            self._prices = np.array(self._prices[:self._size])
+            self._is_shared = False
+    
+    def add(self, date_entry, price):
+        """ Add an entry, or replace the price if date_entry already exists """
+        self._make_writeable()
+        day = date_entry.toordinal()
+        size = self._size
+        index = int(np.searchsorted(self._days[:size], day))
+        if index < size and self._days[index] == day:
+            self._prices[index] = price
+            return
+        
+        # Grow the arrays by doubling their capacity when full
+        if size == len(self._days):
+            capacity = max(8, 2 * size)
+            days = np.empty(capacity, dtype=np.int32)
+            prices = np.empty(capacity, dtype=np.float64)
+            days[:size] = self._days[:size]
+            prices[:size] = self._prices[:size]
+            self._days = days
+            self._prices = prices
+            
+        # Shift later entries up by one to make room
+        self._days[index + 1:size + 1] = self._days[index:size]
+        self._prices[index + 1:size + 1] = self._prices[index:size]
+        self._days[index] = day
+        self._prices[index] = price
+        self._size = size + 1
+        
+    def remove(self, date_entry):
+        """ Remove the entry at date_entry """
+        index = self._find(date_entry)
+        if index is None:
+            raise KeyError(date_entry)
+        self._make_writeable()
+        size = self._size
+        self._days[index:size - 1] = self._days[index + 1:size]
+        self._prices[index:size - 1] = self._prices[index + 1:size]
+        self._size = size - 1
+
+
+class Store_index:
+    """ class Store_index: look up items by store name and location
+    
+        Keeps items grouped by (store name, store location) and the 
+        locations of each store, so that finding a store's items or
+        locations doesn't require a scan over every item. Store names and
+        locations are matched case-insensitively.
+        
+        Must be kept up to date with add() and remove() as items are
+        created, loaded or replaced.
+    """
+    
+    def __init__(self, items=()):
+        # { (store, location) : { item_description : Item } }
+        self.items_by_store = {}
+        # { store : { location : location as first entered } }
+        self.locations_by_store = {}
+        # { store : store name as first entered }
+        self.store_names = {}
+        for item in items:
+            self.add(item)
+    
+    def add(self, item):
+        """ Add item to the index """
+        store = item.store_name.lower()
+        location = item.store_location.lower()
+        self.store_names.setdefault(store, item.store_name)
+        self.locations_by_store.setdefault(store, {}).setdefault(
+            location, item.store_location)
+        self.items_by_store.setdefault((store, location), {})[
+            item.item_description] = item
+        
+    def remove(self, item):
+        """ Remove item from the index """
+        store = item.store_name.lower()
+        location = item.store_location.lower()
+        items = self.items_by_store.get((store, location), {})
+        if items.get(item.item_description) is not item:
+            return
+        del items[item.item_description]
+        if len(items) == 0:
+            del self.items_by_store[(store, location)]
+            del self.locations_by_store[store][location]
+            if len(self.locations_by_store[store]) == 0:
+                del self.locations_by_store[store]
+                del self.store_names[store]
+    
+    def stores(self):
+        """ Return the names of all stores """
+        return list(self.store_names.values())
+    
+    def locations(self, store_name):
+        """ Return the locations of the store store_name """
+        return list(self.locations_by_store.get(store_name.lower(), 
+                                                {}).values())
+    
+    def items_at(self, store_name, store_location):
+        """ Return the items from the given store and location """
+        key = (store_name.lower(), store_location.lower())
+        return list(self.items_by_store.get(key, {}).values())
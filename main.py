@@ -20,24 +20,37 @@ ordinary consumer products using machine learning.
 
 """
 
-import matplotlib
-import matplotlib.dates as mdates
 import numpy as np
 #import pandas as pd
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date, timedelta
-from pathlib import Path
 from tkinter import BOTH, Button, Checkbutton, DISABLED, DoubleVar, END, \
                     Entry, Frame, IntVar, Label, LEFT, NORMAL, RIGHT, \
                     Spinbox, StringVar, Tk, TOP, N, S, E, W, X, Y
-from tkinter.ttk import Combobox
+from tkinter.ttk import Combobox, Progressbar
 
-#import data_analysis
-from data_analysis import predict_single_item
-from item import Item
+# matplotlib and data_analysis (with pandas, scikit-learn and requests) take
+#   seconds to import, so they're imported by a background thread after the 
+#   window opens (see warm_up())
+from item import Item, Store_index
+from storage import load_item_index, save_items
 
-# Dictionary of Item objects --- { [Item.item_description1] : [Item1], ...  }
+# Dictionary of Item objects --- { [Item.key1] : [Item1], ...  }
 item_list = {}
 
+# Index of the items in item_list by store name and location
+store_index = Store_index()
+
+# Background thread for fetching economic data and fitting models
+prediction_pool = ThreadPoolExecutor(max_workers=1)
+
+# (future, item, timeframe) of the running prediction, or None
+prediction_job = None
+
+# Milliseconds between checks on the running prediction
+poll_interval = 50
+
 
 # =============================================================================
 # General functions
@@ -58,7 +71,10 @@ def apply_new_item(*events):
     # Create new item and add it to the item list
     new_item = Item(item_type, item_description, item_unit_quantity,
                     store_name, store_location, is_store_brand)
-    item_list[item_description] = new_item
+    if new_item.key in item_list:
+        store_index.remove(item_list[new_item.key])
+    item_list[new_item.key] = new_item
+    store_index.add(new_item)
     
     store_matched_items.append(new_item)
     item_entries.append(Item_entry(new_item))
@@ -88,10 +104,7 @@ def apply_store_selection(*events):
     timeframe_select_box.configure(foreground="black")
            
     # Remove any existing plots from prediction frame
-    ax.cla()
-    # Clear saved training set
-    global old_training_set
-    old_training_set = None
+    clear_plot()
     
     # Enable all the entry fields in new item entry frame
 #    for item_entry in item_entries:
@@ -99,6 +112,7 @@ def apply_store_selection(*events):
     
     # Reset the item entry frame    
     del item_entries[:]
+    del store_matched_items[:]
         
     for widget in exis_item_frame.winfo_children():
         if isinstance(widget, Frame):
@@ -107,14 +121,11 @@ def apply_store_selection(*events):
     # Get list of items from the store provided in the entry boxes
     store = store_var.get()
     location = location_var.get()
-    for i in item_list.values():
-        store_match = i.store_name.lower() == store.lower()
-        location_match = i.store_location.lower() == location.lower()
-        if store_match & location_match:
-            # Add item to local items list
-            store_matched_items.append(i)
-            # Create Item entry object for each item and add to item entries list
-            item_entries.append(Item_entry(i))
+    for i in store_index.items_at(store, location):
+        # Add item to local items list
+        store_matched_items.append(i)
+        # Create Item entry object for each item and add to item entries list
+        item_entries.append(Item_entry(i))
             
     # Load items from store into the item selection box in predict frame
     load_items()
@@ -134,57 +145,63 @@ def enable(*widgets):
     change_state(*widgets, new_state=NORMAL)
     
 def load():
-    """ Load saved item data into item_list """
-    folder = Path.cwd() / "items"
-    filenames = folder.glob("*.txt")
-    for file in filenames:
-        with open(file, "r") as f:
-            # Read item attribute data (description, store, unit quantity, etc)
-            item_type = f.readline().strip("\n")
-            item_description = f.readline().strip("\n")
-            item_unit_quantity = f.readline().strip("\n")
-            store_name = f.readline().strip("\n")
-            store_location = f.readline().strip("\n")
-            is_store_brand = bool(f.readline().strip("\n"))
-                
-            #Create Item object using loaded attributes
-            loaded_item = Item(item_type, item_description, item_unit_quantity,
-                               store_name, store_location, is_store_brand)
-            
-            # Add loaded item to item_list
-            item_list[item_description] = loaded_item
-            
-            # Read price data from remaining lines
-            for line in f:
-                entry = line.strip("\n").split(", ")
-                shopping_date = date.fromisoformat(entry[0])
-                price = float(entry[1])
-                loaded_item.add_price_entry(shopping_date, price)
+    """ Load saved item data into item_list
+    
+        Only the items' attributes are read now. Each item's price data is
+        read the first time it is plotted, predicted or edited.
+    """
+    loaded_items = load_item_index()
+    item_list.update(loaded_items)
+    for item in loaded_items.values():
+        store_index.add(item)
 
  
+def selected_item():
+    """ Return the item of the selected store whose description is chosen
+        in the item selection box
+    """
+    for item in store_index.items_at(store_var.get(), location_var.get()):
+        if item.item_description == item_predict_var.get():
+            return item
+    raise KeyError(item_predict_var.get())
+
 def plot_prices():
     """ Plot prices vs. date for selected item """
     # Get item from item list matching item description in selection box
-    item = item_list[item_predict_var.get()]
+    item = selected_item()
     # Get timeframe in days from timeframe selection box
     timeframe = timeframes[timeframe_var.get()]
     
+    # A prediction still running for the previous plot is no longer wanted
+    cancel_prediction()
+
+    import matplotlib.dates as mdates
+    from price_plot import decimate, to_datetime64
+    if ax is None:
+        create_plot()
+
     # Clear any previous plot
-    ax.cla()
+    clear_plot()
 
     # x = Dates, y = Prices
-    x = sorted(item.price_data)
-    y = [item.price_data[date_entry] for date_entry in x]
+    days = item.price_data.days
+    y = item.price_data.prices
     
-    timerange = (max(x) - min(x)).days + timeframe
+    timerange = int(days[-1] - days[0]) + timeframe
     
-    ax.plot(x, y, 'bo-')
+    # Long histories are decimated to about as many points as there are 
+    #   pixels across the plot
+    shown = decimate(y)
+    price_line.set_data(to_datetime64(days[shown]), y[shown])
+    ax.relim(visible_only=True)
+    ax.autoscale_view()
     
     ax.set_title("Price trend for {}".format(item.item_description), fontsize=18)
     ax.set_xlabel("Date", fontsize=16)
     ax.set_ylabel("Price in $", fontsize=16)
     
-    x_lower_bound = min(x) - timedelta(days=int(0.05*timerange))
+    x_lower_bound = date.fromordinal(int(days[0])) - \
+                    timedelta(days=int(0.05*timerange))
     x_upper_bound = date.today() + timedelta(days=timeframe+int(0.05*timerange))
 
     ax.set_xlim([x_lower_bound, x_upper_bound])
@@ -214,64 +231,103 @@ def plot_prices():
     toolbar.update()
     plot_price_trend()
     enable(plot_controls)
+    show_cheapest_store(item)
+    
+
+def show_cheapest_store(item):
+    """ Show where item's product, at any tracked store, is cheapest now """
+    from price_comparison import Price_comparison, product_key
+    key = product_key(item)
+    prices = Price_comparison(same_product for same_product in
+                              item_list.values() if
+                              product_key(same_product) == key
+                              ).compare_item(item)
+    if len(prices) < 2:
+        cheapest_label.configure(text="")
+        return
+    cheapest = prices.iloc[0]
+    cheapest_label.configure(text="Cheapest at {} ({}): ${:.2f} on {}".format(
+        cheapest["store"], cheapest["location"], cheapest["price"],
+        cheapest["date"].date()))
     
 
 def plot_price_trend():
-    """ Plot a linear or polynomial regression trendline of price vs. date """
-    global trendline
+    """ Plot a linear or polynomial regression trendline of price vs. date 
+    
+        The trendline is only redrawn over a saved image of the rest of the
+        plot (see redraw_trendline()), unless the axes have to grow to fit it.
+    """
+    global plot_background
+    from price_plot import trendline_points
     # Get item from item list matching item description in selection box
-    item = item_list[item_predict_var.get()]
+    item = selected_item()
     # Get timeframe in days from timeframe selection box
     timeframe = timeframes[timeframe_var.get()]
     # Get polynomial order from spinbox
     polynomial_order = int(polynomial_order_spinbox.get())
     
-    # x = Dates, y = Prices
-    x = sorted(item.price_data)
-    y = [item.price_data[date_entry] for date_entry in x]
+    latest_day = (date.today() + timedelta(days=timeframe)).toordinal()
     
-    earliest_date = min(x)
-    latest_date = date.today() + timedelta(days=timeframe)
-    
-    daterange = latest_date - earliest_date
-    dayrange = daterange.days
-    num_bins = 50
-    if dayrange <= num_bins:
-        stride = 1
-    else:
-        stride = int(dayrange / num_bins)
-    
-    # Convert list of dates into int list of days since first date
-    days_since_earliest = []
-    for d in x:
-        elapsed = d - x[0]
-        days_since_earliest.append(elapsed.days)
-    
-    # Perform linear regression (or polynomial reg. if polynomial_order > 1)
-    regression_model = np.polyfit(days_since_earliest, y, polynomial_order)
-    regression_line = np.poly1d(regression_model)
-    
-    x_line = list(range(0, dayrange, stride))
-    
-    date_line = []
-    for i in range(len(x_line)):
-        date_line.append(earliest_date + timedelta(days=i*stride))
-    
-    # Either plot trendline or remove trendline depending on checkbutton state    
-    if len(trendline) > 0:
-        line = trendline.pop(0)
-        line.remove()
-        del line
+    # Either show or hide trendline depending on checkbutton state    
     if to_boolean(show_trendline_var.get()):
-        trendline = ax.plot(date_line, regression_line(x_line), "k--")
+        # Linear regression (or polynomial reg. if polynomial_order > 1)
+        date_line, price_line_values = trendline_points(item, polynomial_order,
+                                                        latest_day)
+        trendline.set_data(date_line, price_line_values)
+        trendline.set_visible(True)
+        bottom, top = ax.get_ylim()
+        if len(price_line_values) > 0 and \
+           (price_line_values.min() < bottom or price_line_values.max() > top):
+            # Make room for the trendline, as for a newly plotted line
+            ax.relim(visible_only=True)
+            ax.autoscale_view()
+            plot_background = None
+    else:
+        trendline.set_visible(False)
 
-    plot_canvas.draw()
+    redraw_trendline()
+
+def redraw_trendline():
+    """ Draw the trendline over the saved plot image (blitting)
+    
+        Falls back to drawing the whole figure when there is no up-to-date
+        image of it, e.g. after the axes changed.
+    """
+    if plot_background is None:
+        plot_canvas.draw()
+        return
+    plot_canvas.restore_region(plot_background)
+    ax.draw_artist(trendline)
+    plot_canvas.blit(plot_figure.bbox)
+
+def clear_plot():
+    """ Remove the plotted prices, trendline and prediction """
+    global plot_background
+    if ax is None:
+        return
+    for artist in prediction_artists:
+        artist.remove()
+    del prediction_artists[:]
+    price_line.set_data([], [])
+    trendline.set_visible(False)
+    ax.set_title("")
+    plot_background = None
+    cheapest_label.configure(text="")
     
                
 def predict(*events):
-    """ Use multivariate linear regression to predict price of item """
+    """ Use multivariate linear regression to predict price of item 
+    
+        Fetching the economic data and fitting the model run on a background
+        thread, so the GUI stays responsive. poll_prediction() shows the
+        result when it's ready. While a prediction is running, clicking 
+        Predict again does nothing.
+    """
+    global prediction_job
+    if prediction_job is not None:
+        return
     # Get item from item list matching item description in selection box
-    item = item_list[item_predict_var.get()]
+    item = selected_item()
     # Get timeframe in days from timeframe selection box
     timeframe = timeframes[timeframe_var.get()]
     # Get polynomial order from spinbox
@@ -279,14 +335,41 @@ def predict(*events):
     # Get regularization coefficient
     regularization_coeff = float(regularization_var.get())
     
-    # Saved training set for quick reuse
-    global old_training_set
-    
-    dates, prediction, curve, training_set = predict_single_item(item, 
-                                                        timeframe, 
-                                                        polynomial_order,
-                                                        regularization_coeff,
-                                                        old_training_set)
+    # Training sets and models are reused from data_analysis's cache. The
+    #   thread gets a copy of the item, so prices edited in the meantime
+    #   don't change the data it's fitting.
+    future = prediction_pool.submit(predict_item, item.copy(), timeframe,
+                                    polynomial_order, regularization_coeff)
+    prediction_job = (future, item, timeframe)
+    
+    disable(predict_button)
+    enable(cancel_button)
+    prediction_progress.grid(row=6, column=0, columnspan=4, sticky=W+E,
+                             padx=5, pady=5)
+    prediction_progress.start()
+    root.after(poll_interval, poll_prediction)
+
+def predict_item(*args):
+    """ Call data_analysis.predict_single_item on the prediction thread """
+    from data_analysis import predict_single_item
+    return predict_single_item(*args)
+
+def poll_prediction():
+    """ Check the running prediction and plot its result once it's done """
+    if prediction_job is None:
+        # The prediction was cancelled
+        return
+    future, item, timeframe = prediction_job
+    if not future.done():
+        root.after(poll_interval, poll_prediction)
+        return
+    finish_prediction()
+    
+    try:
+        dates, prediction, curve, training_set = future.result()
+    except Exception as error:
+        print("Prediction failed:", error)
+        return
     
 #    prediction_text = ("Predicted price:\n${:.2f}".format(float(prediction)))
     prediction_text = ("${:.2f}".format(float(prediction)))
@@ -299,27 +382,42 @@ def predict(*events):
                              item, date_text, timeframe_text, prediction_text)
     #result_label.configure(text=prediction_result_text)    
     
-    ax.plot(dates, curve, "r--")
-    ax.plot(dates[-1], prediction, "k*")
+    prediction_artists.extend(ax.plot(dates, curve, "r--"))
+    prediction_artists.extend(ax.plot(dates[-1], prediction, "k*"))
     
-    ax.text(date.today() + timedelta(days=timeframe), 
-            float(prediction), 
-            prediction_text)
+    prediction_artists.append(ax.text(date.today() + timedelta(days=timeframe), 
+                                      float(prediction), 
+                                      prediction_text))
     
     plot_canvas.draw()
+
+def cancel_prediction(*events):
+    """ Stop waiting for the running prediction and discard its result 
     
-    old_training_set = training_set
+        A prediction that hasn't started yet is removed from the queue. One
+        that is already fitting finishes in the background (its training set
+        and model are still cached), but isn't plotted.
+    """
+    if prediction_job is None:
+        return
+    prediction_job[0].cancel()
+    finish_prediction()
+
+def finish_prediction():
+    """ Reset the prediction controls after a prediction ends """
+    global prediction_job
+    prediction_job = None
+    prediction_progress.stop()
+    prediction_progress.grid_remove()
+    disable(cancel_button)
+    if str(show_trendline_checkbox["state"]) == NORMAL:
+        enable(predict_button)
                 
 def save(*events):
     """ Save all item data to item folder """
     print("Saving...")
-    folder = Path.cwd() / "items"
-    # Create a file for each item, titled "[description].txt"
-    for description, item in item_list.items():
-        filename = folder / (description.lower().replace(" ", "_") + ".txt")
-        with open(filename, "w") as f:
-            f.write(repr(item))
-    print("Save complete")
+    saved_count = save_items(item_list)
+    print("Save complete ({} changed items written)".format(saved_count))
     
     # Display blue "Saved" message in bottom right corner of GUI
     saved_label.grid(row=3, column=2)
@@ -375,8 +473,11 @@ class Item_entry:
                                        wraplength=300)
         self.description_label.grid(row=0, column=0)
 
+        # Looking up the entered date loads the item's prices, so unless
+        # they're loaded already it waits until the item is chosen (see
+        # show_entered_price())
         d = date.fromisoformat(date_var.get())
-        if d in item.price_data:
+        if item.is_price_data_loaded and d in item.price_data:
             self.generate_price_label_box()
         else:
             self.generate_price_entry_box()
@@ -399,12 +500,6 @@ class Item_entry:
         # Replace price entry box with a text label of the price just entered
         self.price_entry_box.destroy()
         self.generate_price_label_box()   
-        self.clear_saved_training_set()
-    
-    def clear_saved_training_set(self):
-        if self.item.item_description == item_predict_var.get():
-            global old_training_set
-            old_training_set = None
             
     def disable_widgets(self):
         print("ITem entry disabled")
@@ -423,7 +518,6 @@ class Item_entry:
         self.edit_button.destroy()
         self.generate_price_entry_box()
         self.price_entry_box.focus_set()
-        self.clear_saved_training_set()
 
     def generate_price_entry_box(self):
         """ Create and place a price entry box """
@@ -433,6 +527,18 @@ class Item_entry:
                                      width=5)
         self.price_entry_box.grid(row=0, column=1)
         self.price_entry_box.bind("<Return>", self.apply_price_entry)
+        self.price_entry_box.bind("<FocusIn>", self.show_entered_price)
+        
+    def show_entered_price(self, *events):
+        """ Replace the price entry box with the item's price for the
+            entered date, if it has one
+        """
+        d = date.fromisoformat(date_var.get())
+        if d not in self.item.price_data:
+            return
+        self.price_entry_box.destroy()
+        self.generate_price_label_box()
+        self.edit_button.focus_set()
   
     def generate_price_label_box(self):
         """ Create and place a price label box
@@ -460,10 +566,7 @@ class Item_entry:
 
 load()
 
-# Print all existing item info 
-print()
-for item in item_list.values():
-    print(str(item), "\n")
+print("Loaded", len(item_list), "items")
     
 
 # =============================================================================
@@ -478,9 +581,6 @@ store_matched_items = []
 # List of Item_entry objects currently in the price entry frame
 item_entries = []
 
-# Saved training set for quick reuse
-old_training_set = None
-
 # Entry field variables
 date_var = StringVar()
 store_var = StringVar()
@@ -527,8 +627,7 @@ store_label.grid(row=1, column=0, sticky=W)
 # Select from a list of all the different stores found in the item list
 store_entry_box = Combobox(store_frame, textvariable=store_var)
 store_entry_box.grid(row=1, column=1, sticky=W)
-stores = {s.store_name for s in item_list.values()}
-store_entry_box["values"] = tuple(stores)
+store_entry_box["values"] = tuple(store_index.stores())
 store_entry_box.current(0)
 #store_entry_box.bind("<<ComboboxSelected>>", load_store_locations)
 
@@ -669,8 +768,7 @@ def load_store_locations(*events):
         store location combobox.
     """
 
-    store_locations = {i.store_location for i in item_list.values() if \
-                       i.store_name == store_var.get()}
+    store_locations = store_index.locations(store_var.get())
     store_location_entry_box["values"] = tuple(store_locations)
     store_location_entry_box.current(0)
     
@@ -705,18 +803,11 @@ predict_control_frame = Frame(predict_frame, borderwidth=4, relief="ridge")
 predict_control_frame.grid(row=1, column=0, padx=5, pady=10)
 
 def load_items(*events):
-    items = {i.item_description for i in item_list.values() if \
-             i.store_name == store_var.get() and \
-             i.store_location == location_var.get()}
+    items = [i.item_description for i in 
+             store_index.items_at(store_var.get(), location_var.get())]
     item_select_box["values"] = tuple(items)
     item_select_box.current(0)
     
-def reset_saved_training_set(*events):
-    global old_training_set
-    old_training_set = None
-    print("RESET TRAINING SET")
-    disable(plot_controls)
-    
 def disable_plot_controls(*events):
     disable(plot_controls)
 
@@ -726,7 +817,7 @@ item_select_box = Combobox(predict_control_frame, width=30,
                            textvariable=item_predict_var,
                            foreground="gray")
 item_select_box.grid(row=0, column=1, columnspan=3, sticky=W)
-item_select_box.bind("<<ComboboxSelected>>", reset_saved_training_set)
+item_select_box.bind("<<ComboboxSelected>>", disable_plot_controls)
 load_items()
 
 timeframe_select_label = Label(predict_control_frame, text="Select timeframe:")
@@ -784,8 +875,19 @@ regularization_entry.grid(row=4, column=3, columnspan=1, sticky=W)
 predict_button = Button(predict_control_frame, text="Predict", command=predict)
 predict_button.grid(row=5, column=1, columnspan=1, padx=5, pady=5)
 
+cancel_button = Button(predict_control_frame, text="Cancel", 
+                       command=cancel_prediction)
+cancel_button.grid(row=5, column=2, columnspan=1, padx=5, pady=5)
+
 disable(*predict_control_frame.winfo_children())
 
+# Shown only while a prediction is running
+prediction_progress = Progressbar(predict_control_frame, mode="indeterminate")
+
+# Where the plotted item's product is cheapest, if other stores have it too
+cheapest_label = Label(predict_control_frame, text="")
+cheapest_label.grid(row=7, column=0, columnspan=4, sticky=W)
+
 plot_controls = [#timeframe_select_label, timeframe_select_box,
                  polynomial_order_label, polynomial_order_spinbox,
                  show_trendline_label, show_trendline_checkbox,
@@ -811,35 +913,81 @@ plot_controls = [#timeframe_select_label, timeframe_select_box,
 #   Plot
 # =============================================================================
 
-plot_frame = Frame(predict_frame, borderwidth=4, relief="raised")
+# Sized to fit the plot (an 8 x 6 inch figure at 80 dpi, plus its toolbar),
+#   which is only created when the first plot is made
+plot_frame = Frame(predict_frame, borderwidth=4, relief="raised",
+                   width=648, height=528)
 plot_frame.grid(row=2, columnspan=2, padx=10, pady=10)
 
-# For embedding Matplotlib Figure into Tkinter Frame
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-from matplotlib.backends.backend_tkagg import NavigationToolbar2Tk
-from matplotlib.backend_bases import key_press_handler
-from matplotlib.figure import Figure
-matplotlib.use("TkAgg")
-
-plot_figure = Figure(figsize=(8, 6), dpi=80)
-
-plot_canvas = FigureCanvasTkAgg(plot_figure, master=plot_frame)
-
-plot_canvas.get_tk_widget().pack(fill=BOTH, expand=1)
-
-toolbar = NavigationToolbar2Tk(plot_canvas, plot_frame)
-toolbar.update()
-plot_canvas.get_tk_widget().pack(side=TOP, fill=BOTH, expand=1)
-
-
-def on_key_press(event):
-    key_press_handler(event, plot_canvas, toolbar)
-
-
-plot_canvas.mpl_connect("key_press_event", on_key_press)
+plot_figure = None
+plot_canvas = None
+toolbar = None
+ax = None
+# The plot's artists, which are updated in place when another item is plotted
+price_line = None
+trendline = None
+prediction_artists = []
+# Saved image of the figure without the trendline, for redraw_trendline()
+plot_background = None
+
+def create_plot():
+    """ Embed a Matplotlib Figure into the plot frame """
+    global plot_figure, plot_canvas, toolbar, ax, price_line, trendline
+    # For embedding Matplotlib Figure into Tkinter Frame
+    import matplotlib
+    from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+    from matplotlib.backends.backend_tkagg import NavigationToolbar2Tk
+    from matplotlib.backend_bases import key_press_handler
+    from matplotlib.figure import Figure
+    from pandas.plotting import register_matplotlib_converters
+    matplotlib.use("TkAgg")
+    register_matplotlib_converters()
+    
+    plot_figure = Figure(figsize=(8, 6), dpi=80)
+    
+    plot_canvas = FigureCanvasTkAgg(plot_figure, master=plot_frame)
+    
+    plot_canvas.get_tk_widget().pack(fill=BOTH, expand=1)
+    
+    toolbar = NavigationToolbar2Tk(plot_canvas, plot_frame)
+    toolbar.update()
+    plot_canvas.get_tk_widget().pack(side=TOP, fill=BOTH, expand=1)
+    
+    def on_key_press(event):
+        key_press_handler(event, plot_canvas, toolbar)
+    
+    plot_canvas.mpl_connect("key_press_event", on_key_press)
+    
+    ax = plot_figure.add_subplot()
+    price_line, = ax.plot([], [], "bo-")
+    # Animated, so it's left out of full draws and drawn by on_draw() instead
+    trendline, = ax.plot([], [], "k--", animated=True, visible=False)
+    
+    def on_draw(event):
+        """ Save the newly drawn figure and draw the trendline over it """
+        global plot_background
+        plot_background = plot_canvas.copy_from_bbox(plot_figure.bbox)
+        ax.draw_artist(trendline)
+    
+    plot_canvas.mpl_connect("draw_event", on_draw)
 
-ax = plot_figure.add_subplot()
-trendline = ax.plot()
+def warm_up():
+    """ Import the plotting and analysis modules and get the economic data
+        in the background, so they're ready by the first plot or prediction
+        
+        Runs on its own thread rather than the prediction thread, so a 
+        prediction never waits for a slow download to finish first (it 
+        fetches whatever it needs itself).
+    """
+    import matplotlib.dates
+    import matplotlib.figure
+    import matplotlib.backends.backend_tkagg
+    import price_plot
+    import data_analysis
+    try:
+        data_analysis.get_all_series()
+    except Exception as error:
+        print("Could not get the economic data yet:", error)
 
 
 
@@ -867,4 +1015,8 @@ trendline = ax.plot()
 # =============================================================================
 # Begin GUI session
 # =============================================================================
+# Start loading the plotting and analysis modules and the economic data
+threading.Thread(target=warm_up, name="warm-up", daemon=True).start()
+
 root.mainloop()
+prediction_pool.shutdown(wait=False, cancel_futures=True)
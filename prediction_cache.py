@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+A bounded least-recently-used cache for training sets and fitted models
+
+Used by data_analysis.predict_single_item to reuse the training sets and
+Ridge models it has already built, so switching back and forth between
+items and prediction parameters doesn't rebuild them every time.
+"""
+import sys
+import threading
+from collections import OrderedDict
+
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+# Values that lists are assumed to hold only one kind of, when sizing them
+scalar_types = (int, float, str, date, np.generic, type(None))
+
+
+class Lru_cache:
+    """ class Lru_cache: a dict-like cache with a memory size limit
+
+        - max_megabytes:    approximate limit on the total size of the
+                            cached values. When it is exceeded, the least
+                            recently used values are evicted.
+        - hits, misses:     number of get() calls that found / didn't find
+                            their key
+
+        Safe to use from several threads.
+    """
+
+    def __init__(self, max_megabytes=256):
+        self.max_bytes = int(max_megabytes * 1024 * 1024)
+        self.entries = OrderedDict()  # { key : (value, size in bytes) }
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        """ Return the value cached for key, or None """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key, value):
+        """ Cache value under key, evicting old values to stay in the limit
+
+            A value bigger than the whole limit is not cached.
+        """
+        size = estimate_size(value)
+        with self.lock:
+            if key in self.entries:
+                self.total_bytes -= self.entries.pop(key)[1]
+            if size > self.max_bytes:
+                return
+            self.entries[key] = (value, size)
+            self.total_bytes += size
+            while self.total_bytes > self.max_bytes:
+                self.total_bytes -= self.entries.popitem(last=False)[1][1]
+
+    def clear(self):
+        """ Remove all cached values and reset the hit/miss counters """
+        with self.lock:
+            self.entries.clear()
+            self.total_bytes = 0
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """ Return a dict of the cache's counters and size """
+        with self.lock:
+            return {"hits": self.hits,
+                    "misses": self.misses,
+                    "entries": len(self.entries),
+                    "megabytes": self.total_bytes / (1024 * 1024),
+                    "max_megabytes": self.max_bytes / (1024 * 1024)}
+
+
+def estimate_size(value):
+    """ Estimate the memory used by value in bytes
+
+        Counts DataFrames, numpy arrays (and other objects with an nbytes
+        attribute), containers and the array attributes of fitted
+        scikit-learn models.
+    """
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return int(np.sum(value.memory_usage(deep=True)))
+    if isinstance(value, np.ndarray) or hasattr(value, "nbytes"):
+        return value.nbytes
+    if isinstance(value, (list, tuple)):
+        if len(value) > 0 and isinstance(value[0], scalar_types):
+            # E.g. a list of dates or prices: count the first one for all
+            return sys.getsizeof(value) + len(value) * sys.getsizeof(value[0])
+        return sys.getsizeof(value) + sum(estimate_size(v) for v in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(v) for v in
+                                          value.values())
+    if hasattr(value, "get_params"):
+        return sys.getsizeof(value) + sum(
+            v.nbytes for v in vars(value).values()
+            if isinstance(v, np.ndarray))
+    return sys.getsizeof(value)
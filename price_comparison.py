@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Price comparisons across stores, and price indices by type and by store
+
+A Price_comparison reads the prices of a whole catalog into flat arrays
+once (each price's item, day and price, sorted by item and day), so every
+query is a vectorized group-by over them rather than a loop over items:
+
+    comparison = Price_comparison(item_list.values())
+    comparison.cheapest()                   # cheapest store of each product
+    comparison.compare_item(item)           # item's product at every store
+    comparison.store_price_levels()         # how cheap each store is
+    comparison.price_index(by="type")       # monthly price index per type
+    comparison.month_over_month(by="store") # monthly % change per store
+
+Items are told apart by Item.identity, which includes the store and its
+location. Items at different stores are the same product when their
+descriptions and unit quantities match, ignoring case and surrounding
+spaces (see product_key()).
+
+Price indices are chained: each month, a group's index changes by the
+geometric mean of how much the prices of its items changed since the month
+before, over the items with prices in both months (an item's price in a
+month being the mean of its prices that month). Items that start or stop
+being tracked therefore don't move the index. In a month without any such
+item the index stays where it was.
+
+From the command line:
+
+    python cli.py compare
+    python cli.py compare change --by store
+"""
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+unix_epoch = date(1970, 1, 1).toordinal()
+
+# Groups that price indices can be made for
+index_groups = ("type", "store", "all")
+
+
+def product_key(item):
+    """ Return what items at different stores must share to be compared as
+        the same product: (description, unit quantity) in lower case
+    """
+    return (item.item_description.strip().lower(),
+            item.item_unit_quantity.strip().lower())
+
+
+class Price_comparison:
+    """ class Price_comparison: compares the prices of a catalog of items
+
+        - items:        the items to compare, e.g. item_list.values()
+
+        The prices are read once, when the comparison is made, so make a new
+        one after prices have changed.
+    """
+
+    def __init__(self, items):
+        items = list(items)
+        histories = [item.price_data for item in items]
+        offsets = np.zeros(len(items) + 1, dtype=np.int64)
+        np.cumsum([len(history) for history in histories], out=offsets[1:])
+        days = np.concatenate([history.days for history in histories] +
+                              [np.empty(0, dtype=np.int32)])
+        prices = np.concatenate([history.prices for history in histories] +
+                                [np.empty(0, dtype=np.float64)])
+        self._set_prices(items, days, prices, offsets)
+
+    @classmethod
+    def from_arrays(cls, items, days, prices, offsets):
+        """ Make a comparison from flat price arrays, such as those of a
+            memory-mapped store (see storage.open_price_arrays()), without
+            going through each item's Price_history
+
+            - items:    the items, in the order of the arrays (as
+                        load_item_index() returns a memory-mapped store's)
+        """
+        comparison = cls.__new__(cls)
+        comparison._set_prices(list(items), days, prices, offsets)
+        return comparison
+
+    def _set_prices(self, items, days, prices, offsets):
+        offsets = np.asarray(offsets, dtype=np.int64)
+        if len(offsets) != len(items) + 1:
+            raise ValueError("offsets must have one more entry than items")
+        sizes = np.diff(offsets)
+        self.days = np.asarray(days)
+        self.prices = np.asarray(prices)
+        # Item number of each price
+        self.item_numbers = np.repeat(np.arange(len(items), dtype=np.int32),
+                                      sizes)
+        # (months, item numbers, log price changes), found when first needed
+        self.item_changes = None
+
+        # Each item's latest price is the last of its entries
+        has_prices = sizes > 0
+        last_entries = offsets[1:][has_prices] - 1
+        latest_days = np.full(len(items), np.iinfo(np.int64).min)
+        latest_days[has_prices] = self.days[last_entries]
+        latest_prices = np.full(len(items), np.nan)
+        latest_prices[has_prices] = self.prices[last_entries]
+        latest_dates = np.full(len(items), np.datetime64("NaT"),
+                               dtype="datetime64[D]")
+        latest_dates[has_prices] = (latest_days[has_prices] -
+                                    unix_epoch).astype("datetime64[D]")
+
+        # One row per item --- attributes, latest price and group codes
+        self.items = pd.DataFrame({
+            "type": pd.Series([item.item_type for item in items],
+                              dtype=object),
+            "description": pd.Series([item.item_description for item in
+                                      items], dtype=object),
+            "unit": pd.Series([item.item_unit_quantity for item in items],
+                              dtype=object),
+            "store": pd.Series([item.store_name for item in items],
+                               dtype=object),
+            "location": pd.Series([item.store_location for item in items],
+                                  dtype=object),
+            "date": latest_dates,
+            "price": latest_prices,
+            "day": latest_days})
+        # Group numbers, in order of first appearance
+        #   --- { product_key(item) : product number }
+        self.products = {}
+        types = {}
+        stores = {}
+        self.items["product"] = [
+            self.products.setdefault(product_key(item), len(self.products))
+            for item in items]
+        self.items["type_group"] = [
+            types.setdefault(item.item_type.strip().lower(), len(types))
+            for item in items]
+        self.items["store_group"] = [
+            stores.setdefault((item.store_name.strip().lower(),
+                               item.store_location.strip().lower()),
+                              len(stores)) for item in items]
+        self.items["all_group"] = 0
+
+    def latest_prices(self, max_age=None):
+        """ Return the rows of self.items with a price at most max_age days
+            old (default: any price)
+        """
+        table = self.items[self.items["price"].notna()]
+        if max_age is not None:
+            oldest_day = date.today().toordinal() - max_age
+            table = table[table["day"] >= oldest_day]
+        return table
+
+    def cheapest(self, max_age=None, all_products=False):
+        """ Find the store where each product is cheapest now
+
+            Stores are compared by each item's latest price. Of stores with
+            the same price, the first by name and location is listed.
+
+            - max_age:      only prices at most this many days old count
+                            (default: any price)
+            - all_products: list products sold at only one store as well
+
+            - Return a DataFrame with a row per product: its type,
+              description, unit and the store, location, date and price
+              where it's cheapest, how many stores have a price for it
+              ("stores") and the highest of those prices ("highest_price")
+        """
+        table = self.latest_prices(max_age).sort_values(
+            ["product", "price", "store", "location"], kind="stable")
+        prices = table.groupby("product", sort=False)["price"]
+        stores = prices.transform("size")
+        highest = prices.transform("max")
+        is_cheapest = ~table["product"].duplicated()
+        cheapest = table[is_cheapest].assign(
+            stores=stores[is_cheapest], highest_price=highest[is_cheapest])
+        if not all_products:
+            cheapest = cheapest[cheapest["stores"] > 1]
+        return cheapest[["type", "description", "unit", "store", "location",
+                         "date", "price", "stores", "highest_price"]
+                        ].sort_values(["type", "description"]
+                                      ).reset_index(drop=True)
+
+    def compare_item(self, item, max_age=None):
+        """ Compare the latest prices of item's product at every store
+
+            - Return a DataFrame of the store, location, date and price at
+              each store with a price for the product, cheapest first (and
+              by store and location at the same price)
+        """
+        table = self.latest_prices(max_age)
+        is_product = table["product"] == self.products.get(product_key(item))
+        return table.loc[is_product, ["store", "location", "date", "price"]
+                         ].sort_values(["price", "store", "location"],
+                                       kind="stable").reset_index(drop=True)
+
+    def store_price_levels(self, max_age=None):
+        """ Compare how cheap stores are over the products they share
+
+            A store's price level is the geometric mean, over its products
+            that other stores have a price for too, of its latest price
+            relative to the product's geometric mean price at all of those
+            stores, times 100: below 100 the store is cheaper than average.
+
+            - Return a DataFrame with a row per store: store, location,
+              price level and the number of products it was compared by,
+              cheapest store first
+        """
+        table = self.latest_prices(max_age)
+        table = table[table["price"] > 0]
+        log_prices = np.log(table["price"])
+        products = table.groupby("product")["price"]
+        is_shared = products.transform("size").to_numpy() > 1
+        relative = (log_prices - log_prices.groupby(table["product"])
+                    .transform("mean"))[is_shared]
+        shared = table[is_shared]
+        stores = shared.groupby("store_group", sort=False)
+        levels = stores[["store", "location"]].first()
+        levels["price_level"] = 100 * np.exp(relative.groupby(
+            shared["store_group"], sort=False).mean())
+        levels["products"] = stores.size()
+        return levels.sort_values("price_level").reset_index(drop=True)
+
+    def price_index(self, by="type"):
+        """ Chained monthly price index of each type of item, each store or
+            all items (by = "type", "store" or "all")
+
+            - Return a DataFrame with a row per month (as a pandas Period)
+              and a column per group, of the index relative to 100 in the
+              group's first month with prices (NaN before then)
+        """
+        links = self.monthly_links(by)
+        started = links.notna().cummax()
+        first_month = started.shift(-1, fill_value=False) & ~started
+        index = 100 * np.exp(links.fillna(0).cumsum())
+        return index.where(started | first_month)
+
+    def month_over_month(self, by="type"):
+        """ Monthly price change of each type of item, each store or all
+            items (by = "type", "store" or "all")
+
+            - Return a DataFrame with a row per month (as a pandas Period)
+              and a column per group, of the % change in prices since the
+              month before (NaN without items priced in both months)
+        """
+        return 100 * (np.exp(self.monthly_links(by)) - 1)
+
+    def monthly_links(self, by):
+        """ Mean log change of the group's items' prices from each month to
+            the next (see the module docstring)
+
+            - Return a DataFrame with a row per month and a column per group
+        """
+        if by not in index_groups:
+            raise ValueError("Can't group prices by {!r}: use one of "
+                             "{}".format(by, ", ".join(index_groups)))
+        group_numbers = self.items[by + "_group"].to_numpy()
+        if by == "type":
+            labels = self.items.groupby("type_group")["type"].first()
+        elif by == "store":
+            stores = self.items.groupby("store_group")[["store",
+                                                        "location"]].first()
+            labels = stores["store"] + " (" + stores["location"] + ")"
+        else:
+            labels = pd.Series(["All items"])
+        if len(self.prices) == 0:
+            return pd.DataFrame(columns=labels.tolist(), dtype=float)
+
+        if self.item_changes is None:
+            self.item_changes = self.monthly_item_changes()
+        months, items, changes = self.item_changes
+        links = pd.DataFrame({"month": months, "group": group_numbers[items],
+                              "change": changes})
+        links = links.groupby(["month", "group"])["change"].mean().unstack()
+        links = links.reindex(index=np.arange(self.first_month,
+                                              self.last_month + 1),
+                              columns=labels.index)
+        links.index = pd.PeriodIndex(pd.to_datetime(
+            links.index.to_numpy().astype("datetime64[M]")), freq="M",
+            name="month")
+        links.columns = labels.tolist()
+        return links
+
+    def monthly_item_changes(self):
+        """ Find every item's log price change from one month to the next
+
+            - Return (months as numbers since January 1970, item numbers,
+              log changes) of the months where items have a price in the
+              month before as well
+        """
+        months = (self.days.astype(np.int64) - unix_epoch).astype(
+            "datetime64[D]").astype("datetime64[M]").astype(np.int64)
+        self.first_month = int(months.min())
+        self.last_month = int(months.max())
+        # Prices are sorted by item and day, so each item's prices in a
+        #   month are next to each other
+        item_numbers = self.item_numbers
+        starts = np.flatnonzero(np.r_[True,
+                                      (item_numbers[1:] != item_numbers[:-1]) |
+                                      (months[1:] != months[:-1])])
+        means = np.add.reduceat(self.prices, starts) / np.diff(
+            np.r_[starts, len(months)])
+        run_items = item_numbers[starts]
+        run_months = months[starts]
+
+        # Link each item's mean price in a month to the month before
+        is_link = (run_items[1:] == run_items[:-1]) & \
+                  (run_months[1:] == run_months[:-1] + 1) & \
+                  (means[1:] > 0) & (means[:-1] > 0)
+        return (run_months[1:][is_link], run_items[1:][is_link],
+                np.log(means[1:][is_link] / means[:-1][is_link]))
+
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Plot data of the price chart: trendlines and decimated price series
+
+Kept apart from main.py, and free of matplotlib, so the data drawn for long
+price histories can be computed (and benchmarked) without a display.
+"""
+from datetime import date
+
+import numpy as np
+
+from prediction_cache import Lru_cache
+
+# Number of segments the trendline is drawn with
+trendline_bins = 50
+# Most price entries drawn for one item; longer histories are decimated
+max_plot_points = 2000
+
+# Polynomial coefficients of recent trendlines, for reuse when the trendline
+#   is toggled or the item is plotted again
+#   --- { (item identity, price fingerprint, polynomial order) : coefficients }
+trendline_cache = Lru_cache(max_megabytes=4)
+
+unix_epoch = date(1970, 1, 1).toordinal()
+
+
+def to_datetime64(days):
+    """ Convert date ordinals (date.toordinal()) to numpy datetime64 dates """
+    return (np.asarray(days, dtype=np.int64) - unix_epoch).astype(
+        "datetime64[D]")
+
+def trendline_coefficients(item, polynomial_order):
+    """ Fit a polynomial to the item's prices vs. days since its first entry
+
+        Fits are cached, and refit only when the item's prices change.
+
+        - Return the np.polyfit coefficients, highest power first
+    """
+    price_data = item.price_data
+    key = (item.identity, price_data.fingerprint(), polynomial_order)
+    coefficients = trendline_cache.get(key)
+    if coefficients is None:
+        days_since_earliest = price_data.days - price_data.days[0]
+        coefficients = np.polyfit(days_since_earliest, price_data.prices,
+                                  polynomial_order)
+        trendline_cache.put(key, coefficients)
+    return coefficients
+
+def trendline_points(item, polynomial_order, latest_day):
+    """ Evaluate the item's trendline from its first entry to latest_day
+
+        - latest_day:   date ordinal where the trendline ends
+
+        - Return (dates as datetime64, trendline prices)
+    """
+    earliest_day = int(item.price_data.days[0])
+    dayrange = latest_day - earliest_day
+    if dayrange <= trendline_bins:
+        stride = 1
+    else:
+        stride = int(dayrange / trendline_bins)
+
+    x_line = np.arange(0, dayrange, stride)
+    prices = np.polyval(trendline_coefficients(item, polynomial_order), x_line)
+    return to_datetime64(earliest_day + x_line), prices
+
+def decimate(values, max_points=max_plot_points):
+    """ Pick which entries of a long series to draw, keeping its peaks
+
+        Splits the series into max_points / 2 buckets of consecutive entries
+        and keeps the lowest and highest entry of each, so every spike and
+        dip is still drawn. The first and last entries are always kept.
+
+        - Return a sorted array of the indices to draw (all of them if there
+          are no more than max_points)
+    """
+    values = np.asarray(values, dtype=float)
+    count = len(values)
+    if count <= max_points:
+        return np.arange(count)
+
+    bucket_size = -(-count // (max_points // 2))
+    buckets = -(-count // bucket_size)
+    padding = buckets * bucket_size - count
+    starts = np.arange(buckets) * bucket_size
+    lows = np.append(values, np.full(padding, np.inf)).reshape(
+        buckets, bucket_size).argmin(axis=1)
+    highs = np.append(values, np.full(padding, -np.inf)).reshape(
+        buckets, bucket_size).argmax(axis=1)
+    return np.unique(np.concatenate(([0, count - 1], starts + lows,
+                                     starts + highs)))
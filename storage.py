@@ -0,0 +1,593 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Reading and writing of tracked items and their price data
+
+Three storage formats are supported:
+
+- Text (default): one text file per item in the items folder, titled
+  "[description]@[store]@[location]-[hash].txt" (see item_filename()).
+  The first six lines hold the item's attributes and every following line
+  holds one "date, price" entry (see Item.__repr__).
+- SQLite: a single database file (".db", ".sqlite" or ".sqlite3") with an
+  "items" table of attributes and a "prices" table of (item id, day, price)
+  rows, which is read in one bulk query. Better suited to large catalogs.
+- Memory-mapped (".mmap" folder): the prices of all items as flat arrays,
+  laid out like a CSR matrix: "days.npy" (int32 day ordinals) and
+  "prices.npy" (float64) hold every item's entries one item after another,
+  "offsets.npy" holds where each item's entries start (item i's are
+  offsets[i]:offsets[i + 1]) and "items.json" holds the items' attributes
+  in the same order. The arrays are memory-mapped, so each item's
+  Price_history is a view of the file: nothing is read until it's used,
+  and the operating system keeps only the pages in use in memory. Best
+  for very large, read-mostly catalogs: saving rewrites all of it.
+
+The format is chosen from the location: a path with one of the SQLite
+suffixes is a database, a path ending in ".mmap" a memory-mapped store,
+and anything else is an items folder.
+
+Item lists are dicts keyed by Item.key, (description, store, location), so
+the same product can be tracked at several stores. Folders and databases
+from before, when descriptions had to be unique, are still read: item
+files titled "[description].txt" (or by an earlier version of
+item_filename()) are renamed when they're next saved, and
+databases have their items table rebuilt when first opened.
+
+By default only items changed since they were loaded or last saved
+(Item.is_modified) are written, so saving takes time in proportion to the
+number of edits rather than to the size of the catalog.
+
+load_item_index() loads only the items' attributes, and each item's price
+data is read the first time it is used. For items folders the attributes
+come from an "index.json" file, which is brought up to date from the item
+files whenever they have changed.
+
+These functions don't depend on the GUI, so the item data can also be used
+from the command line (see cli.py).
+"""
+import hashlib
+import json
+import os
+import re
+import shutil
+import sqlite3
+from datetime import date
+from functools import partial
+from pathlib import Path
+
+import numpy as np
+
+from item import Item, Price_history
+
+default_location = Path.cwd() / "items"
+
+sqlite_suffixes = (".db", ".sqlite", ".sqlite3")
+
+mapped_suffix = ".mmap"
+
+index_filename = "index.json"
+
+# Characters replaced in the names of item files
+filename_unsafe_pattern = re.compile(r"[^\w.\-]", re.ASCII)
+
+sqlite_schema = """
+CREATE TABLE IF NOT EXISTS items (
+    id                  INTEGER PRIMARY KEY,
+    item_type           TEXT NOT NULL,
+    item_description    TEXT NOT NULL,
+    item_unit_quantity  TEXT NOT NULL,
+    store_name          TEXT NOT NULL,
+    store_location      TEXT NOT NULL,
+    is_store_brand      INTEGER NOT NULL,
+    UNIQUE (item_description, store_name, store_location)
+);
+CREATE TABLE IF NOT EXISTS prices (
+    item_id             INTEGER NOT NULL REFERENCES items(id),
+    day                 INTEGER NOT NULL,
+    price               REAL NOT NULL,
+    PRIMARY KEY (item_id, day)
+) WITHOUT ROWID;
+"""
+
+
+def item_filename(folder, item):
+    """ Return the path of the text file that item is saved in
+
+        The name is the item's description, store and location joined by
+        "@", in lower case and with anything but letters, digits, ".", "-"
+        and "_" replaced by "_", so it's a valid file name on any system.
+        A short hash of Item.key makes it unique, even for items whose keys
+        differ only in case or in the characters replaced.
+    """
+    name = "@".join(filename_unsafe_pattern.sub("_", part.lower())[:60]
+                    for part in item.key)
+    key_hash = hashlib.sha1("\n".join(item.key).encode("utf-8")).hexdigest()
+    return folder / "{}-{}.txt".format(name, key_hash[:8])
+
+def legacy_item_filenames(folder, item):
+    """ Return the paths item may have been saved in by earlier versions:
+        titled by its key without a hash, and by its description alone from
+        when descriptions were unique
+    """
+    return [folder / ("@".join(item.key).lower().replace(" ", "_") + ".txt"),
+            folder / (item.item_description.lower().replace(" ", "_") +
+                      ".txt")]
+
+def is_sqlite(location):
+    """ Return True if location is (to be) an SQLite item database """
+    return Path(location).suffix.lower() in sqlite_suffixes
+
+def is_mapped(location):
+    """ Return True if location is (to be) a memory-mapped price store """
+    return Path(location).suffix.lower() == mapped_suffix
+
+def load_items(location=None):
+    """ Load saved item data from an items folder, SQLite database or
+        memory-mapped store
+
+        - Return a dict of { [Item.key] : [Item] }
+    """
+    if location is None:
+        location = default_location
+    if is_sqlite(location):
+        return load_items_sqlite(location)
+    if is_mapped(location):
+        return load_items_mapped(location)
+    return load_items_text(location)
+
+def save_items(item_list, location=None, only_modified=True):
+    """ Save items in item_list to an items folder, SQLite database or
+        memory-mapped store (which is always rewritten in full)
+
+        - If only_modified is True, only items changed since they were
+          loaded or last saved are written. Otherwise every item is written.
+        - Return the number of items written
+    """
+    if location is None:
+        location = default_location
+    if only_modified:
+        items = [item for item in item_list.values() if item.is_modified]
+    else:
+        items = list(item_list.values())
+    if is_sqlite(location):
+        save_items_sqlite(items, location, replace_all=not only_modified)
+    elif is_mapped(location):
+        # The arrays can't be changed in place, so they're written anew
+        if len(items) > 0 or not Path(location).exists():
+            save_items_mapped(item_list.values(), location)
+    else:
+        save_items_text(items, location)
+    for item in items:
+        item.mark_saved()
+    return len(items)
+
+def load_item_index(location=None):
+    """ Load items' attributes only, reading price data when first used
+
+        - Return a dict of { [Item.key] : [Item] }
+    """
+    if location is None:
+        location = default_location
+    if is_sqlite(location):
+        return load_item_index_sqlite(location)
+    if is_mapped(location):
+        return load_items_mapped(location)
+    return load_item_index_text(location)
+
+def convert_items(source, destination):
+    """ Copy all items from one storage location to another
+
+        E.g. convert_items("items", "items.sqlite") moves an items folder
+        into a database, and convert_items("items.sqlite", "items") back.
+        Every attribute and price is kept exactly.
+    """
+    item_list = load_items(source)
+    if not is_sqlite(destination) and not is_mapped(destination):
+        Path(destination).mkdir(parents=True, exist_ok=True)
+    return save_items(item_list, destination, only_modified=False)
+
+def load_items_text(folder):
+    """ Load items from one text file per item in folder """
+    item_list = {}
+    for file in Path(folder).glob("*.txt"):
+        attributes, price_history = read_item_file(file)
+
+        #Create Item object using loaded attributes
+        loaded_item = Item(*attributes)
+        loaded_item.price_data = price_history
+        loaded_item.mark_saved()
+
+        # Add loaded item to item_list
+        item_list[loaded_item.key] = loaded_item
+
+    return item_list
+
+def read_item_attributes(f):
+    """ Read the six attribute lines at the top of an open item file
+
+        - Return [type, description, unit quantity, store name, 
+          store location, is store brand]
+    """
+    # Read item attribute data (description, store, unit quantity, etc)
+    item_type = f.readline().strip("\n")
+    item_description = f.readline().strip("\n")
+    item_unit_quantity = f.readline().strip("\n")
+    store_name = f.readline().strip("\n")
+    store_location = f.readline().strip("\n")
+    is_store_brand = f.readline().strip("\n") == "True"
+    return [item_type, item_description, item_unit_quantity, store_name,
+            store_location, is_store_brand]
+
+def read_item_file(file):
+    """ Read an item file
+
+        - Return (attributes, Price_history)
+    """
+    with open(file, "r") as f:
+        attributes = read_item_attributes(f)
+
+        # Read price data from remaining lines
+        days = []
+        prices = []
+        for line in f:
+            entry = line.strip("\n").split(", ")
+            days.append(date.fromisoformat(entry[0]).toordinal())
+            prices.append(float(entry[1]))
+
+    return attributes, Price_history(days, prices)
+
+def read_price_history(file):
+    """ Read only the price data of an item file """
+    return read_item_file(file)[1]
+
+def load_item_index_text(folder):
+    """ Load items' attributes from the index file of an items folder
+
+        Item files that are new or have changed since the index was written
+        (by modification time and size) have their attribute lines read
+        again, and the index file is rewritten if anything changed. Price
+        data is read from each item's file the first time it is used.
+    """
+    folder = Path(folder)
+    try:
+        with open(folder / index_filename, "r") as f:
+            old_index = json.load(f)
+    except (OSError, ValueError):
+        old_index = {}
+
+    index = {}
+    item_list = {}
+    for entry in os.scandir(folder):
+        if not entry.name.endswith(".txt") or not entry.is_file():
+            continue
+        stat = entry.stat()
+        record = old_index.get(entry.name)
+        if record is None or record["mtime_ns"] != stat.st_mtime_ns or \
+                record["size"] != stat.st_size:
+            with open(entry.path, "r") as f:
+                record = {"attributes": read_item_attributes(f),
+                          "mtime_ns": stat.st_mtime_ns,
+                          "size": stat.st_size}
+        index[entry.name] = record
+
+        loaded_item = Item(*record["attributes"])
+        loaded_item.set_price_loader(partial(read_price_history,
+                                             Path(entry.path)))
+        loaded_item.mark_saved()
+        item_list[loaded_item.key] = loaded_item
+
+    if index != old_index:
+        write_index(folder, index)
+    return item_list
+
+def write_index(folder, index):
+    """ Write the index file of an items folder """
+    filename = folder / index_filename
+    temp_filename = filename.with_suffix(".json.tmp")
+    with open(temp_filename, "w") as f:
+        json.dump(index, f)
+    os.replace(temp_filename, filename)
+
+def save_items_text(items, folder):
+    """ Save items as one text file per item in folder
+
+        Each file is written to a temporary file first and then renamed over
+        the old one, so a crash in the middle of saving never leaves a
+        half-written item file behind.
+    """
+    folder = Path(folder)
+    # Create a file for each item, titled
+    #   "[description]@[store]@[location]-[hash].txt"
+    for item in items:
+        filename = item_filename(folder, item)
+        temp_filename = filename.with_suffix(".txt.tmp")
+        with open(temp_filename, "w") as f:
+            f.write(repr(item))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_filename, filename)
+        
+        # Remove the item's file from before it was titled this way
+        for legacy_filename in legacy_item_filenames(folder, item):
+            try:
+                with open(legacy_filename, "r") as f:
+                    attributes = read_item_attributes(f)
+            except (OSError, ValueError):
+                continue
+            if (attributes[1], attributes[3], attributes[4]) == item.key:
+                os.remove(legacy_filename)
+
+def connect(path):
+    """ Open the SQLite item database at path, creating its tables if new """
+    connection = sqlite3.connect(str(path))
+    connection.executescript(sqlite_schema)
+    upgrade_sqlite_schema(connection)
+    return connection
+
+def upgrade_sqlite_schema(connection):
+    """ Rebuild the items table of a database made when item descriptions
+        had to be unique, so it takes the same description at other stores
+    """
+    for index in connection.execute("PRAGMA index_list(items)").fetchall():
+        columns = [row[2] for row in connection.execute(
+            "PRAGMA index_info('{}')".format(index[1]))]
+        if index[2] and columns == ["item_description"]:
+            break
+    else:
+        return
+    # Keep the ids, which the prices refer to
+    with connection:
+        connection.execute("BEGIN")
+        connection.execute(sqlite_schema.split(";")[0].replace(
+            "items (", "upgraded_items (", 1))
+        connection.execute("INSERT INTO upgraded_items SELECT * FROM items")
+        connection.execute("DROP TABLE items")
+        connection.execute("ALTER TABLE upgraded_items RENAME TO items")
+
+def load_items_sqlite(path):
+    """ Load items from an SQLite database with one bulk read per table """
+    item_list = {}
+    items_by_id = {}
+    connection = connect(path)
+    try:
+        for row in connection.execute(
+                "SELECT id, item_type, item_description, item_unit_quantity, "
+                "store_name, store_location, is_store_brand FROM items"):
+            loaded_item = Item(row[1], row[2], row[3], row[4], row[5],
+                               bool(row[6]))
+            items_by_id[row[0]] = loaded_item
+            item_list[loaded_item.key] = loaded_item
+
+        rows = connection.execute(
+            "SELECT item_id, day, price FROM prices ORDER BY item_id, day"
+            ).fetchall()
+    finally:
+        connection.close()
+
+    # Split the sorted price rows into each item's history
+    if len(rows) > 0:
+        item_ids, days, prices = (np.array(column) for column in zip(*rows))
+        starts = np.flatnonzero(np.r_[True, item_ids[1:] != item_ids[:-1]])
+        ends = np.r_[starts[1:], len(item_ids)]
+        for start, end in zip(starts, ends):
+            items_by_id[int(item_ids[start])].price_data = \
+                Price_history(days[start:end], prices[start:end])
+
+    for loaded_item in item_list.values():
+        loaded_item.mark_saved()
+    return item_list
+
+def load_item_index_sqlite(path):
+    """ Load items' attributes from an SQLite database
+
+        Each item's prices are queried the first time they are used.
+    """
+    item_list = {}
+    connection = connect(path)
+    try:
+        for row in connection.execute(
+                "SELECT id, item_type, item_description, item_unit_quantity, "
+                "store_name, store_location, is_store_brand FROM items"):
+            loaded_item = Item(row[1], row[2], row[3], row[4], row[5],
+                               bool(row[6]))
+            loaded_item.set_price_loader(partial(read_price_history_sqlite,
+                                                 path, row[0]))
+            loaded_item.mark_saved()
+            item_list[loaded_item.key] = loaded_item
+    finally:
+        connection.close()
+    return item_list
+
+def read_price_history_sqlite(path, item_id):
+    """ Read one item's prices from an SQLite database """
+    connection = connect(path)
+    try:
+        rows = connection.execute(
+            "SELECT day, price FROM prices WHERE item_id = ? ORDER BY day",
+            (item_id,)).fetchall()
+    finally:
+        connection.close()
+    if len(rows) == 0:
+        return Price_history()
+    days, prices = zip(*rows)
+    return Price_history(days, prices)
+
+def save_items_sqlite(items, path, replace_all=False):
+    """ Save items to an SQLite database in a single transaction
+
+        Each item's row is inserted or updated and its prices are replaced.
+        If replace_all is True, all other items are removed from the
+        database first.
+    """
+    connection = connect(path)
+    try:
+        with connection:
+            if replace_all:
+                connection.execute("DELETE FROM prices")
+                connection.execute("DELETE FROM items")
+            for item in items:
+                connection.execute(
+                    "INSERT INTO items (item_type, item_description, "
+                    "item_unit_quantity, store_name, store_location, "
+                    "is_store_brand) VALUES (?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT (item_description, store_name, "
+                    "store_location) DO UPDATE SET "
+                    "item_type = excluded.item_type, "
+                    "item_unit_quantity = excluded.item_unit_quantity, "
+                    "is_store_brand = excluded.is_store_brand",
+                    (item.item_type, item.item_description,
+                     item.item_unit_quantity, item.store_name,
+                     item.store_location, int(item.is_store_brand)))
+                item_id = connection.execute(
+                    "SELECT id FROM items WHERE item_description = ? AND "
+                    "store_name = ? AND store_location = ?",
+                    item.key).fetchone()[0]
+                connection.execute("DELETE FROM prices WHERE item_id = ?",
+                                   (item_id,))
+                connection.executemany(
+                    "INSERT INTO prices (item_id, day, price) "
+                    "VALUES (?, ?, ?)",
+                    zip([item_id] * len(item.price_data),
+                        item.price_data.days.tolist(),
+                        item.price_data.prices.tolist()))
+    finally:
+        connection.close()
+
+def open_price_arrays(path):
+    """ Memory-map the price arrays of a memory-mapped store
+
+        - Return (days, prices, offsets): read-only arrays of all items'
+          day ordinals and prices, and where each item's entries start
+    """
+    path = Path(path)
+    return tuple(np.load(path / name, mmap_mode="r") for name in
+                 ("days.npy", "prices.npy", "offsets.npy"))
+
+def load_items_mapped(path):
+    """ Load items from a memory-mapped store
+
+        Each item's Price_history is a view of the mapped arrays, made the
+        first time it is used, so no price is read from the files until
+        then. Changing an item's prices copies just that item's entries
+        into memory.
+    """
+    path = Path(path)
+    if not (path / "items.json").exists():
+        return {}
+    with open(path / "items.json", "r") as f:
+        attributes = json.load(f)
+    offsets = np.load(path / "offsets.npy")
+    if len(offsets) != len(attributes) + 1:
+        raise ValueError("Inconsistent memory-mapped store: " + str(path))
+
+    items = [Item(*item_attributes) for item_attributes in attributes]
+    set_mapped_price_loaders(items, Mapped_price_arrays(path), offsets)
+    item_list = {}
+    for loaded_item in items:
+        loaded_item.mark_saved()
+        item_list[loaded_item.key] = loaded_item
+    return item_list
+
+class Mapped_price_arrays:
+    """ The days and prices arrays of a memory-mapped store, mapped the
+        first time an item's prices are read from them
+    """
+    
+    def __init__(self, path):
+        self.path = Path(path)
+        self._arrays = None
+        
+    def price_history(self, start, end):
+        """ Return the Price_history of entries start:end, as a view of the
+            mapped arrays
+        """
+        if self._arrays is None:
+            self._arrays = open_price_arrays(self.path)[:2]
+        days, prices = self._arrays
+        return Price_history.from_sorted(days[start:end], prices[start:end])
+
+def set_mapped_price_loaders(items, arrays, offsets):
+    """ Have each item read its prices from its entries of arrays (a
+        Mapped_price_arrays) when they're first needed; item i's entries
+        are offsets[i]:offsets[i + 1]
+    """
+    bounds = offsets.tolist()
+    for item, start, end in zip(items, bounds[:-1], bounds[1:]):
+        item.set_price_loader(partial(arrays.price_history, start, end))
+
+def save_items_mapped(items, path):
+    """ Write all items to a memory-mapped store
+
+        The arrays are written through memory maps one item at a time, so
+        the catalog never has to be copied in memory, into a new folder
+        that then replaces the old one.
+
+        Before the folders are swapped, the items are set to read their
+        prices from the new store, which drops their views of the old
+        one: a folder with mapped files in it can't be moved or deleted on
+        Windows. Price data of the old store still held elsewhere keeps
+        its files open there, and the swap then fails with an OSError
+        (the items then read from the new folder, left as "[name].tmp").
+    """
+    path = Path(path)
+    items = list(items)
+    sizes = np.fromiter((len(item.price_data) for item in items),
+                        dtype=np.int64, count=len(items))
+    offsets = np.zeros(len(items) + 1, dtype=np.int64)
+    np.cumsum(sizes, out=offsets[1:])
+
+    temp_path = path.with_name(path.name + ".tmp")
+    old_path = path.with_name(path.name + ".old")
+    # Left behind by a failed save
+    for leftover in (temp_path, old_path):
+        if leftover.exists():
+            shutil.rmtree(leftover)
+    temp_path.mkdir(parents=True)
+    for name, dtype, attribute in (("days.npy", np.int32, "days"),
+                                   ("prices.npy", np.float64, "prices")):
+        if offsets[-1] == 0:
+            np.save(temp_path / name, np.empty(0, dtype=dtype))
+            continue
+        array = np.lib.format.open_memmap(temp_path / name, mode="w+",
+                                          dtype=dtype,
+                                          shape=(int(offsets[-1]),))
+        for item, start, end in zip(items, offsets[:-1].tolist(),
+                                    offsets[1:].tolist()):
+            array[start:end] = getattr(item.price_data, attribute)
+        array.flush()
+        del array
+    np.save(temp_path / "offsets.npy", offsets)
+    with open(temp_path / "items.json", "w") as f:
+        json.dump([[item.item_type, item.item_description,
+                    item.item_unit_quantity, item.store_name,
+                    item.store_location, item.is_store_brand] for item in
+                   items], f)
+
+    arrays = Mapped_price_arrays(path)
+    set_mapped_price_loaders(items, arrays, offsets)
+    try:
+        if path.exists():
+            os.replace(path, old_path)
+        os.replace(temp_path, path)
+    except OSError:
+        arrays.path = temp_path
+        raise
+    if old_path.exists():
+        shutil.rmtree(old_path)
+
+def filter_items(item_list, store_name=None, store_location=None):
+    """ Return the items in item_list from the given store and/or location
+
+        Store names and locations are compared case-insensitively. A value
+        of None matches every store or location.
+    """
+    matched = []
+    for item in item_list.values():
+        if store_name is not None and \
+                item.store_name.lower() != store_name.lower():
+            continue
+        if store_location is not None and \
+                item.store_location.lower() != store_location.lower():
+            continue
+        matched.append(item)
+    return matched
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""
+Shared fixtures of the tests
+
+Run the tests from the repository root with:
+
+    python -m pytest -q
+"""
+import sys
+import time
+from datetime import date
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# The modules live at the top of the repository, not in a package
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import data_analysis
+
+# Item storage locations of each format, relative to a temporary folder
+storage_locations = ["items", "items.sqlite", "items.mmap"]
+
+
+@pytest.fixture(params=storage_locations)
+def location(request, tmp_path):
+    """ An empty storage location of each format """
+    return tmp_path / request.param
+
+
+def fred_text(series_id, frequency, seed):
+    """ Return a synthetic series in the format of the St. Louis Fed's
+        fred.stlouisfed.org/data/*.txt files, from 1990 to today, with
+        observations at the start of every month or quarter
+    """
+    dates = pd.date_range("1990-01-01", date.today(), freq=frequency)
+    rng = np.random.default_rng(seed)
+    values = 100 * np.cumprod(1 + rng.normal(0.002, 0.004, len(dates)))
+    lines = ["Title:               Synthetic " + series_id,
+             "Series ID:           " + series_id,
+             "",
+             "DATE         VALUE"]
+    lines += ["{:%Y-%m-%d}  {:.3f}".format(day, value)
+              for day, value in zip(dates, values)]
+    return "\n".join(lines) + "\n"
+
+
+@pytest.fixture
+def econ_data(tmp_path, monkeypatch):
+    """ Offline economic data: a series cache holding synthetic series of
+        every indicator, in a temporary folder
+    """
+    monkeypatch.setattr(data_analysis, "cache_folder", tmp_path / "econ")
+    monkeypatch.setattr(data_analysis, "offline_mode", True)
+    clear_econ_data()
+    for seed, indicator in enumerate(data_analysis.indicators.values()):
+        frequency = "QS" if indicator.frequency == "quarterly" else "MS"
+        data_analysis.write_cached_series(
+            indicator.url, fred_text(indicator.series_id, frequency, seed),
+            {"url": indicator.url, "etag": None, "last_modified": None,
+             "fetched": time.time()})
+    yield tmp_path / "econ"
+    clear_econ_data()
+
+
+def clear_econ_data():
+    """ Forget all economic data and predictions kept in memory """
+    data_analysis.loaded_series.clear()
+    data_analysis.daily_econ_tables.clear()
+    data_analysis.prediction_cache.clear()
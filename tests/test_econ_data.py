@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of economic data series and their alignment to price dates
+(data_analysis.py: Econ_series, Indicator, Daily_econ_table)
+"""
+from datetime import date
+
+import numpy as np
+import pytest
+
+import data_analysis
+from data_analysis import Daily_econ_table, Econ_series, Indicator
+
+series_text = """Title:               Synthetic
+Series ID:           TEST
+Date Range:          2024-01-01 to 2024-04-01
+
+DATE         VALUE
+2024-01-01  10.0
+2024-02-01  .
+2024-03-01  30.0
+2024-04-01  40.0
+"""
+
+
+def lookup(indicator, *dates):
+    series = Econ_series.from_text(series_text)
+    return indicator.lookup(series, [date.fromisoformat(day) for day in
+                                     dates]).tolist()
+
+
+def test_parse_series_text():
+    series = Econ_series.from_text(series_text)
+    # The header and the missing value (".") are skipped
+    assert series.ordinals.tolist() == [date(2024, 1, 1).toordinal(),
+                                        date(2024, 3, 1).toordinal(),
+                                        date(2024, 4, 1).toordinal()]
+    assert series.values.tolist() == [10.0, 30.0, 40.0]
+
+
+def test_values_apply_from_their_date():
+    indicator = Indicator("Test", "TEST", "monthly")
+    assert np.isnan(lookup(indicator, "2023-12-31")[0])
+    assert lookup(indicator, "2024-01-01", "2024-02-15", "2024-02-29",
+                  "2024-03-01", "2030-01-01") == [10.0, 10.0, 10.0, 30.0,
+                                                  40.0]
+
+
+def test_values_apply_from_the_end_of_their_period():
+    monthly = Indicator("Test", "TEST", "monthly", "end")
+    assert np.isnan(lookup(monthly, "2024-01-30")[0])
+    assert lookup(monthly, "2024-01-31", "2024-03-30", "2024-03-31",
+                  "2024-04-30") == [10.0, 10.0, 30.0, 40.0]
+    quarterly = Indicator("Test", "TEST", "quarterly", "end")
+    assert np.isnan(lookup(quarterly, "2024-03-30")[0])
+    assert lookup(quarterly, "2024-03-31", "2024-05-30", "2024-05-31",
+                  "2024-06-30") == [10.0, 10.0, 30.0, 40.0]
+    annual = Indicator("Test", "TEST", "annual", "end")
+    assert np.isnan(lookup(annual, "2024-12-30")[0])
+    assert lookup(annual, "2024-12-31") == [40.0]
+    weekly = Indicator("Test", "TEST", "weekly", "end")
+    assert np.isnan(lookup(weekly, "2024-01-06")[0])
+    assert lookup(weekly, "2024-01-07") == [10.0]
+    daily = Indicator("Test", "TEST", "daily", "end")
+    assert lookup(daily, "2024-01-01") == [10.0]
+
+
+def test_values_apply_after_their_lag():
+    indicator = Indicator("Test", "TEST", "monthly", "end", 14)
+    assert np.isnan(lookup(indicator, "2024-02-13")[0])
+    assert lookup(indicator, "2024-02-14", "2024-04-13", "2024-04-14") == \
+        [10.0, 10.0, 30.0]
+    indicator = Indicator("Test", "TEST", "monthly", "start", 7)
+    assert lookup(indicator, "2024-03-07", "2024-03-08") == [10.0, 30.0]
+
+
+def test_invalid_indicators():
+    with pytest.raises(ValueError):
+        Indicator("Test", "TEST", "hourly")
+    with pytest.raises(ValueError):
+        Indicator("Test", "TEST", "monthly", "middle")
+
+
+def test_daily_table_matches_lookups(econ_data):
+    features = list(data_analysis.indicators)
+    first_day = date(2019, 11, 20).toordinal()
+    last_day = date(2020, 4, 10).toordinal()
+    table = Daily_econ_table(first_day, last_day, features)
+    days = np.arange(first_day, last_day + 1)
+
+    all_series = data_analysis.get_all_series(features)
+    for column, key in enumerate(features):
+        expected = data_analysis.indicators[key].lookup(all_series[key], days)
+        assert np.array_equal(table.values[:, column], expected)
+    assert np.array_equal(table.rows(days[::-7]), table.values[::-7])
+    view = table.rows(range(first_day + 5, first_day + 10))
+    assert np.shares_memory(view, table.values) and len(view) == 5
+    assert not table.values.flags.writeable
+
+    with pytest.raises(ValueError):
+        table.rows([first_day - 1])
+    with pytest.raises(ValueError):
+        table.rows(range(last_day, last_day + 2))
+
+
+def test_shared_table_grows_and_follows_the_data(econ_data):
+    first_day = date(2020, 1, 1).toordinal()
+    table = data_analysis.get_daily_econ_table(first_day, first_day + 10)
+    assert data_analysis.get_daily_econ_table(first_day + 2,
+                                              first_day + 5) is table
+
+    # A day outside it makes a table that covers both
+    larger = data_analysis.get_daily_econ_table(first_day + 20,
+                                                first_day + 30)
+    assert larger is not table
+    assert larger.covers(first_day, first_day + 30)
+    assert np.array_equal(larger.rows(range(first_day, first_day + 11)),
+                          table.values)
+
+    # New economic data makes a new table
+    url = data_analysis.indicators["CPI"].url
+    text, meta = data_analysis.read_cached_series(url)
+    data_analysis.write_cached_series(url, text + "2100-01-01  1.0\n", meta)
+    data_analysis.loaded_series.clear()
+    assert data_analysis.get_daily_econ_table(first_day, first_day + 10) \
+        is not larger
@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of downloading economic data series through the local cache
+(data_analysis.py, fetch_series_text), against a stand-in for the St. Louis
+Fed's server on localhost
+"""
+import threading
+import time
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+import data_analysis
+
+series_text = "DATE         VALUE\n2024-01-01  100.0\n2024-02-01  101.5\n"
+
+
+class Fred_handler(BaseHTTPRequestHandler):
+    """ Serves self.server.text with an ETag, answers "304 Not Modified" to
+        requests with that ETag, and fails the first self.server.failures
+        requests with "503 Service Unavailable"
+    """
+
+    def do_GET(self):
+        server = self.server
+        server.requests.append((self.path, dict(self.headers)))
+        if server.failures > 0:
+            server.failures -= 1
+            self.send_response(503)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        etag = '"{}"'.format(hash(server.text) & 0xffffffff)
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        body = server.text.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", "Mon, 01 Jan 2024 00:00:00 GMT")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def fred_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Fred_handler)
+    server.text = series_text
+    server.failures = 0
+    server.requests = []
+    server.url = "http://127.0.0.1:{}/data/".format(server.server_port)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    """ An empty series cache, online, with a new download session that
+        doesn't retry failed downloads
+    """
+    monkeypatch.setattr(data_analysis, "cache_folder", tmp_path / "econ")
+    monkeypatch.setattr(data_analysis, "offline_mode", False)
+    monkeypatch.setattr(data_analysis, "cache_ttl", timedelta(hours=12))
+    monkeypatch.setattr(data_analysis, "fetch_retries", 0)
+    monkeypatch.setattr(data_analysis, "session", None)
+    return tmp_path / "econ"
+
+
+def expire(url):
+    """ Make the cached copy of url older than the cache's TTL """
+    text, meta = data_analysis.read_cached_series(url)
+    meta["fetched"] = time.time() - \
+        data_analysis.cache_ttl.total_seconds() - 1
+    data_analysis.write_cached_series(url, text, meta)
+
+
+def test_download_is_cached(fred_server, cache):
+    url = fred_server.url + "CPI.txt"
+    assert data_analysis.fetch_series_text(url) == series_text
+    text, meta = data_analysis.read_cached_series(url)
+    assert text == series_text
+    assert meta["etag"] and meta["last_modified"]
+
+    # Fresh copies are used without asking the server
+    assert data_analysis.fetch_series_text(url) == series_text
+    assert len(fred_server.requests) == 1
+
+
+def test_expired_copy_is_revalidated(fred_server, cache):
+    url = fred_server.url + "CPI.txt"
+    data_analysis.fetch_series_text(url)
+    etag = data_analysis.read_cached_series(url)[1]["etag"]
+    expire(url)
+
+    before = time.time()
+    assert data_analysis.fetch_series_text(url) == series_text
+    path, headers = fred_server.requests[-1]
+    assert headers["If-None-Match"] == etag
+    assert headers["If-Modified-Since"] == "Mon, 01 Jan 2024 00:00:00 GMT"
+    # "304 Not Modified" refreshes the copy's download time
+    assert data_analysis.read_cached_series(url)[1]["fetched"] >= before
+    data_analysis.fetch_series_text(url)
+    assert len(fred_server.requests) == 2
+
+
+def test_expired_copy_is_replaced_when_changed(fred_server, cache):
+    url = fred_server.url + "CPI.txt"
+    data_analysis.fetch_series_text(url)
+    expire(url)
+    fred_server.text = series_text + "2024-03-01  102.0\n"
+
+    assert data_analysis.fetch_series_text(url) == fred_server.text
+    assert data_analysis.read_cached_series(url)[0] == fred_server.text
+
+
+def test_offline_mode_uses_any_cached_copy(fred_server, cache,
+                                           monkeypatch):
+    url = fred_server.url + "CPI.txt"
+    data_analysis.fetch_series_text(url)
+    expire(url)
+    monkeypatch.setattr(data_analysis, "offline_mode", True)
+
+    assert data_analysis.fetch_series_text(url) == series_text
+    with pytest.raises(RuntimeError):
+        data_analysis.fetch_series_text(fred_server.url + "GDP.txt")
+    assert len(fred_server.requests) == 1
+
+
+def test_stale_copy_when_server_is_unreachable(fred_server, cache):
+    url = fred_server.url + "CPI.txt"
+    data_analysis.fetch_series_text(url)
+    expire(url)
+    fred_server.shutdown()
+    fred_server.server_close()
+
+    assert data_analysis.fetch_series_text(url) == series_text
+    with pytest.raises(requests.RequestException):
+        data_analysis.fetch_series_text(fred_server.url + "GDP.txt")
+
+
+def test_failed_downloads_are_retried(fred_server, cache, monkeypatch):
+    monkeypatch.setattr(data_analysis, "fetch_retries", 2)
+    fred_server.failures = 1
+    url = fred_server.url + "CPI.txt"
+    assert data_analysis.fetch_series_text(url) == series_text
+    assert len(fred_server.requests) == 2
+
+
+def test_stale_copy_when_retries_run_out(fred_server, cache, monkeypatch):
+    monkeypatch.setattr(data_analysis, "fetch_retries", 1)
+    url = fred_server.url + "CPI.txt"
+    data_analysis.fetch_series_text(url)
+    expire(url)
+    fred_server.failures = 2
+
+    assert data_analysis.fetch_series_text(url) == series_text
+    assert len(fred_server.requests) == 3
+    fred_server.failures = 2
+    with pytest.raises(requests.HTTPError):
+        data_analysis.fetch_series_text(fred_server.url + "GDP.txt")
+
+
+def test_all_series_are_fetched(fred_server, cache, monkeypatch):
+    monkeypatch.setattr(data_analysis.Indicator, "url", property(
+        lambda indicator: fred_server.url + indicator.series_id + ".txt"))
+    monkeypatch.setattr(data_analysis, "loaded_series", {})
+    features = ("CPI", "GDP", "Monetary Base", "PPI")
+
+    all_series = data_analysis.get_all_series(features)
+    assert list(all_series) == list(features)
+    assert all(len(series) == 2 for series in all_series.values())
+    assert sorted(path for path, headers in fred_server.requests) == \
+        sorted("/data/{}.txt".format(data_analysis.indicators[key].series_id)
+               for key in features)
+    # The series stay loaded, so asking again makes no requests
+    data_analysis.get_all_series(features)
+    assert len(fred_server.requests) == len(features)
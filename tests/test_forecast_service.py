@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the prediction batching of the forecast service
+(forecast_service.py)
+"""
+import asyncio
+from datetime import date
+
+import pytest
+
+import data_analysis
+from forecast_service import Forecast_service, Request_error
+from item import Item
+from storage import save_items
+
+
+@pytest.fixture
+def service(tmp_path):
+    """ A service of one item with prices and one without """
+    priced = Item("food", "milk", "1 l", "Shop A", "Town")
+    priced.add_price_entry(date(2024, 1, 1), 1.10)
+    unpriced = Item("food", "bread", "500 g", "Shop A", "Town")
+    (tmp_path / "items").mkdir()
+    save_items({item.key: item for item in (priced, unpriced)},
+               tmp_path / "items")
+    service = Forecast_service(tmp_path / "items", batch_window=0)
+    yield service
+    service.worker.shutdown(wait=True)
+
+
+def run_predictions(service, requests):
+    """ Send requests through the batching queue, one batch after another
+
+        - Return the reply, or the Request_error, of each request
+    """
+    async def run():
+        service.predict_queue = asyncio.Queue()
+        batcher = asyncio.create_task(service.run_batches())
+        replies = []
+        for arguments in requests:
+            try:
+                # A request the batcher never answers fails the test
+                replies.append(await asyncio.wait_for(
+                    service.predict(arguments), 10))
+            except Request_error as error:
+                replies.append(error)
+        batcher.cancel()
+        return replies
+
+    return asyncio.run(run())
+
+
+def fake_prediction(item, timeframe, polynomial_order, regularization_coeff):
+    return None, 1.5, None, None
+
+
+def test_item_without_prices_is_unprocessable(service, monkeypatch):
+    monkeypatch.setattr(data_analysis, "predict_single_item",
+                        fake_prediction)
+    error, reply = run_predictions(service, [{"description": "bread"},
+                                             {"description": "milk"}])
+    assert isinstance(error, Request_error) and error.status == 422
+    assert reply["predicted_price"] == 1.5
+
+
+def test_unexpected_prediction_error(service, monkeypatch):
+    def offline(*args):
+        raise RuntimeError("No economic data: offline and nothing cached")
+
+    monkeypatch.setattr(data_analysis, "predict_single_item", offline)
+    error, = run_predictions(service, [{"description": "milk"}])
+    assert isinstance(error, Request_error) and error.status == 500
+    assert "offline" in str(error)
+
+
+def test_failed_batch_does_not_stop_batching(service, monkeypatch):
+    monkeypatch.setattr(data_analysis, "predict_single_item",
+                        fake_prediction)
+    predict_batch = service.predict_batch
+    calls = []
+
+    def fail_first_batch(keys):
+        calls.append(keys)
+        if len(calls) == 1:
+            raise KeyError("lost item")
+        return predict_batch(keys)
+
+    monkeypatch.setattr(service, "predict_batch", fail_first_batch)
+    error, reply = run_predictions(service, [{"description": "milk"},
+                                             {"description": "milk"}])
+    assert isinstance(error, Request_error) and error.status == 500
+    assert reply["predicted_price"] == 1.5
+    assert service.counters["batches"] == 2
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of importing bulk price data (importer.py)
+"""
+from datetime import date
+
+from importer import import_prices
+from storage import load_items
+
+header = "type,description,unit,store,location,date,price\n"
+
+
+def write_csv(path, rows):
+    path.write_text(header + "".join(",".join(row) + "\n" for row in rows))
+    return path
+
+
+def test_same_description_at_two_stores(tmp_path, location):
+    prices = write_csv(tmp_path / "prices.csv", [
+        ("food", "milk", "1 l", "Shop A", "Town", "2024-01-01", "1.10"),
+        ("food", "milk", "1 l", "Shop B", "Town", "2024-01-01", "1.20"),
+        ("food", "milk", "1 l", "Shop B", "City", "2024-01-02", "1.30"),
+        ("food", "milk", "1 l", "Shop A", "Town", "2024-01-03", "1.15")])
+
+    stats = import_prices(prices, location)
+    assert stats["new_items"] == 3
+    assert stats["saved_items"] == 3
+    assert stats["added"] == 4
+
+    item_list = load_items(location)
+    assert sorted(item_list) == [("milk", "Shop A", "Town"),
+                                 ("milk", "Shop B", "City"),
+                                 ("milk", "Shop B", "Town")]
+    shop_a = item_list[("milk", "Shop A", "Town")].price_data
+    assert dict(shop_a.items()) == {date(2024, 1, 1): 1.10,
+                                    date(2024, 1, 3): 1.15}
+
+
+def test_conflicting_rows_are_not_imported(tmp_path, location):
+    write_csv(tmp_path / "first.csv", [
+        ("food", "milk", "1 l", "Shop A", "Town", "2024-01-01", "1.10")])
+    import_prices(tmp_path / "first.csv", location)
+
+    # Same description, store and location, but another unit
+    prices = write_csv(tmp_path / "second.csv", [
+        ("food", "milk", "2 l", "Shop A", "Town", "2024-01-02", "2.00"),
+        ("food", "milk", "2 l", "Shop B", "Town", "2024-01-02", "2.10"),
+        ("food", "milk", "1 l", "Shop A", "Town", "2024-01-02", "1.12")])
+    stats = import_prices(prices, location)
+    assert stats["conflicting"] == 1
+    assert stats["new_items"] == 1
+    assert stats["added"] == 2
+
+    item_list = load_items(location)
+    assert item_list[("milk", "Shop A", "Town")].item_unit_quantity == "1 l"
+    assert len(item_list[("milk", "Shop A", "Town")].price_data) == 2
+    assert item_list[("milk", "Shop B", "Town")].item_unit_quantity == "2 l"
+
+
+def test_importing_twice_changes_nothing(tmp_path, location):
+    prices = write_csv(tmp_path / "prices.csv", [
+        ("food", "milk", "1 l", "Shop A", "Town", "2024-01-01", "1.10"),
+        ("food", "bread", "500 g", "Shop A", "Town", "2024-01-01", "2.50"),
+        ("food", "bread", "500 g", "Shop A", "Town", "2024-01-01", "2.40")])
+    first = import_prices(prices, location)
+    assert first["added"] == 2
+    assert load_items(location)[("bread", "Shop A", "Town")] \
+        .price_data[date(2024, 1, 1)] == 2.40
+
+    second = import_prices(prices, location)
+    assert second["new_items"] == 0
+    assert second["added"] == second["updated"] == 0
+    assert second["saved_items"] == 0
+
+
+def test_importing_twice_keeps_every_digit(tmp_path, location):
+    prices = write_csv(tmp_path / "prices.csv", [
+        ("food", "milk", "1 l", "Shop A", "Town", "2024-01-01", "1.125"),
+        ("food", "milk", "1 l", "Shop A", "Town", "2024-01-02",
+         "0.3333333333333333")])
+    import_prices(prices, location)
+    assert load_items(location)[("milk", "Shop A", "Town")] \
+        .price_data.values() == [1.125, 1 / 3]
+
+    second = import_prices(prices, location)
+    assert second["added"] == second["updated"] == 0
+    assert second["saved_items"] == 0
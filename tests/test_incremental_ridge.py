@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of updating price models with new prices (data_analysis.py,
+Incremental_ridge) against refitting them from scratch
+"""
+from datetime import date
+
+import numpy as np
+import pytest
+
+import data_analysis
+from item import Item, Price_history
+
+
+def price_history(observations, seed):
+    """ Return a Price_history of prices 3 to 10 days apart, up to
+        yesterday
+    """
+    rng = np.random.default_rng(seed)
+    offsets = np.cumsum(rng.integers(3, 11, size=observations))
+    days = date.today().toordinal() - 1 - (offsets[-1] - offsets)
+    prices = np.round(3 * np.cumprod(1 + rng.normal(0, 0.02, observations)),
+                      2)
+    return Price_history(days, prices)
+
+
+def item_with_prices(history, count):
+    item = Item("food", "milk", "1 l", "Shop A", "Town")
+    item.price_data = Price_history(history.days[:count],
+                                    history.prices[:count])
+    return item
+
+
+def updated_model(history, first, added, timeframe, polynomial_order,
+                  regularization_coeff):
+    """ Fit an Incremental_ridge to the first <first> prices of history,
+        then update it with the <added> prices after them
+
+        - Return (the model, whether the update succeeded, the item with
+          all first + added prices)
+    """
+    item = item_with_prices(history, first)
+    training_set = data_analysis.convert_price_data_to_training_set(
+        item, timeframe)
+    model = data_analysis.Incremental_ridge(training_set, timeframe,
+                                            polynomial_order,
+                                            regularization_coeff)
+    item = item_with_prices(history, first + added)
+    return model, model.update(item.price_data), item
+
+
+@pytest.mark.parametrize("timeframe", [0, 7, 30, 91])
+@pytest.mark.parametrize("polynomial_order", [1, 2, 3])
+@pytest.mark.parametrize("regularization_coeff", [0.001, 0.1, 10])
+def test_update_matches_refit(econ_data, timeframe, polynomial_order,
+                              regularization_coeff):
+    for seed in range(4):
+        history = price_history(120, seed)
+        model, is_updated, item = updated_model(
+            history, 100, 1 + seed % 3, timeframe, polynomial_order,
+            regularization_coeff)
+        refit = data_analysis.fit_model(
+            data_analysis.convert_price_data_to_training_set(item, timeframe),
+            timeframe, polynomial_order, regularization_coeff)
+        assert is_updated
+        result = model.model_result()
+        assert result[1] == refit[1]
+        assert result[2] == pytest.approx(refit[2], rel=1e-6, abs=1e-6)
+        assert result[3] == pytest.approx(refit[3], rel=1e-6, abs=1e-6)
+
+
+def test_no_update_without_regularization(econ_data):
+    model, is_updated, item = updated_model(price_history(60, 0), 50, 2,
+                                            30, 2, 0)
+    assert not is_updated
+
+
+def test_no_update_when_ill_conditioned(econ_data, monkeypatch):
+    monkeypatch.setattr(data_analysis, "max_condition_number", 1.0)
+    model, is_updated, item = updated_model(price_history(60, 0), 50, 2,
+                                            30, 2, 0.1)
+    assert not is_updated
+
+
+@pytest.mark.parametrize("regularization_coeff", [0, 0.1])
+def test_cached_prediction_after_new_prices(econ_data,
+                                            regularization_coeff):
+    history = price_history(80, 1)
+    item = item_with_prices(history, 70)
+    data_analysis.predict_single_item(item, 30, 3, regularization_coeff)
+    for day, price in zip(history.days[70:], history.prices[70:]):
+        item.add_price_entry(date.fromordinal(int(day)), float(price))
+    cached = data_analysis.predict_single_item(item, 30, 3,
+                                               regularization_coeff)
+    refit = data_analysis.predict_single_item(item, 30, 3,
+                                              regularization_coeff,
+                                              cache=None)
+    assert cached[0] == refit[0]
+    assert cached[1] == pytest.approx(refit[1], rel=1e-6, abs=1e-6)
@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of items and their price histories (item.py)
+"""
+from datetime import date
+
+import numpy as np
+import pytest
+
+from item import Item, Price_history
+
+
+def test_copy_is_independent():
+    item = Item("food", "milk", "1 l", "Shop A", "Town", True)
+    for day in range(1, 7):
+        item.add_price_entry(date(2024, 1, day), 1.0 + day / 100)
+    item.mark_saved()
+    snapshot = item.copy()
+    days, prices = snapshot.price_data.days, snapshot.price_data.prices
+
+    # The arrays have room for 8 entries, so these edit them in place
+    item.add_price_entry(date(2023, 12, 31), 0.99)
+    item.remove_price_entry(date(2024, 1, 5))
+    item.add_price_entry(date(2024, 1, 2), 2.00)
+
+    assert snapshot.identity == item.identity
+    assert snapshot.is_store_brand and not snapshot.is_modified
+    assert snapshot.price_data.dates() == [date(2024, 1, day) for day in
+                                           range(1, 7)]
+    assert snapshot.price_data[date(2024, 1, 2)] == 1.02
+    assert list(days) == [date(2024, 1, day).toordinal() for day in
+                          range(1, 7)]
+    assert prices[1] == 1.02
+
+    snapshot.add_price_entry(date(2024, 2, 1), 1.50)
+    assert date(2024, 2, 1) not in item.price_data
+
+
+def test_copy_of_read_only_history():
+    days = [date(2024, 1, day).toordinal() for day in (1, 2, 3)]
+    history = Price_history(days, [1.0, 2.0, 3.0])
+    read_only = Price_history.from_sorted(history.days, history.prices)
+    copy = read_only.copy()
+    copy.add(date(2024, 1, 2), 5.0)
+    assert read_only[date(2024, 1, 2)] == 2.0
+    assert copy[date(2024, 1, 2)] == 5.0
+
+
+def history_of(*days_and_prices):
+    """ Return a Price_history of (day of January 2024, price) pairs """
+    return Price_history([date(2024, 1, day).toordinal() for day, _ in
+                          days_and_prices],
+                         [price for _, price in days_and_prices])
+
+
+def test_add_before_between_and_after():
+    history = history_of((10, 1.0), (20, 2.0))
+    history.add(date(2024, 1, 15), 1.5)
+    history.add(date(2024, 1, 25), 2.5)
+    history.add(date(2024, 1, 5), 0.5)
+    assert history.items() == [(date(2024, 1, 5), 0.5),
+                               (date(2024, 1, 10), 1.0),
+                               (date(2024, 1, 15), 1.5),
+                               (date(2024, 1, 20), 2.0),
+                               (date(2024, 1, 25), 2.5)]
+    assert len(history) == 5
+
+
+def test_add_many_grows_the_arrays():
+    history = Price_history()
+    days = list(range(1, 32))
+    # Every other day first, then the ones in between
+    for day in days[::2] + days[1::2]:
+        history.add(date(2024, 1, day), float(day))
+    assert history.dates() == [date(2024, 1, day) for day in days]
+    assert history.values() == [float(day) for day in days]
+
+
+def test_replace_price():
+    history = history_of((10, 1.0), (20, 2.0))
+    history.add(date(2024, 1, 10), 1.25)
+    assert history.items() == [(date(2024, 1, 10), 1.25),
+                               (date(2024, 1, 20), 2.0)]
+
+
+def test_remove():
+    history = history_of((10, 1.0), (20, 2.0), (30, 3.0))
+    history.remove(date(2024, 1, 20))
+    assert history.items() == [(date(2024, 1, 10), 1.0),
+                               (date(2024, 1, 30), 3.0)]
+    with pytest.raises(KeyError):
+        history.remove(date(2024, 1, 20))
+    with pytest.raises(KeyError):
+        history[date(2024, 1, 20)]
+    assert date(2024, 1, 20) not in history
+    history.remove(date(2024, 1, 10))
+    history.remove(date(2024, 1, 30))
+    assert len(history) == 0 and history.items() == []
+
+
+def test_repeated_days_keep_the_last_price():
+    history = history_of((20, 2.0), (10, 1.0), (20, 2.5), (10, 1.5))
+    assert history.items() == [(date(2024, 1, 10), 1.5),
+                               (date(2024, 1, 20), 2.5)]
+
+
+def test_views_are_read_only_and_keep_their_contents():
+    history = history_of((10, 1.0), (20, 2.0))
+    history.add(date(2024, 1, 30), 3.0)
+    days, prices = history.days, history.prices
+    with pytest.raises(ValueError):
+        prices[0] = 9.0
+
+    history.add(date(2024, 1, 5), 0.5)
+    history.remove(date(2024, 1, 20))
+    history.add(date(2024, 1, 10), 1.5)
+    assert days.tolist() == [date(2024, 1, day).toordinal() for day in
+                             (10, 20, 30)]
+    assert prices.tolist() == [1.0, 2.0, 3.0]
+
+
+def test_read_only_arrays_are_copied_on_first_edit():
+    days = np.array([date(2024, 1, day).toordinal() for day in (10, 20)],
+                    dtype=np.int32)
+    prices = np.array([1.0, 2.0])
+    days.flags.writeable = False
+    prices.flags.writeable = False
+    history = Price_history.from_sorted(days, prices)
+    assert np.shares_memory(history.prices, prices)
+
+    history.add(date(2024, 1, 10), 1.5)
+    history.add(date(2024, 1, 15), 1.75)
+    assert history.values() == [1.5, 1.75, 2.0]
+    assert prices.tolist() == [1.0, 2.0]
+    assert not np.shares_memory(history.prices, prices)
+
+    history = Price_history.from_sorted(days, prices)
+    history.remove(date(2024, 1, 10))
+    assert history.values() == [2.0] and prices.tolist() == [1.0, 2.0]
+
+
+def test_dict_like_access():
+    history = history_of((10, 1.0), (20, 2.0))
+    assert history[date(2024, 1, 20)] == 2.0
+    assert list(history) == [date(2024, 1, 10), date(2024, 1, 20)]
+    assert dict(history) == {date(2024, 1, 10): 1.0, date(2024, 1, 20): 2.0}
+    assert "2024-01-10" not in history
+    assert Price_history.from_dict(dict(history)).items() == history.items()
+    assert history.fingerprint() != history_of((10, 1.0),
+                                               (20, 2.5)).fingerprint()
+
+
+def test_from_sorted_never_changes_its_arrays():
+    days = np.array([date(2024, 1, day).toordinal() for day in (10, 20)],
+                    dtype=np.int32)
+    prices = np.array([1.0, 2.0])
+    history = Price_history.from_sorted(days, prices)
+    history.add(date(2024, 1, 10), 1.5)
+    assert prices.tolist() == [1.0, 2.0]
+    assert history.values() == [1.5, 2.0]
@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of comparing prices across stores (price_comparison.py), and of the
+commands and endpoint that report them
+"""
+import asyncio
+import io
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import cli
+from forecast_service import Forecast_service
+from item import Item, Price_history
+from price_comparison import Price_comparison
+from storage import open_price_arrays, save_items
+
+today = date.today()
+
+
+def item(description, store, prices, unit="1 l", item_type="dairy"):
+    """ Return an item with { days ago : price } prices """
+    new_item = Item(item_type, description, unit, store, "Town")
+    new_item.price_data = Price_history(
+        [(today - timedelta(days=days)).toordinal() for days in prices],
+        list(prices.values()))
+    return new_item
+
+
+def sample_catalog():
+    """ Milk at five stores (two tied for cheapest, one without prices,
+        one spelled differently), bread at one store and eggs at none
+    """
+    return [item("milk", "Shop A", {40: 0.90, 10: 1.10}),
+            item("milk", "Shop C", {100: 1.00}),
+            item("milk", "Shop B", {30: 1.05, 5: 1.00}),
+            item("milk", "Shop D", {}),
+            item(" Milk ", "Shop E", {2: 1.20}, unit="1 L"),
+            item("bread", "Shop A", {3: 2.50}, "500 g", "bakery"),
+            item("eggs", "Shop B", {}, "12", "eggs")]
+
+
+def test_cheapest_store_of_each_product():
+    cheapest = Price_comparison(sample_catalog()).cheapest()
+    assert len(cheapest) == 1
+    milk = cheapest.iloc[0]
+    # Shops B and C tie: the first by name is listed
+    assert (milk["description"], milk["store"], milk["price"]) == \
+        ("milk", "Shop B", 1.00)
+    assert milk["date"] == pd.Timestamp(today - timedelta(days=5))
+    assert milk["stores"] == 4 and milk["highest_price"] == 1.20
+
+
+def test_cheapest_with_single_store_products_and_max_age():
+    comparison = Price_comparison(sample_catalog())
+    cheapest = comparison.cheapest(all_products=True)
+    assert cheapest["description"].tolist() == ["bread", "milk"]
+    assert cheapest["stores"].tolist() == [1, 4]
+
+    # Shop C's price is too old to count
+    recent = comparison.cheapest(max_age=50)
+    assert recent.iloc[0]["stores"] == 3
+    assert comparison.cheapest(max_age=1).empty
+
+
+def test_compare_item():
+    catalog = sample_catalog()
+    comparison = Price_comparison(catalog)
+    table = comparison.compare_item(catalog[3])
+    assert table["store"].tolist() == ["Shop B", "Shop C", "Shop A",
+                                       "Shop E"]
+    assert table["price"].tolist() == [1.00, 1.00, 1.10, 1.20]
+    assert comparison.compare_item(catalog[6]).empty
+    assert comparison.compare_item(item("tea", "Shop A", {})).empty
+
+
+def test_store_price_levels():
+    levels = Price_comparison(sample_catalog()).store_price_levels()
+    # Only milk is at several stores, and Shop D has no price for it
+    assert sorted(levels["store"]) == ["Shop A", "Shop B", "Shop C",
+                                       "Shop E"]
+    assert levels["products"].tolist() == [1, 1, 1, 1]
+    assert levels["store"].iloc[-1] == "Shop E"
+    mean = np.exp(np.mean(np.log([1.10, 1.00, 1.00, 1.20])))
+    assert levels.set_index("store")["price_level"]["Shop E"] == \
+        pytest.approx(100 * 1.20 / mean)
+
+
+def test_price_index_is_chained_over_items_in_both_months():
+    first = date(2024, 1, 15).toordinal()
+    rising = Item("dairy", "milk", "1 l", "Shop A", "Town")
+    rising.price_data = Price_history([first, first + 31, first + 60],
+                                      [1.00, 1.10, 1.21])
+    # Starts being tracked in February, and doesn't move the index then
+    late = Item("dairy", "cream", "1 l", "Shop A", "Town")
+    late.price_data = Price_history([first + 31, first + 60], [5.00, 5.00])
+    comparison = Price_comparison([rising, late])
+
+    index = comparison.price_index()["dairy"]
+    assert index.index.astype(str).tolist() == ["2024-01", "2024-02",
+                                                "2024-03"]
+    assert index.tolist() == pytest.approx([100, 110, 110 * np.sqrt(1.1)])
+    change = comparison.month_over_month(by="store")["Shop A (Town)"]
+    assert np.isnan(change.iloc[0])
+    assert change.iloc[1:].tolist() == pytest.approx(
+        [10, 100 * (np.sqrt(1.1) - 1)])
+    with pytest.raises(ValueError):
+        comparison.price_index(by="unit")
+
+
+def test_empty_catalogs():
+    for catalog in ([], [item("milk", "Shop A", {})]):
+        comparison = Price_comparison(catalog)
+        assert comparison.cheapest().empty
+        assert comparison.store_price_levels().empty
+        assert comparison.price_index().empty
+
+
+def test_from_arrays_matches(tmp_path):
+    catalog = sample_catalog()
+    save_items({new_item.key: new_item for new_item in catalog},
+               tmp_path / "items.mmap")
+    comparison = Price_comparison.from_arrays(
+        catalog, *open_price_arrays(tmp_path / "items.mmap"))
+    expected = Price_comparison(catalog)
+    pd.testing.assert_frame_equal(comparison.cheapest(all_products=True),
+                                  expected.cheapest(all_products=True))
+    with pytest.raises(ValueError):
+        Price_comparison.from_arrays(catalog[:-1], *open_price_arrays(
+            tmp_path / "items.mmap"))
+
+
+@pytest.fixture(params=["items", "items.mmap"])
+def saved_catalog(request, tmp_path):
+    location = tmp_path / request.param
+    if request.param == "items":
+        location.mkdir()
+    save_items({new_item.key: new_item for new_item in sample_catalog()},
+               location)
+    return location
+
+
+def test_compare_command(saved_catalog, capsys):
+    cli.main(["--items", str(saved_catalog), "compare"])
+    cheapest = pd.read_csv(io.StringIO(capsys.readouterr().out))
+    assert cheapest[["description", "store", "price", "stores"]] \
+        .values.tolist() == [["milk", "Shop B", 1.0, 4]]
+
+    cli.main(["--items", str(saved_catalog), "compare", "--all-products"])
+    cheapest = pd.read_csv(io.StringIO(capsys.readouterr().out))
+    assert cheapest["description"].tolist() == ["bread", "milk"]
+
+    cli.main(["--items", str(saved_catalog), "compare", "levels"])
+    levels = pd.read_csv(io.StringIO(capsys.readouterr().out))
+    assert len(levels) == 4
+
+
+def test_cheapest_endpoint(saved_catalog):
+    service = Forecast_service(saved_catalog)
+    try:
+        reply = asyncio.run(service.route("GET", "/cheapest", b""))
+    finally:
+        service.worker.shutdown(wait=True)
+    assert reply == {"products": [{
+        "type": "dairy", "description": "milk", "unit": "1 l",
+        "store": "Shop B", "location": "Town",
+        "date": str(today - timedelta(days=5)), "price": 1.0, "stores": 4,
+        "highest_price": 1.2}]}
@@ -0,0 +1,278 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of saving and loading items in every storage format (storage.py)
+"""
+import sqlite3
+from datetime import date
+
+import numpy as np
+import pytest
+
+import storage
+from item import Item, Price_history
+from storage import convert_items, item_filename, load_item_index, \
+                    load_items, open_price_arrays, save_items
+
+
+def sample_items():
+    """ Return an item_list with the same description at two stores, a
+        store brand item and an item without prices
+    """
+    items = [Item("dairy", "milk", "1 l", "Shop A", "Town"),
+             Item("dairy", "milk", "1 l", "Shop B", "Town"),
+             Item("bakery", "bread", "500 g", "Shop A", "Town", True),
+             Item("bakery", "rolls", "6-pack", "Shop B", "City")]
+    rng = np.random.default_rng(0)
+    for number, item in enumerate(items[:3]):
+        days = date(2024, 1, 1).toordinal() + np.cumsum(
+            rng.integers(1, 10, size=20 + number))
+        item.price_data = Price_history(days, np.round(
+            rng.uniform(0.5, 5, size=len(days)), 2))
+    return {item.key: item for item in items}
+
+
+def assert_same_items(item_list, expected):
+    assert sorted(item_list) == sorted(expected)
+    for key, item in expected.items():
+        loaded = item_list[key]
+        assert loaded.identity == item.identity
+        assert loaded.is_store_brand == item.is_store_brand
+        assert not loaded.is_modified
+        assert np.array_equal(loaded.price_data.days, item.price_data.days)
+        assert np.array_equal(loaded.price_data.prices,
+                              item.price_data.prices)
+
+
+def test_round_trip(location):
+    expected = sample_items()
+    if location.suffix == "":
+        location.mkdir()
+    assert save_items(expected, location) == len(expected)
+    assert_same_items(load_items(location), expected)
+    assert_same_items(load_item_index(location), expected)
+
+
+def test_convert_between_all_formats(tmp_path):
+    expected = sample_items()
+    (tmp_path / "items").mkdir()
+    save_items(expected, tmp_path / "items")
+    chain = ["items", "items.mmap", "items.sqlite", "copy.mmap", "copy"]
+    for source, destination in zip(chain, chain[1:]):
+        assert convert_items(tmp_path / source,
+                             tmp_path / destination) == len(expected)
+        assert_same_items(load_items(tmp_path / destination), expected)
+
+
+def test_mapped_store_is_read_lazily(tmp_path):
+    expected = sample_items()
+    save_items(expected, tmp_path / "items.mmap")
+    item_list = load_items(tmp_path / "items.mmap")
+    assert not any(item.is_price_data_loaded for item in
+                   item_list.values())
+
+    days, prices, offsets = open_price_arrays(tmp_path / "items.mmap")
+    assert isinstance(days, np.memmap) and not days.flags.writeable
+    assert offsets.tolist() == [0, 20, 41, 63, 63]
+    milk = item_list[("milk", "Shop B", "Town")].price_data
+    assert np.array_equal(milk.days, days[20:41])
+
+
+def test_edit_mapped_store(tmp_path):
+    location = tmp_path / "items.mmap"
+    save_items(sample_items(), location)
+    item_list = load_items(location)
+    bread = item_list[("bread", "Shop A", "Town")]
+    milk = item_list[("milk", "Shop A", "Town")]
+    milk_prices = np.array(milk.price_data.prices)
+
+    # The mapped arrays are read-only: changing a price copies the item's
+    bread.add_price_entry(date(2025, 1, 1), 9.99)
+    bread.remove_price_entry(bread.price_data.dates()[0])
+    rolls = item_list[("rolls", "Shop B", "City")]
+    rolls.add_price_entry(date(2025, 1, 2), 3.00)
+    assert save_items(item_list, location) == 2
+
+    # Items loaded from the old store still read their prices
+    assert np.array_equal(milk.price_data.prices, milk_prices)
+    assert_same_items(load_items(location), item_list)
+    assert load_items(location)[("bread", "Shop A", "Town")].price_data[
+        date(2025, 1, 1)] == 9.99
+
+    # Saving without changes leaves the store as it is
+    assert save_items(load_items(location), location) == 0
+
+
+def test_saving_drops_the_maps_of_the_old_store(tmp_path):
+    location = tmp_path / "items.mmap"
+    save_items(sample_items(), location)
+    item_list = load_items(location)
+    for item in item_list.values():
+        item.price_data
+    item_list[("rolls", "Shop B", "City")].add_price_entry(date(2025, 1, 1),
+                                                           2.0)
+    save_items(item_list, location, only_modified=False)
+
+    # Every item reads its prices from the new store again, and nothing is
+    # left of the old one
+    assert not any(item.is_price_data_loaded for item in
+                   item_list.values())
+    assert sorted(path.name for path in tmp_path.iterdir()) == \
+           ["items.mmap"]
+    assert_same_items(load_items(location), item_list)
+
+
+def test_failed_swap_of_mapped_store_is_raised(tmp_path, monkeypatch):
+    location = tmp_path / "items.mmap"
+    save_items(sample_items(), location)
+    item_list = load_items(location)
+    bread = item_list[("bread", "Shop A", "Town")]
+    bread.add_price_entry(date(2025, 1, 1), 9.99)
+
+    def fail(source, destination):
+        raise PermissionError("in use: " + str(source))
+    monkeypatch.setattr(storage.os, "replace", fail)
+    with pytest.raises(PermissionError):
+        save_items(item_list, location)
+    monkeypatch.undo()
+
+    # The items read the store that was written, and the next save
+    # replaces it
+    assert bread.is_modified
+    assert bread.price_data[date(2025, 1, 1)] == 9.99
+    assert save_items(item_list, location) == 1
+    assert sorted(path.name for path in tmp_path.iterdir()) == \
+           ["items.mmap"]
+    assert_same_items(load_items(location), item_list)
+
+
+def test_empty_mapped_store(tmp_path):
+    location = tmp_path / "items.mmap"
+    assert load_items(location) == {}
+    empty = Item("dairy", "milk", "1 l", "Shop A", "Town")
+    save_items({empty.key: empty}, location)
+    loaded = load_items(location)[empty.key]
+    assert len(loaded.price_data) == 0
+    loaded.add_price_entry(date(2024, 1, 1), 1.0)
+    save_items({empty.key: loaded}, location)
+    assert load_items(location)[empty.key].price_data[date(2024, 1, 1)] \
+        == 1.0
+
+
+def test_keys_that_are_not_file_names(location):
+    items = [Item("dairy", "milk", "1 l", "Shop A", "Hwy 1/98"),
+             Item("dairy", "Milk", "1 l", "Shop A", "Hwy 1/98"),
+             Item("dairy", "milk", "1 l", "Shop A", "Hwy 1\\98"),
+             Item("dairy", 'milk: "2%" <fresh>?', "1 l", "Shop|A*", "..")]
+    for number, item in enumerate(items):
+        item.add_price_entry(date(2024, 1, 1), 1.0 + number)
+    expected = {item.key: item for item in items}
+    if location.suffix == "":
+        location.mkdir()
+    save_items(expected, location)
+    if location.suffix == "":
+        assert len(list(location.glob("*.txt"))) == len(items)
+    assert_same_items(load_items(location), expected)
+
+
+def test_older_item_files_are_renamed(tmp_path):
+    item = Item("dairy", "milk", "1 l", "Shop A", "Town")
+    item.add_price_entry(date(2024, 1, 1), 1.0)
+    folder = tmp_path / "items"
+    folder.mkdir()
+    (folder / "milk.txt").write_text(repr(item))
+    other = Item("dairy", "milk", "1 l", "Shop B", "Town")
+    (folder / "milk@shop_b@town.txt").write_text(repr(other))
+
+    item_list = load_items(folder)
+    assert sorted(item_list) == [("milk", "Shop A", "Town"),
+                                 ("milk", "Shop B", "Town")]
+    save_items(item_list, folder, only_modified=False)
+    assert sorted(path.name for path in folder.glob("*.txt")) == \
+        sorted(item_filename(folder, item).name for item in
+               item_list.values())
+    assert_same_items(load_items(folder), item_list)
+
+
+def test_prices_are_kept_exactly(location):
+    item = Item("dairy", "milk", "1 l", "Shop A", "Town")
+    prices = [1.99, 0.1 + 0.2, 1.2345, 1 / 3, 1234567.891, 2.5]
+    item.price_data = Price_history(
+        date(2024, 1, 1).toordinal() + np.arange(len(prices)), prices)
+    if location.suffix == "":
+        location.mkdir()
+    save_items({item.key: item}, location)
+    assert load_items(location)[item.key].price_data.prices.tolist() == \
+        prices
+    if location.suffix == "":
+        # Prices with at most two decimals are written as before
+        lines = item_filename(location, item).read_text().splitlines()
+        assert lines[6:8] == ["2024-01-01,  1.99",
+                              "2024-01-02, 0.30000000000000004"]
+        assert lines[-1] == "2024-01-06,  2.50"
+
+
+def change_saved_price(location, key, price):
+    """ Change an item's first saved price behind storage.py's back """
+    if location.suffix == ".sqlite":
+        connection = sqlite3.connect(str(location))
+        with connection:
+            item_id = connection.execute(
+                "SELECT id FROM items WHERE item_description = ? AND "
+                "store_name = ? AND store_location = ?", key).fetchone()[0]
+            connection.execute(
+                "UPDATE prices SET price = ? WHERE item_id = ? AND day = "
+                "(SELECT MIN(day) FROM prices WHERE item_id = ?)",
+                (price, item_id, item_id))
+        connection.close()
+    else:
+        filename = item_filename(location, load_items(location)[key])
+        lines = filename.read_text().splitlines()
+        lines[6] = lines[6].split(", ")[0] + ", " + str(price)
+        filename.write_text("\n".join(lines) + "\n")
+
+
+@pytest.mark.parametrize("suffix", ["", ".sqlite"])
+def test_only_modified_items_are_written(tmp_path, suffix):
+    location = tmp_path / ("items" + suffix)
+    if suffix == "":
+        location.mkdir()
+    save_items(sample_items(), location)
+    item_list = load_item_index(location)
+    assert not any(item.is_modified for item in item_list.values())
+    assert save_items(item_list, location) == 0
+
+    # Changed on disk after being read, but not in item_list: only
+    #   overwritten if the item is written
+    untouched = ("milk", "Shop A", "Town")
+    assert len(item_list[untouched].price_data) > 0
+    change_saved_price(location, untouched, 99.0)
+    edited = item_list[("bread", "Shop A", "Town")]
+    edited.add_price_entry(date(2025, 1, 1), 3.0)
+    new_item = Item("dairy", "cheese", "200 g", "Shop A", "Town")
+    item_list[new_item.key] = new_item
+    assert edited.is_modified and new_item.is_modified
+
+    assert save_items(item_list, location) == 2
+    assert not edited.is_modified and not new_item.is_modified
+    saved = load_items(location)
+    assert saved[untouched].price_data.values()[0] == 99.0
+    assert saved[edited.key].price_data[date(2025, 1, 1)] == 3.0
+    assert new_item.key in saved
+
+    # Writing every item overwrites the change on disk
+    assert save_items(item_list, location, only_modified=False) == 5
+    assert load_items(location)[untouched].price_data.values()[0] != 99.0
+
+
+def test_mapped_store_is_only_rewritten_when_modified(tmp_path):
+    location = tmp_path / "items.mmap"
+    save_items(sample_items(), location)
+    written = (location / "days.npy").stat().st_mtime_ns
+    item_list = load_items(location)
+    assert save_items(item_list, location) == 0
+    assert (location / "days.npy").stat().st_mtime_ns == written
+
+    item_list[("rolls", "Shop B", "City")].add_price_entry(date(2025, 1, 1),
+                                                           2.0)
+    assert save_items(item_list, location) == 1
+    assert_same_items(load_items(location), item_list)
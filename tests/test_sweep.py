@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of cross-validating hyperparameters (data_analysis.py,
+sweep_polynomial_order)
+"""
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import data_analysis
+
+
+def rising_training_set(entries=60):
+    """ Return a training set of weekly prices equal to the number of days
+        since the first entry, and a steadily rising economic indicator, so
+        that every later entry has higher values than all earlier ones
+    """
+    first = date(2020, 1, 6)
+    dates = [first + timedelta(days=7 * i) for i in range(entries)]
+    prices = [float((day - first).days) for day in dates]
+    dates.append(dates[-1] + timedelta(days=3))
+    prices.append(None)
+    return pd.DataFrame({"Date": dates, "Price": prices,
+                         "CPI": np.linspace(100, 200, entries + 1)})
+
+
+@pytest.mark.parametrize("timeframe", [0, 30, 91])
+def test_folds_do_not_see_test_entries(monkeypatch, timeframe):
+    folds = []
+    ridge_path = data_analysis.ridge_path
+
+    def record_fold(x_train, y_train, x_test, alphas):
+        folds.append((x_train, y_train, x_test))
+        return ridge_path(x_train, y_train, x_test, alphas)
+
+    monkeypatch.setattr(data_analysis, "ridge_path", record_fold)
+    scores = data_analysis.sweep_polynomial_order(
+        rising_training_set(), timeframe, 2, (0.1, 1.0), 5)
+    # Folds left without training entries aren't scored
+    assert 2 <= len(folds) <= 5
+    assert all(score[4] == len(folds) for score in scores)
+
+    for x_train, y_train, x_test in folds:
+        # Every fold starts on the first entry, so column 0 (days since the
+        #   earliest entry) is each entry's price, and y the target's
+        first_test_day = x_test[:, 0].min()
+        assert x_train[:, 0].max() < first_test_day
+        assert y_train.max() < first_test_day
+        # Scaled to the training entries' range only: from a to b, and the
+        #   test entries (all higher) clipped to b
+        assert x_train[:, 1].min() == pytest.approx(0.001)
+        assert x_train[:, 1].max() == pytest.approx(2.999)
+        assert np.all(x_test[:, 1] == x_train[:, 1].max())
+        assert not np.isnan(x_test).any()
+
+
+def test_too_few_entries_to_cross_validate():
+    with pytest.raises(ValueError):
+        data_analysis.sweep_polynomial_order(rising_training_set(8), 365, 1,
+                                             (0.1,), 5)
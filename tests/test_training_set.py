@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of turning price data into training sets and model inputs
+(data_analysis.py), against the original implementations they replaced
+"""
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import data_analysis
+
+
+def loop_y_values(training_set, timeframe, max_allowed_time_diff=15):
+    """ The original generate_y_values(), which compares every entry with
+        every later one
+    """
+    dates = training_set["Date"]
+    prices = training_set["Price"]
+
+    length = len(dates)
+    y_values = [None] * length
+
+    if timeframe <= 0:
+        return prices
+
+    for entry_num in range(0, length-1):
+        time_diffs = [(dates[future_entry_num] - dates[entry_num]).days for
+                      future_entry_num in range(entry_num+1, length)]
+        time_diffs = abs(np.array(time_diffs) - timeframe)
+
+        min_index = entry_num
+        min_diff = time_diffs[0]
+        for i in range(1, len(time_diffs)):
+            if time_diffs[i] < min_diff:
+                min_diff = time_diffs[i]
+                min_index = entry_num + i
+
+        if min_diff < max_allowed_time_diff:
+            y_values[entry_num] = prices[min_index + 1]
+
+    return y_values
+
+
+def random_price_set(rng, entries, max_gap, is_sorted=True):
+    """ Return a training set of <entries> random dates (0 to <max_gap>
+        days apart, so some fall on the same day) and prices
+    """
+    days = date(2020, 1, 1).toordinal() + np.cumsum(
+        rng.integers(0, max_gap + 1, size=entries))
+    if not is_sorted:
+        rng.shuffle(days)
+    return pd.DataFrame({"Date": [date.fromordinal(int(day)) for day in days],
+                         "Price": np.round(rng.uniform(0.5, 9, entries), 2)})
+
+
+@pytest.mark.parametrize("timeframe", [0, 1, 7, 30, 60, 91, 365, 5000])
+@pytest.mark.parametrize("max_gap", [0, 1, 10, 45, 400])
+def test_y_values_match_loop(timeframe, max_gap):
+    rng = np.random.default_rng(timeframe * 1000 + max_gap)
+    for entries in (0, 1, 2, 3, 10, 60):
+        for is_sorted in (True, False):
+            training_set = random_price_set(rng, entries, max_gap, is_sorted)
+            expected = loop_y_values(training_set, timeframe)
+            result = data_analysis.generate_y_values(training_set, timeframe)
+            if timeframe <= 0:
+                assert list(result) == list(expected)
+            else:
+                assert result == expected
+
+
+def test_y_values_example():
+    """ The example of generate_y_values()'s docstring """
+    dates = ["2019-05-24", "2019-05-28", "2019-06-21", "2019-08-05",
+             "2019-09-20", "2020-02-24", "2020-04-11", "2020-04-25",
+             "2020-05-10", "2020-05-18"]
+    training_set = pd.DataFrame({
+        "Date": [date.fromisoformat(day) for day in dates],
+        "Price": [2.59, 0.99, 1.85, 5.00, 4.33, 2.89, 13.19, 3.29, 3.49,
+                  1.99]})
+    assert data_analysis.generate_y_values(training_set, 60) == \
+        [5.00, 5.00, None, 4.33, None, 3.29, None, None, None, None]
+
+
+def test_y_values_ties_and_horizon_past_last_price():
+    # Entries 10 days before and after each target day are equally close:
+    #   the earlier one is used, as in the loop
+    first = date(2024, 1, 1)
+    training_set = pd.DataFrame({
+        "Date": [first + timedelta(days=days) for days in (0, 20, 40, 60)],
+        "Price": [1.0, 2.0, 3.0, 4.0]})
+    assert data_analysis.generate_y_values(training_set, 30) == \
+        loop_y_values(training_set, 30) == [2.0, 3.0, 4.0, None]
+    # No entry is near enough to 90 days after any other
+    assert data_analysis.generate_y_values(training_set, 90) == \
+        loop_y_values(training_set, 90) == [None] * 4
+
+
+def column_build_features(training_set, timeframe, polynomial_order):
+    """ The original build_features(), which adds the scaled and polynomial
+        features to the training set DataFrame column by column
+
+        - Return (x, y, prediction input, earliest date) as DataFrames
+    """
+    training_set["Y"] = data_analysis.generate_y_values(training_set,
+                                                        timeframe)
+    x = training_set.copy(deep=False)
+
+    for feature in x.columns:
+        if feature == "Date" or feature == "Price":
+            continue
+        if feature == "Y":
+            break
+        col = x[feature]
+        a = 0.001
+        b = 2.999
+        data_range = max(col) - min(col)
+        if data_range == 0:
+            data_range = 1
+        col = a + ((col - min(col))*(b - a) / (data_range))
+        x[feature] = col
+
+        if polynomial_order > 1:
+            exponents = [e for e in range(2, polynomial_order + 1)]
+            exponents.append(1/2)
+            for exponent in exponents:
+                feature_with_exponent = "^".join([feature, str(exponent)])
+                x[feature_with_exponent] = x[feature] ** exponent
+
+    earliest_date = min(x["Date"])
+    x["Date"] = [(date_entry - earliest_date).days for date_entry in
+                 x["Date"]]
+
+    prediction_input = x[-1:].drop(["Price", "Y"], axis=1)
+    x = x.dropna()
+    y = x["Y"]
+    x = x.drop(["Price", "Y"], axis=1)
+    return x, y, prediction_input, earliest_date
+
+
+def synthetic_item(seed, entries=80):
+    from item import Item, Price_history
+    rng = np.random.default_rng(seed)
+    days = date.today().toordinal() - 1 - np.cumsum(
+        rng.integers(1, 12, size=entries))[::-1]
+    item = Item("food", "Item {}".format(seed), "1 lb", "Shop", "Town")
+    item.price_data = Price_history(days, np.round(
+        3 * np.cumprod(1 + rng.normal(0, 0.02, entries)), 2))
+    return item
+
+
+# Unregularized high-order models are ill-conditioned, in both versions
+@pytest.mark.filterwarnings("ignore:An ill-conditioned matrix")
+@pytest.mark.parametrize("timeframe", [0, 7, 30, 91])
+@pytest.mark.parametrize("polynomial_order", [1, 2, 3, 5])
+def test_features_and_predictions_match_columns(econ_data, timeframe,
+                                                polynomial_order):
+    from sklearn import linear_model
+    for seed in range(3):
+        training_set = data_analysis.convert_price_data_to_training_set(
+            synthetic_item(seed), timeframe)
+        old_x, old_y, old_input, old_earliest = column_build_features(
+            training_set.copy(), timeframe, polynomial_order)
+        x, y, prediction_input, earliest, names = \
+            data_analysis.build_features(training_set.copy(), timeframe,
+                                         polynomial_order)
+        assert names == list(old_x.columns)
+        assert np.array_equal(x, old_x.to_numpy(dtype=np.float64))
+        assert np.array_equal(y, old_y.to_numpy(dtype=np.float64))
+        assert np.array_equal(prediction_input,
+                              old_input.to_numpy(dtype=np.float64))
+        assert earliest == old_earliest
+
+        for alpha in (0, 0.1, 10):
+            old_model = linear_model.Ridge(alpha=alpha).fit(old_x, old_y)
+            result = data_analysis.fit_model(training_set.copy(), timeframe,
+                                             polynomial_order, alpha)
+            assert result[2] == old_model.predict(old_input)[0]
+            assert result[3][:-1] == list(old_model.predict(old_x))